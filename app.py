@@ -1,21 +1,25 @@
-from flask import Flask, render_template, request, jsonify
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service as EdgeService
-from selenium.webdriver.edge.service import Service
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
-from selenium.webdriver.edge.options import Options as EdgeOptions
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-import json
+from flask import Flask, render_template, request, jsonify, Response
 import os
 import time
-import schedule
-import threading
 import atexit
 from datetime import datetime, timedelta
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from storage import open_store, DuplicateRecordError
+from history_log import HistoryLog, migrate_store_history
+from stats import StatsCounters
+from session_pool import SessionPool
+from health import HealthMonitor
+from locators import LocatorRegistry
+from driver_cache import resolve_driver_path
+from campaigns import CampaignManager, CampaignError
+from template_engine import TemplateEngine, TemplateError, compile_template
+from scheduler import TimerScheduler, ScheduleReconciler
+from recurrence import Recurrence, RecurrenceError
+from events import EventBus
+from contacts_import import import_contacts, open_text
+from phone_numbers import normalize_phone, InvalidPhoneNumber
+from invalid_numbers import InvalidNumberCache, KnownInvalidNumber
 
 # Configure logging
 logging.basicConfig(
@@ -30,402 +34,397 @@ logging.basicConfig(
 app = Flask(__name__)
 
 # Global variables
-bot = None
-bot_thread = None
-scheduler_thread = None
 is_bot_running = False
 
-# Initialize scheduler when the app starts
-def init_scheduler():
-    global scheduler_thread, is_bot_running
-    is_bot_running = True
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
-    logging.info("Scheduler thread started")
-
 # Cleanup function to be called on exit
 def cleanup():
     global is_bot_running
     is_bot_running = False
-    if 'bot' in globals() and bot:
+    if 'scheduler' in globals():
+        scheduler.stop(timeout=5)
+    if 'monitor' in globals():
+        monitor.stop(timeout=5)
+    if 'invalid_numbers' in globals():
+        invalid_numbers.close()
+    if 'pool' in globals():
         try:
-            bot.quit()
+            pool.shutdown()
             logging.info("Browser closed during cleanup")
         except Exception as e:
             logging.error(f"Error during cleanup: {str(e)}")
+    try:
+        store.close()
+        history.close()
+        stats.close()
+        locators.save()
+    except Exception as e:
+        logging.error(f"Error closing store: {str(e)}")
 
 # Register cleanup function
 atexit.register(cleanup)
 
-def load_config():
-    """Load configuration from config.json"""
-    if os.path.exists('config.json'):
-        with open('config.json', 'r') as f:
-            return json.load(f)
-    return {
-        'recipients': [],
-        'message_templates': [],
-        'scheduled_messages': [],
-        'message_history': [],
-        'stats': {
-            'total': 0,
-            'successful': 0,
-            'failed': 0,
-            'pending': 0
-        }
-    }
-
-def save_config(config):
-    """Save configuration to config.json"""
-    with open('config.json', 'w') as f:
-        json.dump(config, f, indent=4)
-
-def update_stats(status):
-    """Update message statistics"""
-    config = load_config()
-    config['stats']['total'] += 1
-    if status == 'success':
-        config['stats']['successful'] += 1
-    elif status == 'error':
-        config['stats']['failed'] += 1
-    save_config(config)
-
-def add_to_history(recipient, message, status):
-    """Add message to history"""
-    config = load_config()
-    config['message_history'].append({
-        'recipient': recipient,
-        'message': message,
-        'status': status,
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
-    save_config(config)
+# Persistent storage. 'sqlite' migrates the legacy config.json once;
+# 'json' keeps config.json as the source of truth behind an in-memory model.
+STORE_BACKEND = os.environ.get('WHATSAPP_STORE', 'sqlite')
+DB_PATH = 'whatsapp.db'
+CONFIG_PATH = 'config.json'
+CONFIG_FLUSH_INTERVAL = float(os.environ.get('WHATSAPP_FLUSH_INTERVAL', '1.0'))
+store = open_store(STORE_BACKEND, db_path=DB_PATH, config_path=CONFIG_PATH,
+                   flush_interval=CONFIG_FLUSH_INTERVAL)
 
-def setup_scheduled_message(schedule_item, recipient, template):
-    """Set up a scheduled message using the schedule library"""
-    try:
-        logging.info(f"[SCHEDULER] Setting up message: ID {schedule_item['id']} for {schedule_item['date']} at {schedule_item['time']}")
-        
-        # Parse the schedule time in local timezone
-        schedule_time = datetime.strptime(schedule_item['time'], '%H:%M').time()
-        schedule_date = datetime.strptime(schedule_item['date'], '%Y-%m-%d').date()
-        
-        # Combine date and time in local timezone
-        schedule_datetime = datetime.combine(schedule_date, schedule_time)
-        now = datetime.now()
-        
-        # Calculate time difference in minutes
-        time_diff = (schedule_datetime - now).total_seconds() / 60  # in minutes
-        
-        # If the message is more than 1 minute in the past, skip it
-        if time_diff < -1:  # Changed from 5 minutes to 1 minute buffer
-            logging.warning(f"[SCHEDULER] Skipping past schedule: {schedule_item['id']} at {schedule_datetime} ({abs(time_diff):.1f} minutes ago)")
-            return False
-        # If the message is in the past but within 1 minute, still send it
-        elif time_diff < 0:
-            logging.warning(f"[SCHEDULER] Message {schedule_item['id']} is {abs(time_diff):.1f} minutes in the past, but will still attempt to send")
-        # If the message is in the future, log how long until it will be sent
-        else:
-            logging.info(f"[SCHEDULER] Message {schedule_item['id']} will be sent in {time_diff:.1f} minutes")
-            
-        # Create a function to send the message
-        def send_message():
-            logging.info(f"[SCHEDULER] [JOB START] Executing scheduled message for {recipient.get('name')}")
-            try:
-                logging.info(f"[SCHEDULER] [JOB] Sending message to {recipient.get('phone')}")
-                send_scheduled_message(recipient, template)
-                logging.info(f"[SCHEDULER] [JOB SUCCESS] Message sent to {recipient.get('name')}")
-            except Exception as e:
-                logging.error(f"[SCHEDULER] [JOB ERROR] Error sending message: {str(e)}", exc_info=True)
-        
-        # Get schedule ID for logging
-        schedule_id = str(schedule_item.get('id', 'unknown'))
-        logging.info(f"[SCHEDULER] Creating schedule {schedule_id} for {schedule_item['type']} at {schedule_time}")
-        
-        # Schedule based on type
-        if schedule_item['type'] == 'one_time':
-            # For one-time messages, schedule to run once at the specified time
-            logging.info(f"[SCHEDULER] Creating schedule {schedule_id} for one_time at {schedule_time}")
-            
-            # Calculate delay in seconds
-            delay_seconds = (schedule_datetime - datetime.now()).total_seconds()
-            
-            # If the message is in the past but within 1 minute, send it immediately
-            if -60 <= delay_seconds < 0:
-                logging.info(f"[SCHEDULER] Sending one-time message {schedule_id} immediately (was {abs(delay_seconds):.0f} seconds ago)")
-                send_message()
-                return True
-            # If the message is in the future, schedule it
-            elif delay_seconds >= 0:
-                logging.info(f"[SCHEDULER] Scheduling one-time message {schedule_id} in {delay_seconds:.0f} seconds")
-                # Schedule the message using a separate thread with a delay
-                def schedule_one_time():
-                    time.sleep(delay_seconds)
-                    send_message()
-                
-                thread = threading.Thread(target=schedule_one_time, daemon=True)
-                thread.start()
-                return True
-            # Otherwise, the message is too far in the past
-            else:
-                logging.warning(f"[SCHEDULER] Not scheduling one-time message {schedule_id} from {abs(delay_seconds/60):.1f} minutes ago")
-                return False
-            
-        elif schedule_item['type'] == 'daily':
-            logging.info(f"[SCHEDULER] Scheduling daily message at {schedule_time}")
-            schedule.every().day.at(schedule_time.strftime('%H:%M')).do(send_message).tag(schedule_id)
-            
-        elif schedule_item['type'] == 'weekly':
-            day = schedule_item.get('day', 'monday').lower()
-            logging.info(f"[SCHEDULER] Scheduling weekly message on {day} at {schedule_time}")
-            getattr(schedule.every(), day).at(schedule_time.strftime('%H:%M')).do(send_message).tag(schedule_id)
-            
-        elif schedule_item['type'] == 'monthly':
-            day_of_month = schedule_item.get('day', 1)
-            logging.info(f"[SCHEDULER] Scheduling monthly message on day {day_of_month} at {schedule_time}")
-            
-            def monthly_job():
-                now = datetime.now()
-                if now.day == day_of_month:
-                    logging.info(f"[SCHEDULER] Executing monthly message for day {day_of_month}")
-                    send_scheduled_message(recipient, template)
-                else:
-                    logging.info(f"[SCHEDULER] Not the right day for monthly message (today is {now.day}, waiting for {day_of_month})")
-                    
-            schedule.every().day.at(schedule_time.strftime('%H:%M')).do(monthly_job).tag(schedule_id)
-        
-        # Log all scheduled jobs for debugging
-        jobs = schedule.get_jobs()
-        logging.info(f"[SCHEDULER] Current jobs: {len(jobs)}")
-        for job in jobs:
-            logging.info(f"[SCHEDULER] Job {job.id}: {job.job_func} at {job.next_run}")
-            
-        return True
-        
-    except Exception as e:
-        logging.error(f"[SCHEDULER] Error setting up scheduled message: {str(e)}", exc_info=True)
-        return False
+# Append-only message history, one JSONL segment per day
+HISTORY_DIR = 'history'
+HISTORY_PAGE_SIZE = 50
+history = HistoryLog(HISTORY_DIR)
+migrate_store_history(store, history)
 
-@app.route('/check_schedules', methods=['GET'])
-def check_schedules():
-    """Manually trigger a check of all schedules"""
-    logging.info("[SCHEDULER] Manually triggered schedule check")
-    setup_all_schedules()
-    return jsonify({'status': 'success', 'message': 'Schedule check completed'})
+# In-memory counters, snapshotted to disk in the background
+STATS_PATH = 'stats.json'
+STATS_SNAPSHOT_INTERVAL = 5.0
+stats = StatsCounters(STATS_PATH, snapshot_interval=STATS_SNAPSHOT_INTERVAL, seed=store.get_stats())
+
+# Every schedule's next fire time, served by one timer thread and kept in
+# step with the store by the reconciler
+scheduler = TimerScheduler()
+
+# Templates are compiled once per version; rendered messages are cached
+templates = TemplateEngine()
+
+# Most job ids one /jobs status query may ask about
+MAX_JOB_QUERY = 200
+
+# Largest page the list endpoints (/recipients, /templates, /schedules, /history) return
+MAX_PAGE_SIZE = 500
+
+# Live dashboard updates, streamed to every open page from /events
+events = EventBus()
 
-def setup_all_schedules():
-    """Set up all active, future scheduled messages from config"""
-    config = load_config()
+def publish_stats():
+    events.publish('stats', stats.totals())
+
+def describe_schedule(schedule_item, names=None):
+    """A schedule with its recipient and template names, for display
+
+    Args:
+        names (dict): lookup cache shared across one page of schedules
+    """
+    names = {} if names is None else names
+    described = dict(schedule_item)
+    for field, lookup in (('recipient', store.get_recipient), ('template', store.get_template)):
+        key = (field, str(schedule_item.get(f'{field}_id')))
+        if key not in names:
+            record = lookup(key[1])
+            names[key] = record['name'] if record else None
+        described[f'{field}_name'] = names[key]
+    return described
+
+def publish_schedule(schedule_item, next_due=None):
+    """Tell dashboards about a new or changed schedule"""
+    events.publish('schedule', dict(describe_schedule(schedule_item),
+                                    next_due=next_due.strftime('%Y-%m-%d %H:%M') if next_due else None))
+
+def page_args(default_order='asc'):
+    """(limit, cursor, descending) from the query string of a list request"""
+    limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    order = request.args.get('order', default_order)
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"order must be 'asc' or 'desc', not {order!r}")
+    return limit, request.args.get('cursor') or None, order == 'desc'
+
+def store_page(collection, **filters):
+    """One page of a store collection for the current list request"""
+    limit, cursor, descending = page_args()
+    return store.page(collection, limit=limit, cursor=cursor, descending=descending,
+                      sort=request.args.get('sort', 'created'), **filters)
+
+def record_send(recipient, message, status, phone=None, was_pending=False):
+    """Add message to history and update statistics"""
+    entry = {'recipient': recipient, 'message': message, 'status': status}
+    if phone:
+        entry['phone'] = phone
+    entry = history.append(entry)
+    stats.record(status, recipient=phone or recipient, was_pending=was_pending)
+    events.publish('history', entry)
+    publish_stats()
+
+# A fire handled more than this late is a misfire and follows the
+# schedule's misfire policy:
+#   skip:      drop the missed fires and wait for the next one
+#   fire_once: send once for everything that was missed
+#   fire_all:  send every missed fire, `misfire_spacing` seconds apart
+MISFIRE_GRACE = timedelta(minutes=1)
+MISFIRE_POLICIES = ('skip', 'fire_once', 'fire_all')
+DEFAULT_MISFIRE_POLICY = 'fire_once'
+DEFAULT_MISFIRE_SPACING = 60
+# Never owe more than this many fires per schedule
+MAX_MISFIRE_BACKLOG = 100
+# Late fires from all schedules are paced at least this far apart so a
+# restart after downtime does not flood the browser
+CATCHUP_SPACING = timedelta(seconds=10)
+WATERMARK_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Catch-up pacing state; only touched from the timer thread
+next_catchup_at = datetime.min
+catchup_turns = {}
+
+def fire_baseline(schedule_item):
+    """Fires after this moment are still owed by a schedule"""
+    if schedule_item.get('last_fired'):
+        return datetime.strptime(schedule_item['last_fired'], WATERMARK_FORMAT)
+    if schedule_item.get('created_at'):
+        return datetime.strptime(schedule_item['created_at'], WATERMARK_FORMAT) - MISFIRE_GRACE
+    # Schedules from before watermarks were kept: only the grace period is owed
+    return datetime.now() - MISFIRE_GRACE
+
+def catchup_turn(schedule_id, now):
+    """Pace late fires: None if this schedule may send now, else when to retry"""
+    global next_catchup_at
+    turn = catchup_turns.pop(schedule_id, None)
+    if turn is not None and turn <= now:
+        return None
+    turn = max(next_catchup_at, now)
+    next_catchup_at = turn + CATCHUP_SPACING
+    if turn <= now:
+        return None
+    catchup_turns[schedule_id] = turn
+    return turn
+
+def fire_schedule(schedule_id, due):
+    """Timer callback: queue what a schedule owes and return its next fire time"""
+    schedule_item = store.get_schedule(schedule_id)
+    if not schedule_item or not schedule_item.get('active', True):
+        logging.info(f"[SCHEDULER] Schedule {schedule_id} no longer active")
+        return None
+    recurrence = Recurrence.from_schedule(schedule_item)
     now = datetime.now()
-    logging.info(f"[SCHEDULER] Starting schedule check at {now}")
+    baseline = fire_baseline(schedule_item)
+    owed = recurrence.between(baseline, now, limit=MAX_MISFIRE_BACKLOG)
+    if not owed:
+        return recurrence.next_fire(now)
     
-    for schedule_item in config['scheduled_messages']:
-        if not schedule_item.get('active', True):
-            continue
-            
-        # Parse schedule time
-        try:
-            schedule_time = datetime.strptime(schedule_item['time'], '%H:%M').time()
-            schedule_date = datetime.strptime(schedule_item['date'], '%Y-%m-%d').date()
-            schedule_datetime = datetime.combine(schedule_date, schedule_time)
-            
-            # Add a 5-minute buffer to handle slight time differences
-            buffer = timedelta(minutes=5)
-            
-            # Only skip if the schedule is more than 5 minutes in the past
-            if schedule_datetime < (now - buffer):
-                logging.info(f"[SCHEDULER] Skipping past schedule: {schedule_item['id']} at {schedule_datetime}")
-                continue
-                
-        except Exception as e:
-            logging.error(f"[SCHEDULER] Error parsing schedule {schedule_item.get('id')}: {str(e)}")
-            continue
-            
-        # Find recipient and template
-        recipient = next((r for r in config['recipients'] 
-                        if str(r['id']) == str(schedule_item['recipient_id'])), None)
-        template = next((t for t in config['message_templates'] 
-                        if str(t['id']) == str(schedule_item['template_id'])), None)
-                        
+    policy = schedule_item.get('misfire_policy', DEFAULT_MISFIRE_POLICY)
+    # The watermark moves to the latest owed fire, even past a capped backlog
+    fired = owed[-1] if len(owed) < MAX_MISFIRE_BACKLOG else recurrence.last_between(baseline, now)
+    next_due = recurrence.next_fire(now)
+    send = True
+    if owed[0] < now - MISFIRE_GRACE:
+        logging.warning(f"[SCHEDULER] Schedule {schedule_id} missed {len(owed)} fire(s) since {owed[0]} ({policy})")
+        if policy == 'skip':
+            send = False
+        else:
+            retry = catchup_turn(schedule_id, now)
+            if retry is not None:
+                return retry
+            if policy == 'fire_all' and len(owed) > 1:
+                # Send the oldest now and come back for the rest
+                fired = owed[0]
+                spacing = timedelta(seconds=float(schedule_item.get('misfire_spacing', DEFAULT_MISFIRE_SPACING)))
+                next_due = now + spacing
+    
+    if send:
+        recipient = store.get_recipient(schedule_item['recipient_id'])
+        template = store.get_template(schedule_item['template_id'])
         if recipient and template:
-            logging.info(f"[SCHEDULER] Setting up future schedule: {schedule_item['id']} for {schedule_datetime}")
-            setup_scheduled_message(schedule_item, recipient, template)
+            logging.info(f"[SCHEDULER] Schedule {schedule_id} fire for {fired}, queueing message for {recipient.get('name')}")
+            send_scheduled_message(recipient, template)
         else:
-            logging.warning(f"[SCHEDULER] Could not find recipient or template for schedule {schedule_item['id']}")
+            logging.warning(f"[SCHEDULER] Could not find recipient or template for schedule {schedule_id}")
+    
+    # Persist the watermark so a restart knows what has been handled
+    schedule_item = store.update_schedule(schedule_id, last_fired=fired.strftime(WATERMARK_FORMAT))
+    if schedule_item:
+        publish_schedule(schedule_item, next_due)
+    return next_due
+
+def first_fire_time(schedule_item):
+    """When a newly armed schedule should first fire, or None
+
+    Schedules that owe fires from before a restart are due immediately;
+    fire_schedule then applies their misfire policy.
+    """
+    try:
+        now = datetime.now()
+        due = Recurrence.from_schedule(schedule_item).next_fire(fire_baseline(schedule_item))
+    except RecurrenceError as e:
+        logging.error(f"[SCHEDULER] Ignoring schedule {schedule_item.get('id')}: {str(e)}")
+        return None
+    if due is None:
+        logging.info(f"[SCHEDULER] Schedule {schedule_item['id']} has no future fire time")
+        return None
+    logging.info(f"[SCHEDULER] Schedule {schedule_item['id']} ({schedule_item['type']}) next due at {due}")
+    return max(due, now)
+
+@app.route('/check_schedules', methods=['GET'])
+def check_schedules():
+    """Bring the timer in line with the stored schedules"""
+    logging.info("[SCHEDULER] Manually triggered schedule check")
+    result = reconciler.reconcile()
+    return jsonify({'status': 'success', 'message': 'Schedule check completed', 'changes': result})
 
 def send_scheduled_message(recipient, template):
-    """Send a scheduled message"""
+    """Queue a scheduled message for the dispatch worker"""
     try:
         logging.info(f"Attempting to send message to {recipient.get('name', 'Unknown')} with template {template.get('name', 'Unknown')}")
-        message = template['content'].format(name=recipient['name'])
+        message = render_message(template, recipient)
         logging.info(f"Formatted message: {message[:100]}{'...' if len(message) > 100 else ''}")
-        success = send_whatsapp_message(recipient['phone'], message)
-        status = 'success' if success else 'error'
-        logging.info(f"Message send status: {status}")
-        add_to_history(recipient['name'], message, status)
-        update_stats(status)
-        return success
+        job = enqueue_message(recipient, message)
+        logging.info(f"Message queued as job {job.id}")
+        return job
     except Exception as e:
         error_msg = f"Error sending scheduled message: {str(e)}"
         logging.error(error_msg, exc_info=True)
         if 'recipient' in locals() and 'template' in locals():
-            add_to_history(recipient.get('name', 'Unknown'), 
-                         template.get('content', 'No content'), 
-                         'error')
-            update_stats('error')
-        return False
+            record_send(recipient.get('name', 'Unknown'), 
+                        template.get('content', 'No content'), 
+                        'error', recipient.get('phone'))
+        return None
+
+def render_message(template, recipient):
+    """Fill a template's placeholders for one recipient"""
+    return templates.render(template, recipient)
+
+def enqueue_message(recipient, message, **meta):
+    """Queue a message on a browser session and return the job
 
-def send_whatsapp_message(phone, message):
-    global bot
+    Raises:
+        InvalidPhoneNumber: before anything is queued, so a bad number
+            never costs a browser page load
+        KnownInvalidNumber: WhatsApp already rejected this number
+    """
+    phone = normalize_phone(recipient['phone'])
+    entry = invalid_numbers.check(phone)
+    if entry:
+        raise KnownInvalidNumber(f"+{phone} was reported invalid by WhatsApp ({entry['reason']}); "
+                                 f"clear it at /invalid_numbers to retry")
+    stats.add_pending()
+    publish_stats()
+    return pool.submit(phone, message,
+                       recipient_id=recipient.get('id'),
+                       recipient_name=recipient.get('name'),
+                       **meta)
+
+def enqueue_campaign_message(recipient, template, campaign_id):
+    """Queue one campaign message; used by the campaign runners"""
     try:
-        # Use the existing bot instance if available
-        if not bot:
-            logging.error("Bot is not initialized. Please start the bot first.")
-            return False
-            
-        driver = bot  # Use the existing browser instance
-        
-        # Format phone number
-        phone = phone.replace('+', '').replace(' ', '')
-        
-        # Navigate to WhatsApp Web
-        driver.get(f'https://web.whatsapp.com/send?phone={phone}&text={message}')
-        
-        # Wait for send button and click it
-        send_button = WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.XPATH, "//span[@data-icon='send']"))
-        )
-        send_button.click()
-        
-        # Wait for message to be sent
-        time.sleep(2)
-        driver.quit()
-        return True
-    except Exception as e:
-        logging.error(f"Error sending message: {str(e)}")
-        if 'driver' in locals():
-            driver.quit()
-        return False
+        message = render_message(template, recipient)
+        return enqueue_message(recipient, message, campaign_id=campaign_id)
+    except (TemplateError, InvalidPhoneNumber) as e:
+        logging.warning(f"[CAMPAIGN] {campaign_id}: {str(e)}")
+        record_send(recipient.get('name', 'Unknown'), template['content'], 'error', recipient.get('phone'))
+        return None
 
-def run_scheduler():
-    """Run the scheduler in the main thread"""
-    logging.info("[SCHEDULER] Scheduler started")
-    last_check = time.time()
-    
-    while is_bot_running:
-        try:
-            current_time = time.time()
-            
-            # Log job status every 30 seconds
-            if current_time - last_check > 30:
-                jobs = schedule.jobs
-                if jobs:
-                    next_run = min(job.next_run for job in jobs) if jobs else None
-                    logging.info(f"[SCHEDULER] {len(jobs)} pending jobs, next run: {next_run}")
-                    for i, job in enumerate(jobs, 1):
-                        logging.info(f"  Job {i}: {job.job_func.__name__} at {job.next_run}")
-                else:
-                    logging.info("[SCHEDULER] No pending jobs")
-                last_check = current_time
-            
-            # Run pending jobs
-            schedule.run_pending()
-            
-            # Small delay to prevent high CPU usage
-            time.sleep(1)
-            
-        except Exception as e:
-            logging.error(f"[SCHEDULER] Error in scheduler: {str(e)}", exc_info=True)
-            time.sleep(5)  # Wait before retrying if there's an error
+def on_send_cancelled(job):
+    """A queued send was dropped (campaign paused or cancelled)"""
+    stats.add_pending(-1)
+    publish_stats()
+
+def on_send_complete(job, success):
+    """Record history and stats once a session worker has finished a send"""
+    status = 'success' if success else 'error'
+    logging.info(f"[DISPATCH] Job {job.id} to {job.phone} on {job.meta.get('session')} finished with status {status}")
+    record_send(job.meta.get('recipient_name') or job.phone, job.message, status, job.phone,
+                was_pending=True)
+    events.publish('job', job.to_dict())
+
+# WhatsApp Web sessions, one browser profile and worker thread each
+SESSION_COUNT = int(os.environ.get('WHATSAPP_SESSIONS', '1'))
+ROUTING_POLICY = os.environ.get('WHATSAPP_ROUTING', 'round_robin')
+BASE_DEBUG_PORT = 9222
+BOT_START_TIMEOUT = 180
+# 'selenium' (WebDriver commands) or 'cdp' (DevTools websocket, needs websocket-client)
+BOT_TRANSPORT = os.environ.get('WHATSAPP_TRANSPORT', 'selenium')
+# The Edge driver path is cached locally; offline mode never downloads one
+DRIVER_CACHE_PATH = 'driver_cache.json'
+OFFLINE_MODE = os.environ.get('WHATSAPP_OFFLINE', '').lower() in ('1', 'true', 'yes')
+# Phase timings of the last start_bot()
+last_startup = None
+# DOM locator ranking shared by all sessions and kept across restarts
+LOCATORS_PATH = 'locators.json'
+locators = LocatorRegistry(LOCATORS_PATH)
+
+def on_invalid_number(phone, entry):
+    """Flag (or clear the flag on) the recipient with this number"""
+    recipient = store.find_recipient_by_phone(phone)
+    if recipient:
+        recipient = store.update_recipient(recipient['id'], whatsapp_invalid=entry['reason'] if entry else None)
+        events.publish('recipient', recipient)
+
+# Numbers WhatsApp reported as invalid; sends to them fail without a page load until they expire
+INVALID_NUMBERS_PATH = 'invalid_numbers.json'
+INVALID_NUMBER_TTL = float(os.environ.get('WHATSAPP_INVALID_TTL_DAYS', '30')) * 24 * 3600
+invalid_numbers = InvalidNumberCache(INVALID_NUMBERS_PATH, ttl=INVALID_NUMBER_TTL, on_change=on_invalid_number)
+pool = SessionPool(size=SESSION_COUNT, base_port=BASE_DEBUG_PORT, policy=ROUTING_POLICY,
+                   on_complete=on_send_complete, on_cancel=on_send_cancelled,
+                   bot_options={'locators': locators, 'transport': BOT_TRANSPORT},
+                   invalid_numbers=invalid_numbers)
+# Heartbeat that restarts crashed sessions and replays their held sends
+monitor = HealthMonitor(pool, interval=float(os.environ.get('WHATSAPP_HEARTBEAT', '5')))
+
+# Bulk campaigns, checkpointed so they resume after a restart
+CAMPAIGNS_PATH = 'campaigns.json'
+campaigns = CampaignManager(store, enqueue_campaign_message, CAMPAIGNS_PATH,
+                            max_in_flight=2 * SESSION_COUNT)
+campaigns.resume_all()
+
+reconciler = ScheduleReconciler(store, scheduler, first_fire_time, fire_schedule)
+
+def timed(timings, name, func, *args):
+    """Run `func` and record its duration in `timings[name]`"""
+    started = time.time()
+    try:
+        return func(*args)
+    finally:
+        timings[name] = round(time.time() - started, 3)
 
 def start_bot():
-    """Start the WhatsApp bot"""
-    global bot, bot_thread, is_bot_running
+    """Start the WhatsApp bot sessions
+
+    Driver resolution, schedule reconciliation and each session's profile
+    check run in parallel; a per-phase timing report is logged and kept in
+    `last_startup`.
+    """
+    global is_bot_running, last_startup
     
+    started = time.time()
+    timings = {}
     try:
-        # Set up Edge options
-        edge_options = EdgeOptions()
-        
-        # Add these essential arguments
-        edge_options.add_argument("--no-sandbox")
-        edge_options.add_argument("--disable-dev-shm-usage")
-        edge_options.add_argument("--disable-gpu")
-        edge_options.add_argument("--start-maximized")
-        edge_options.add_argument("--remote-debugging-port=9222")
-        
-        # Add SSL error handling
-        edge_options.add_argument('--ignore-certificate-errors')
-        edge_options.add_argument('--ignore-ssl-errors=yes')
-        edge_options.add_argument('--allow-insecure-localhost')
-        
-        # Set user data directory
-        user_data_dir = os.path.abspath(os.path.join(os.getcwd(), "whatsapp_bot_profile"))
-        if not os.path.exists(user_data_dir):
-            os.makedirs(user_data_dir)
-        edge_options.add_argument(f"user-data-dir={user_data_dir}")
-        
-        # Disable automation flags and identity features
-        edge_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
-        edge_options.add_experimental_option('useAutomationExtension', False)
-        edge_options.add_argument("--disable-features=msEdgeAccountProfile")
-        
-        # Initialize the WebDriver with better error handling
-        try:
-            service = EdgeService(EdgeChromiumDriverManager().install())
-            bot = webdriver.Edge(service=service, options=edge_options)
-            logging.info("WebDriver initialized successfully")
-        except Exception as e:
-            logging.error(f"Failed to initialize WebDriver: {str(e)}", exc_info=True)
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='startup') as executor:
+            driver_future = executor.submit(timed, timings, 'driver_resolve', resolve_driver_path,
+                                            DRIVER_CACHE_PATH, OFFLINE_MODE)
+            schedules_future = executor.submit(timed, timings, 'schedules', reconciler.reconcile)
+            results = timed(timings, 'sessions', pool.start, BOT_START_TIMEOUT, driver_future)
+            schedules_future.result()
+        
+        timings['total'] = round(time.time() - started, 3)
+        last_startup = dict(timings, sessions_detail={s.name: s.bot.startup_timings for s in pool.sessions})
+        logging.info(f"[STARTUP] {', '.join(f'{k}={v:.2f}s' for k, v in timings.items())}")
+        
+        if not any(results.values()):
+            logging.error("Timeout waiting for WhatsApp Web to load")
             return False
+        logging.info(f"Successfully logged in to WhatsApp Web ({sum(results.values())}/{len(results)} sessions)")
         
-        try:
-            # Navigate to WhatsApp Web
-            logging.info("Navigating to WhatsApp Web...")
-            bot.get('https://web.whatsapp.com')
-            
-            # Wait for QR code scan with better timeout handling
-            try:
-                WebDriverWait(bot, 120).until(
-                    EC.presence_of_element_located((By.XPATH, '//div[@id="side"]'))
-                )
-                logging.info("Successfully logged in to WhatsApp Web")
-            except TimeoutException:
-                logging.error("Timeout waiting for WhatsApp Web to load")
-                return False
-            
-            is_bot_running = True
-            
-            # Set up all schedules
-            setup_all_schedules()
-            logging.info("All schedules set up successfully")
-            
-            return True
-            
-        except Exception as e:
-            logging.error(f"Error during WhatsApp Web navigation: {str(e)}", exc_info=True)
-            if 'bot' in locals() and bot:
-                bot.quit()
-            return False
+        is_bot_running = True
+        campaigns.set_ready(True)
+        scheduler.start()
+        monitor.start()
+        
+        return True
         
     except Exception as e:
         logging.error(f"Critical error in start_bot: {str(e)}", exc_info=True)
-        if 'bot' in locals() and bot:
-            try:
-                bot.quit()
-            except:
-                pass
         return False
 
 def stop_bot():
     """Stop the WhatsApp bot"""
-    global bot, bot_thread, scheduler_thread, is_bot_running
+    global is_bot_running
     
     try:
         is_bot_running = False
-        if bot:
-            bot.quit()
-        if scheduler_thread:
-            scheduler_thread.join()
+        campaigns.set_ready(False)
+        scheduler.stop()
+        monitor.stop()
+        pool.stop()
         return True
     except Exception as e:
         logging.error(f"Error stopping bot: {str(e)}")
@@ -434,24 +433,186 @@ def stop_bot():
 @app.route('/')
 def index():
     """Render the main page"""
-    config = load_config()
-    return render_template('index.html',
-                         recipients=config['recipients'],
-                         templates=config['message_templates'],
-                         scheduled_messages=config['scheduled_messages'],
-                         message_history=config['message_history'],
-                         stats=config['stats'])
+    # The lists are fetched page by page from the JSON endpoints
+    return render_template('index.html', stats=stats.totals())
+
+@app.route('/events', methods=['GET'])
+def event_stream():
+    """Server-Sent Events: history, stats, job, schedule, recipient, template and bot updates"""
+    stream = events.stream(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/queue', methods=['GET'])
+def queue_status():
+    """Return dispatch queue depth, wait times and session health"""
+    return jsonify({'status': 'success', 'queue': pool.metrics()})
+
+@app.route('/health', methods=['GET'])
+def health_status():
+    """Return each session's heartbeat state and restart count"""
+    return jsonify({'status': 'success', 'health': monitor.summary()})
+
+@app.route('/scheduler', methods=['GET'])
+def scheduler_status():
+    """Return the timer's state and the next scheduled fires"""
+    limit = request.args.get('limit', default=10, type=int)
+    return jsonify({
+        'status': 'success',
+        'scheduler': dict(scheduler.summary(), **reconciler.summary()),
+        'upcoming': [{'schedule_id': key, 'due': due.strftime('%Y-%m-%d %H:%M:%S')}
+                     for due, key in scheduler.upcoming(limit)]
+    })
+
+@app.route('/locators', methods=['GET'])
+def locator_ranking():
+    """Return the DOM locator ranking with hit/miss counts and latency"""
+    return jsonify({'status': 'success', 'locators': locators.summary()})
+
+@app.route('/stats', methods=['GET'])
+def stats_summary():
+    """Return message counters with daily and per-recipient rollups"""
+    days = request.args.get('days', default=30, type=int)
+    return jsonify({
+        'status': 'success',
+        'totals': stats.totals(),
+        'daily': stats.daily(days),
+        'top_recipients': stats.top_recipients(request.args.get('top', default=10, type=int))
+    })
+
+@app.route('/invalid_numbers', methods=['GET'])
+def list_invalid_numbers():
+    """Return the numbers sends are skipped for, with hit counts"""
+    return jsonify({'status': 'success', 'summary': invalid_numbers.summary(),
+                    'numbers': invalid_numbers.entries()})
+
+@app.route('/invalid_numbers', methods=['POST'])
+def block_number():
+    """Block a number by hand: JSON {"phone", "reason"?, "ttl_days"? (0 = never expires)}"""
+    data = request.get_json(silent=True) or request.form
+    try:
+        phone = normalize_phone(data.get('phone'))
+        ttl_days = data.get('ttl_days')
+        ttl = float(ttl_days) * 24 * 3600 if ttl_days not in (None, '') else None
+    except (InvalidPhoneNumber, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    entry = invalid_numbers.add(phone, reason=data.get('reason') or 'blocked', ttl=ttl, source='manual')
+    return jsonify({'status': 'success', 'message': f'+{phone} blocked', 'entry': dict(entry, phone=phone)})
+
+@app.route('/invalid_numbers/<phone>', methods=['DELETE'])
+def clear_invalid_number(phone):
+    """Manual override: allow sends to a number again"""
+    try:
+        phone = normalize_phone(phone)
+    except InvalidPhoneNumber as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if not invalid_numbers.remove(phone):
+        return jsonify({'status': 'error', 'message': f'+{phone} is not blocked'}), 404
+    return jsonify({'status': 'success', 'message': f'+{phone} cleared'})
+
+@app.route('/campaigns', methods=['GET'])
+def list_campaigns():
+    """Return every campaign with its progress"""
+    return jsonify({'status': 'success', 'campaigns': campaigns.list()})
+
+@app.route('/campaigns', methods=['POST'])
+def create_campaign():
+    """Send a template to all recipients, a list of ids, or a filter"""
+    try:
+        data = request.json or {}
+        campaign = campaigns.create(data.get('template_id'),
+                                    recipients=data.get('recipients', 'all'),
+                                    name=data.get('name'),
+                                    rate_per_minute=data.get('rate_per_minute', 6))
+        return jsonify({'status': 'success', 'campaign': campaign}), 201
+    except (CampaignError, ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+@app.route('/campaigns/<campaign_id>', methods=['GET'])
+def campaign_progress(campaign_id):
+    """Return one campaign's progress and throughput"""
+    campaign = campaigns.progress(campaign_id)
+    if campaign is None:
+        return jsonify({'status': 'error', 'message': 'Campaign not found'}), 404
+    return jsonify({'status': 'success', 'campaign': campaign})
+
+@app.route('/campaigns/<campaign_id>/<action>', methods=['POST'])
+def campaign_action(campaign_id, action):
+    """Pause, resume or cancel a campaign"""
+    handlers = {'pause': campaigns.pause, 'resume': campaigns.resume, 'cancel': campaigns.cancel}
+    if action not in handlers:
+        return jsonify({'status': 'error', 'message': f'Unknown action: {action}'}), 404
+    try:
+        return jsonify({'status': 'success', 'campaign': handlers[action](campaign_id)})
+    except CampaignError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+@app.route('/history', methods=['GET'])
+def history_page():
+    """Return one page of message history, newest first unless ?order=asc
+
+    Filters: status, recipient (name or phone substring), since and until
+    ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS', inclusive).
+    """
+    try:
+        limit, cursor, descending = page_args(default_order='desc')
+        entries, next_cursor = history.page(limit=limit, cursor=cursor, oldest_first=not descending,
+                                            status=request.args.get('status') or None,
+                                            recipient=request.args.get('recipient') or None,
+                                            since=request.args.get('since') or None,
+                                            until=request.args.get('until') or None)
+        return jsonify({'status': 'success', 'history': entries, 'next_cursor': next_cursor})
+    except (ValueError, OSError) as e:
+        return jsonify({'status': 'error', 'message': f'Invalid history request: {str(e)}'}), 400
+
+@app.route('/recipients', methods=['GET'])
+def recipients_page():
+    """Return one page of recipients (?search=, ?sort=created|name|phone, ?order=asc|desc)"""
+    try:
+        recipients, next_cursor = store_page('recipients', search=request.args.get('search') or None)
+        return jsonify({'status': 'success', 'recipients': recipients, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid recipients request: {str(e)}'}), 400
+
+@app.route('/templates', methods=['GET'])
+def templates_page():
+    """Return one page of templates (?search=, ?sort=created|name, ?order=asc|desc)"""
+    try:
+        templates, next_cursor = store_page('message_templates', search=request.args.get('search') or None)
+        return jsonify({'status': 'success', 'templates': templates, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid templates request: {str(e)}'}), 400
+
+@app.route('/schedules', methods=['GET'])
+def schedules_page():
+    """Return one page of schedules (?recipient_id=, ?template_id=, ?status=active|inactive)"""
+    try:
+        status = request.args.get('status') or None
+        if status not in (None, 'active', 'inactive'):
+            raise ValueError(f"status must be 'active' or 'inactive', not {status!r}")
+        schedules, next_cursor = store_page('scheduled_messages',
+                                            recipient_id=request.args.get('recipient_id') or None,
+                                            template_id=request.args.get('template_id') or None,
+                                            active=None if status is None else status == 'active')
+        names = {}
+        return jsonify({'status': 'success',
+                        'schedules': [describe_schedule(item, names) for item in schedules],
+                        'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid schedules request: {str(e)}'}), 400
 
 @app.route('/start_bot', methods=['POST'])
 def start_bot_route():
     """Start the WhatsApp bot"""
     success = start_bot()
-    return jsonify({'success': success})
+    events.publish('bot', {'running': is_bot_running})
+    return jsonify({'success': success, 'startup': last_startup})
 
 @app.route('/stop_bot', methods=['POST'])
 def stop_bot_route():
     """Stop the WhatsApp bot"""
     success = stop_bot()
+    events.publish('bot', {'running': is_bot_running})
     return jsonify({'success': success})
 
 @app.route('/add_recipient', methods=['POST'])
@@ -465,27 +626,26 @@ def add_recipient():
         if not name or not phone:
             return jsonify({'status': 'error', 'message': 'Name and phone number are required'}), 400
             
-        # Remove any non-digit characters from phone number
-        phone = ''.join(filter(str.isdigit, phone))
+        # Any other form fields are kept for templates ({company}, {city}, ...)
+        fields = {key: value for key, value in request.form.items()
+                  if key.isidentifier() and key not in ('id', 'name', 'phone') and value}
         
-        config = load_config()
+        # Stored in E.164 form, as bulk imports are
+        try:
+            phone = normalize_phone(phone)
+        except InvalidPhoneNumber as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
         
-        # Check if recipient already exists
-        if any(r['phone'] == phone for r in config['recipients']):
+        # Check if recipient already exists (indexed lookup)
+        if store.find_recipient_by_phone(phone):
             return jsonify({'status': 'error', 'message': 'Recipient with this phone number already exists'}), 400
         
-        # Generate unique ID
-        recipient_id = str(len(config['recipients']) + 1)
-        
-        new_recipient = {
-            'id': recipient_id,
-            'name': name,
-            'phone': phone
-        }
-        
-        config['recipients'].append(new_recipient)
-        save_config(config)
+        try:
+            new_recipient = store.add_recipient({**fields, 'name': name, 'phone': phone})
+        except DuplicateRecordError:
+            return jsonify({'status': 'error', 'message': 'Recipient with this phone number already exists'}), 400
         
+        events.publish('recipient', new_recipient)
         return jsonify({
             'status': 'success',
             'message': 'Recipient added successfully',
@@ -499,6 +659,38 @@ def add_recipient():
             'message': f'Failed to add recipient: {str(e)}'
         }), 500
 
+@app.route('/recipients/import', methods=['POST'])
+def import_recipients():
+    """Import recipients from a CSV or vCard file
+
+    Send the file as a multipart 'file' field, or as the raw request body
+    (text/csv or text/vcard). Rows are streamed in and written in
+    batches; known phone numbers and invalid rows are reported, not imported.
+    """
+    upload = request.files.get('file')
+    try:
+        if upload:
+            report = import_contacts(store, open_text(upload.stream), filename=upload.filename,
+                                     file_format=request.form.get('format') or None,
+                                     default_country=request.form.get('country') or None)
+        else:
+            file_format = request.args.get('format') or ('vcard' if 'vcard' in (request.mimetype or '') else None)
+            report = import_contacts(store, open_text(request.stream), file_format=file_format,
+                                     default_country=request.args.get('country') or None)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid import: {str(e)}'}), 400
+    except Exception as e:
+        logging.error(f"[IMPORT] Error importing recipients: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': f'Failed to import recipients: {str(e)}'}), 500
+
+    if report.added:
+        events.publish('recipients_imported', {'added': report.added})
+    return jsonify({
+        'status': 'success',
+        'message': f'Imported {report.added} of {report.rows} rows',
+        'report': report.to_dict()
+    })
+
 @app.route('/add_template', methods=['POST'])
 def add_template():
     """Add a new message template"""
@@ -510,24 +702,21 @@ def add_template():
         if not name or not content:
             return jsonify({'status': 'error', 'message': 'Template name and content are required'}), 400
             
-        config = load_config()
-        
+        try:
+            compile_template(content)
+        except TemplateError as e:
+            return jsonify({'status': 'error', 'message': f'Invalid template: {str(e)}'}), 400
+            
         # Check if template with this name already exists
-        if any(t['name'].lower() == name.lower() for t in config['message_templates']):
+        if store.find_template_by_name(name):
             return jsonify({'status': 'error', 'message': 'A template with this name already exists'}), 400
         
-        # Generate unique ID
-        template_id = str(len(config['message_templates']) + 1)
-        
-        new_template = {
-            'id': template_id,
-            'name': name,
-            'content': content
-        }
-        
-        config['message_templates'].append(new_template)
-        save_config(config)
+        try:
+            new_template = store.add_template({'name': name, 'content': content, 'version': 1})
+        except DuplicateRecordError:
+            return jsonify({'status': 'error', 'message': 'A template with this name already exists'}), 400
         
+        events.publish('template', new_template)
         return jsonify({
             'status': 'success',
             'message': 'Template added successfully',
@@ -541,6 +730,48 @@ def add_template():
             'message': f'Failed to add template: {str(e)}'
         }), 500
 
+@app.route('/update_template/<template_id>', methods=['POST'])
+def update_template(template_id):
+    """Edit a template's name or content"""
+    changes = {key: request.form[key] for key in ('name', 'content') if request.form.get(key)}
+    if not changes:
+        return jsonify({'status': 'error', 'message': 'Template name or content is required'}), 400
+    try:
+        if 'content' in changes:
+            compile_template(changes['content'])
+        template = store.update_template(template_id, **changes)
+    except TemplateError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid template: {str(e)}'}), 400
+    except DuplicateRecordError:
+        return jsonify({'status': 'error', 'message': 'A template with this name already exists'}), 400
+    if template is None:
+        return jsonify({'status': 'error', 'message': 'Template not found'}), 404
+    events.publish('template', template)
+    return jsonify({'status': 'success', 'message': 'Template updated successfully', 'template': template})
+
+@app.route('/templates/<template_id>/preview', methods=['POST'])
+def preview_template(template_id):
+    """Render a template for the given recipient ids (all when omitted)"""
+    template = store.get_template(template_id)
+    if template is None:
+        return jsonify({'status': 'error', 'message': 'Template not found'}), 404
+    recipient_ids = (request.json or {}).get('recipient_ids') if request.is_json else None
+    if recipient_ids:
+        recipients = [r for r in map(store.get_recipient, recipient_ids) if r]
+    else:
+        recipients = store.list_recipients()
+    try:
+        rendered = templates.render_batch(template, recipients)
+    except TemplateError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid template: {str(e)}'}), 400
+    return jsonify({
+        'status': 'success',
+        'fields': list(templates.compile(template).fields),
+        'messages': [{'recipient_id': r.get('id'), 'message': message, 'error': error}
+                     for r, message, error in rendered],
+        'cache': templates.summary()
+    })
+
 @app.route('/schedule_message', methods=['POST'])
 def schedule_message():
     """Schedule a new message"""
@@ -551,18 +782,16 @@ def schedule_message():
         template_id = request.form.get('template')
         time = request.form.get('time')
         
-        # Validate required fields
-        if not all([schedule_type, recipient_id, template_id, time]):
+        # Validate required fields (cron expressions carry their own time)
+        if not all([schedule_type, recipient_id, template_id, time or schedule_type == 'cron']):
             return jsonify({
                 'status': 'error',
                 'message': 'All fields are required'
             }), 400
         
-        config = load_config()
-        
         # Validate recipient and template
-        recipient = next((r for r in config['recipients'] if r['id'] == recipient_id), None)
-        template = next((t for t in config['message_templates'] if t['id'] == template_id), None)
+        recipient = store.get_recipient(recipient_id)
+        template = store.get_template(template_id)
         
         if not recipient:
             return jsonify({
@@ -580,9 +809,24 @@ def schedule_message():
         schedule_data = {
             'type': schedule_type,
             'time': time,
-            'active': True
+            'active': True,
+            'created_at': datetime.now().strftime(WATERMARK_FORMAT)
         }
         
+        # What to do with fires missed while the app was down
+        misfire_policy = request.form.get('misfire_policy') or DEFAULT_MISFIRE_POLICY
+        if misfire_policy not in MISFIRE_POLICIES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Misfire policy must be one of {', '.join(MISFIRE_POLICIES)}"
+            }), 400
+        schedule_data['misfire_policy'] = misfire_policy
+        if misfire_policy == 'fire_all':
+            try:
+                schedule_data['misfire_spacing'] = max(float(request.form.get('misfire_spacing') or DEFAULT_MISFIRE_SPACING), 0)
+            except ValueError:
+                return jsonify({'status': 'error', 'message': 'Misfire spacing must be a number of seconds'}), 400
+        
         # Add type-specific fields
         if schedule_type == 'weekly':
             days = request.form.getlist('days[]')
@@ -608,32 +852,38 @@ def schedule_message():
                     'message': 'Please select a date for one-time schedule'
                 }), 400
             schedule_data['date'] = date
+        elif schedule_type == 'cron':
+            schedule_data['cron'] = request.form.get('cron', '').strip()
+            schedule_data.pop('time')
         
-        # Generate unique ID
-        new_id = str(len(config['scheduled_messages']) + 1)
-        
-        # Log the schedule details
-        logging.info(f"[SCHEDULER] Creating new schedule - ID: {new_id}, Type: {schedule_type}, Time: {time}")
-        
-        # Create new schedule
-        new_schedule = {
-            'id': new_id,
+        # Reject timing fields the recurrence engine cannot use
+        try:
+            after = datetime.now() - (MISFIRE_GRACE if schedule_type == 'one_time' else timedelta(0))
+            next_runs = Recurrence.from_schedule(schedule_data).upcoming(after, 3)
+        except RecurrenceError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        if not next_runs:
+            return jsonify({'status': 'error', 'message': 'This schedule would never fire'}), 400
+        
+        # Create new schedule (the store assigns a unique ID)
+        new_schedule = store.add_schedule({
             'recipient_id': recipient_id,
             'template_id': template_id,
             **schedule_data
-        }
+        })
         
-        config['scheduled_messages'].append(new_schedule)
-        save_config(config)
+        # Log the schedule details
+        logging.info(f"[SCHEDULER] Created new schedule - ID: {new_schedule['id']}, Type: {schedule_type}, Time: {time}")
         
-        # If bot is running, set up the schedule immediately
-        if is_bot_running and 'scheduler' in globals():
-            setup_scheduled_message(new_schedule, recipient, template)
+        # Arm the new schedule (it fires once the bot is running)
+        reconciler.reconcile()
+        publish_schedule(new_schedule, next_runs[0])
         
         return jsonify({
             'status': 'success',
             'message': 'Message scheduled successfully',
-            'schedule': new_schedule
+            'schedule': new_schedule,
+            'next_runs': [due.strftime('%Y-%m-%d %H:%M') for due in next_runs]
         })
         
     except Exception as e:
@@ -645,35 +895,66 @@ def schedule_message():
 
 @app.route('/send_message', methods=['POST'])
 def send_message():
-    """Send a message immediately"""
+    """Queue a message for immediate sending
+
+    Takes `recipient_id` and `template_id`, or a free-text `phone` and
+    `message` (the dashboard's quick send). Returns 202 with the job id at once; the send completes on a session
+    worker and its outcome is read from /jobs/<id>.
+    """
     try:
-        data = request.json
-        config = load_config()
-        
-        recipient = next((r for r in config['recipients'] if r['id'] == data['recipient_id']), None)
-        template = next((t for t in config['message_templates'] if t['id'] == data['template_id']), None)
-        
-        if not recipient or not template:
-            return jsonify({'success': False, 'error': 'Invalid recipient or template'})
-        
-        message = template['content'].format(name=recipient['name'])
-        success = send_whatsapp_message(recipient['phone'], message)
-        
-        status = 'success' if success else 'error'
-        add_to_history(recipient['name'], message, status)
-        update_stats(status)
-        
-        return jsonify({'success': success})
+        data = request.get_json(silent=True) or request.form
+        if data.get('phone') and data.get('message'):
+            # Quick send: free text to any number
+            phone = normalize_phone(data['phone'])
+            recipient = store.find_recipient_by_phone(phone) or {'phone': phone, 'name': phone}
+            message = data['message']
+        else:
+            recipient = store.get_recipient(data.get('recipient_id'))
+            template = store.get_template(data.get('template_id'))
+            if not recipient or not template:
+                return jsonify({'status': 'error', 'message': 'Invalid recipient or template'}), 400
+            message = render_message(template, recipient)
+        
+        job = enqueue_message(recipient, message)
+        
+        return jsonify({'status': 'queued', 'message': 'Message queued', 'job_id': job.id,
+                        'job_url': f'/jobs/{job.id}'}), 202
+    except (TemplateError, InvalidPhoneNumber) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         logging.error(f"Error sending message: {str(e)}")
-        return jsonify({'success': False, 'error': str(e)})
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return one send job's status"""
+    job = pool.get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
+@app.route('/jobs', methods=['GET', 'POST'])
+def jobs_status():
+    """Return the status of many jobs at once
+
+    Ids come from `?ids=a,b,c` or a JSON body `{"ids": [...]}`; unknown (or
+    long forgotten) ids map to null.
+    """
+    if request.method == 'POST':
+        ids = (request.get_json(silent=True) or {}).get('ids') or []
+    else:
+        ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id]
+    if not isinstance(ids, list) or len(ids) > MAX_JOB_QUERY:
+        return jsonify({'status': 'error', 'message': f'Pass a list of at most {MAX_JOB_QUERY} job ids'}), 400
+    jobs = {}
+    for job_id in ids:
+        job = pool.get_job(str(job_id))
+        jobs[str(job_id)] = job.to_dict() if job else None
+    pending = sum(1 for job in jobs.values() if job and job['status'] in ('queued', 'running', 'held'))
+    return jsonify({'status': 'success', 'jobs': jobs, 'pending': pending})
 
 if __name__ == '__main__':
     try:
-        # Start the scheduler in a separate thread
-        scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-        scheduler_thread.start()
-        
         # Run Flask in the main thread
         logging.info("Starting Flask server on http://127.0.0.1:5000")
         app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,194 @@
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import logging
+
+from fake_whatsapp import FakeWhatsAppServer
+from session_pool import SessionPool
+from health import HealthMonitor
+from locators import LocatorRegistry
+from driver_cache import resolve_driver_path
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of `values` (0 when empty)"""
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def latency_summary(values):
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 0.50), 3),
+        'p95': round(percentile(values, 0.95), 3),
+        'p99': round(percentile(values, 0.99), 3),
+        'max': round(max(values), 3) if values else 0,
+    }
+
+
+def kill_driver(bot):
+    """Simulate a crash: kill msedgedriver behind the bot's back"""
+    process = getattr(bot.driver.service, 'process', None) if bot.driver else None
+    if process is not None:
+        process.kill()
+
+
+def count_commands(bot):
+    """Count the WebDriver commands `bot` issues from now on"""
+    executor = bot.driver.command_executor
+    original = executor.execute
+    counter = {'webdriver': 0}
+
+    def execute(command, params):
+        counter['webdriver'] += 1
+        return original(command, params)
+
+    executor.execute = execute
+    connection = getattr(bot.transport, 'connection', None)
+    counter['cdp_before'] = connection.commands if connection else 0
+    return counter
+
+
+def run(messages=50, recipients=10, sessions=1, crash_after=None, heartbeat=1.0, headless=True,
+        driver_path=None, seed=1, transport='selenium', **fake_settings):
+    """Send `messages` messages through a pool pointed at a local stand-in
+
+    Args:
+        messages (int): messages to send
+        recipients (int): distinct numbers to rotate through, so repeat
+            recipients exercise the in-app chat switch
+        sessions (int): browser sessions in the pool
+        crash_after (int): kill a session's driver once this many sends
+            finished, to measure recovery time
+        heartbeat (float): health monitor interval
+        headless (bool): run Edge without a window
+        transport (str): 'selenium' or 'cdp'
+        **fake_settings: FakeWhatsAppServer settings (latency, failure_rate, ...)
+
+    Returns:
+        dict: latency percentiles, throughput, failures and recovery time
+    """
+    server = FakeWhatsAppServer(seed=seed, **fake_settings).start()
+    profile_root = tempfile.mkdtemp(prefix='whatsapp_bench_')
+    bot_options = {'base_url': server.url, 'locators': LocatorRegistry(None), 'headless': headless,
+                   'transport': transport}
+    pool = SessionPool(size=sessions, profile_root=profile_root, base_port=9322, bot_options=bot_options)
+    monitor = HealthMonitor(pool, interval=heartbeat)
+    try:
+        started = time.time()
+        results = pool.start(timeout=180, driver_path=driver_path or resolve_driver_path(offline=True))
+        startup_seconds = time.time() - started
+        if not any(results.values()):
+            raise RuntimeError(f"No session started: {results}")
+        monitor.start()
+        counters = [(session.bot, count_commands(session.bot)) for session in pool.sessions if session.bot.driver]
+
+        phones = [f"1555{index:07d}" for index in range(recipients)]
+        started = time.time()
+        jobs = [pool.submit(phones[index % len(phones)], f"Benchmark message {index}\nline two")
+                for index in range(messages)]
+
+        crashed_at = None
+        crashed_session = None
+        recovered_at = None
+        for index, job in enumerate(jobs):
+            job.future.result(timeout=600)
+            if crash_after is not None and crashed_at is None and index + 1 >= crash_after:
+                session = next(s for s in pool.sessions if s.name == job.meta['session'])
+                print(f"💥 Killing the driver of {session.name} after {index + 1} sends")
+                crashed_at, crashed_session = time.time(), session.name
+                kill_driver(session.bot)
+            elif crashed_at and recovered_at is None and job.status == 'success' \
+                    and job.meta['session'] == crashed_session and job.finished_at > crashed_at \
+                    and (job.holds or job.started_at > crashed_at):
+                recovered_at = job.finished_at
+        elapsed = time.time() - started
+
+        succeeded = [job for job in jobs if job.status == 'success']
+        delivered = sum(1 for message in server.messages if message['delivered'])
+        webdriver_calls = sum(counter['webdriver'] for _, counter in counters)
+        cdp_calls = sum(bot.transport.connection.commands - counter['cdp_before'] for bot, counter in counters
+                        if bot.transport and hasattr(bot.transport, 'connection'))
+        return {
+            'messages': messages,
+            'sessions': sessions,
+            'transport': transport,
+            'settings': dict(server.settings),
+            'startup_seconds': round(startup_seconds, 3),
+            'send_latency': latency_summary([job.finished_at - job.started_at for job in succeeded]),
+            'end_to_end_latency': latency_summary([job.finished_at - job.created_at for job in succeeded]),
+            'messages_per_minute': round(len(succeeded) / elapsed * 60, 1) if elapsed else 0,
+            'succeeded': len(succeeded),
+            'failed': messages - len(succeeded),
+            'received_by_server': len(server.messages),
+            'delivered_by_server': delivered,
+            'recovery_seconds': round(recovered_at - crashed_at, 3) if recovered_at else None,
+            'webdriver_calls_per_message': round(webdriver_calls / messages, 1) if messages else 0,
+            'cdp_calls_per_message': round(cdp_calls / messages, 1) if messages else 0,
+            'restarts': sum(session.restarts for session in pool.sessions),
+            'paths': {name: summary['count'] for session in pool.sessions
+                      for name, summary in session.bot.timing_summary().items()},
+        }
+    finally:
+        monitor.stop()
+        pool.stop(timeout=30)
+        pool.shutdown()
+        server.stop()
+        shutil.rmtree(profile_root, ignore_errors=True)
+
+
+def print_report(report):
+    print("\n" + "=" * 50)
+    print(f"  {report['messages']} messages, {report['sessions']} session(s), {report['transport']} transport")
+    print("=" * 50)
+    for name in ('send_latency', 'end_to_end_latency'):
+        summary = report[name]
+        print(f"{name:20} p50={summary['p50']:.3f}s p95={summary['p95']:.3f}s "
+              f"p99={summary['p99']:.3f}s max={summary['max']:.3f}s")
+    print(f"{'throughput':20} {report['messages_per_minute']} messages/minute")
+    print(f"{'succeeded/failed':20} {report['succeeded']}/{report['failed']} "
+          f"(server received {report['received_by_server']}, ticked {report['delivered_by_server']})")
+    print(f"{'round trips/message':20} {report['webdriver_calls_per_message']} WebDriver, "
+          f"{report['cdp_calls_per_message']} DevTools")
+    print(f"{'startup':20} {report['startup_seconds']:.2f}s")
+    if report['recovery_seconds'] is not None or report['restarts']:
+        print(f"{'crash recovery':20} {report['recovery_seconds']}s, {report['restarts']} restart(s)")
+    print(f"{'chat open paths':20} {report['paths']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end send benchmark against the offline WhatsApp Web stand-in")
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--recipients', type=int, default=10)
+    parser.add_argument('--sessions', type=int, default=1)
+    parser.add_argument('--page-latency', type=float, default=0.0)
+    parser.add_argument('--open-latency', type=float, default=0.0)
+    parser.add_argument('--delivery-latency', type=float, default=0.1)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--crash-after', type=int, help="kill a driver after this many sends")
+    parser.add_argument('--heartbeat', type=float, default=1.0)
+    parser.add_argument('--transport', choices=('selenium', 'cdp'), default='selenium')
+    parser.add_argument('--driver-path', help="msedgedriver binary (default: cache, PATH, Selenium Manager)")
+    parser.add_argument('--show', action='store_true', help="show the browser window")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    report = run(messages=args.messages, recipients=args.recipients, sessions=args.sessions,
+                 crash_after=args.crash_after, heartbeat=args.heartbeat, headless=not args.show,
+                 driver_path=args.driver_path, transport=args.transport, page_latency=args.page_latency,
+                 open_latency=args.open_latency, delivery_latency=args.delivery_latency,
+                 failure_rate=args.failure_rate)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from storage import atomic_write_json
+
+# Seconds between two checkpoint writes while a campaign is running
+CHECKPOINT_INTERVAL = 1.0
+
+FINAL_STATUSES = ('completed', 'cancelled')
+
+
+class CampaignError(Exception):
+    """Raised for invalid campaign definitions or state changes"""
+
+
+class RateLimiter:
+    """Spaces calls evenly at `rate_per_minute`"""
+
+    def __init__(self, rate_per_minute):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0
+        self._next = time.time()
+
+    def acquire(self, stop_event):
+        """Wait for the next slot; returns False if `stop_event` was set meanwhile"""
+        delay = self._next - time.time()
+        if delay > 0 and stop_event.wait(delay):
+            return False
+        self._next = max(self._next, time.time()) + self.interval
+        return not stop_event.is_set()
+
+
+def matches_filter(recipient, recipient_filter):
+    """Check a recipient against a campaign filter
+
+    Supported keys: phone_prefix, name_contains, exclude_ids.
+    """
+    if not recipient_filter:
+        return True
+    prefix = recipient_filter.get('phone_prefix')
+    if prefix and not str(recipient.get('phone', '')).startswith(prefix):
+        return False
+    name_contains = recipient_filter.get('name_contains')
+    if name_contains and name_contains.lower() not in str(recipient.get('name', '')).lower():
+        return False
+    if str(recipient.get('id')) in set(map(str, recipient_filter.get('exclude_ids', []))):
+        return False
+    return True
+
+
+class CampaignManager:
+    """Sends one template to many recipients, resumably
+
+    Recipients are expanded lazily from the store, fed through a rate
+    limiter and a bounded number of in-flight sends, and the position of
+    the last contiguous finished send is checkpointed to `path`. After a
+    crash or restart, running campaigns resume from their checkpoint; at
+    most `max_in_flight` messages that were in flight may be sent again.
+
+    Args:
+        store: recipient/template store (see storage.py)
+        submit: callable(recipient, template, campaign_id) -> SendJob, or
+            None when the message could not be queued for that recipient
+        path (str): JSON file holding campaign definitions and checkpoints
+    """
+
+    def __init__(self, store, submit, path='campaigns.json', max_in_flight=4):
+        self.store = store
+        self.submit = submit
+        self.path = path
+        self.max_in_flight = max_in_flight
+        self._lock = threading.RLock()
+        self._campaigns = {}
+        self._runners = {}
+        self._ready = threading.Event()
+        self._last_save = 0
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._campaigns = {c['id']: c for c in json.load(f).get('campaigns', [])}
+
+    # -- persistence ------------------------------------------------------
+
+    def _save(self, force=False):
+        with self._lock:
+            if not force and time.time() - self._last_save < CHECKPOINT_INTERVAL:
+                return
+            data = {'campaigns': [dict(c) for c in self._campaigns.values()]}
+            self._last_save = time.time()
+            try:
+                atomic_write_json(self.path, data)
+            except Exception as e:
+                logging.error(f"[CAMPAIGN] Error saving checkpoints: {str(e)}", exc_info=True)
+
+    # -- readiness --------------------------------------------------------
+
+    def set_ready(self, ready):
+        """Allow (or hold) sending, e.g. while no browser session is running"""
+        if ready:
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+    # -- API --------------------------------------------------------------
+
+    def create(self, template_id, recipients='all', name=None, rate_per_minute=6):
+        """Create and start a campaign
+
+        Args:
+            template_id: template to send
+            recipients: 'all', a list of recipient ids, or a filter dict
+                ({'phone_prefix': '91', 'name_contains': 'a', 'exclude_ids': [...]})
+            rate_per_minute (float): send rate cap for this campaign
+        """
+        if not self.store.get_template(template_id):
+            raise CampaignError('Template not found')
+        if recipients == 'all' or recipients is None:
+            selection, total = {'type': 'all'}, self.store.count_recipients()
+        elif isinstance(recipients, list):
+            if not recipients:
+                raise CampaignError('Recipient list is empty')
+            selection, total = {'type': 'ids', 'ids': [str(r) for r in recipients]}, len(recipients)
+        elif isinstance(recipients, dict):
+            selection, total = {'type': 'filter', 'filter': recipients}, None
+        else:
+            raise CampaignError("recipients must be 'all', a list of ids or a filter object")
+        if rate_per_minute is not None and float(rate_per_minute) <= 0:
+            raise CampaignError('rate_per_minute must be positive')
+
+        campaign = {
+            'id': uuid.uuid4().hex[:12],
+            'name': name or f'Campaign {datetime.now().strftime("%Y-%m-%d %H:%M")}',
+            'template_id': str(template_id),
+            'selection': selection,
+            'rate_per_minute': float(rate_per_minute) if rate_per_minute else None,
+            'status': 'running',
+            'total': total,
+            'checkpoint': None,
+            'expanded': 0,
+            'sent': 0,
+            'failed': 0,
+            'skipped': 0,
+            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'finished_at': None,
+        }
+        with self._lock:
+            self._campaigns[campaign['id']] = campaign
+        self._save(force=True)
+        self._start_runner(campaign['id'])
+        logging.info(f"[CAMPAIGN] Created {campaign['id']} ({campaign['name']}) for {selection['type']} recipients")
+        return self.progress(campaign['id'])
+
+    def resume_all(self):
+        """Restart every campaign that was running when the process stopped"""
+        for campaign_id, campaign in list(self._campaigns.items()):
+            if campaign['status'] == 'running':
+                logging.info(f"[CAMPAIGN] Resuming {campaign_id} from checkpoint {campaign['checkpoint']}")
+                self._start_runner(campaign_id)
+
+    def pause(self, campaign_id):
+        self._set_status(campaign_id, 'paused')
+        self._stop_runner(campaign_id)
+        return self.progress(campaign_id)
+
+    def resume(self, campaign_id):
+        self._set_status(campaign_id, 'running')
+        self._start_runner(campaign_id)
+        return self.progress(campaign_id)
+
+    def cancel(self, campaign_id):
+        self._set_status(campaign_id, 'cancelled')
+        self._stop_runner(campaign_id)
+        return self.progress(campaign_id)
+
+    def get(self, campaign_id):
+        with self._lock:
+            campaign = self._campaigns.get(campaign_id)
+            return dict(campaign) if campaign else None
+
+    def progress(self, campaign_id):
+        """Campaign state plus live progress and throughput"""
+        with self._lock:
+            campaign = self._campaigns.get(campaign_id)
+            if campaign is None:
+                return None
+            result = dict(campaign)
+            runner = self._runners.get(campaign_id)
+        done = result['sent'] + result['failed'] + result['skipped']
+        result['done'] = done
+        result['in_flight'] = runner['in_flight'] if runner else 0
+        result['percent'] = round(100.0 * done / result['total'], 1) if result['total'] else None
+        if runner and runner['completed']:
+            elapsed = max(time.time() - runner['started'], 1e-6)
+            result['messages_per_minute'] = round(60.0 * runner['completed'] / elapsed, 2)
+            if result['total']:
+                remaining = max(result['total'] - done, 0)
+                result['eta_seconds'] = round(remaining * elapsed / runner['completed'])
+        else:
+            result['messages_per_minute'] = 0
+        return result
+
+    def list(self):
+        return [self.progress(campaign_id) for campaign_id in list(self._campaigns)]
+
+    # -- runner -----------------------------------------------------------
+
+    def _set_status(self, campaign_id, status):
+        with self._lock:
+            campaign = self._campaigns.get(campaign_id)
+            if campaign is None:
+                raise CampaignError('Campaign not found')
+            if campaign['status'] in FINAL_STATUSES:
+                raise CampaignError(f"Campaign is already {campaign['status']}")
+            campaign['status'] = status
+        self._save(force=True)
+
+    def _start_runner(self, campaign_id):
+        with self._lock:
+            previous = self._runners.get(campaign_id)
+            if previous and previous['thread'].is_alive() and not previous['stop'].is_set():
+                return
+            # A stopped runner may still be waiting for a send it could not
+            # cancel; the new one waits for it to exit before expanding
+            stop = threading.Event()
+            runner = {'stop': stop, 'in_flight': 0, 'completed': 0, 'started': time.time(),
+                      'previous': previous['thread'] if previous else None}
+            runner['thread'] = threading.Thread(target=self._run, args=(campaign_id, runner),
+                                                name=f'campaign-{campaign_id}', daemon=True)
+            self._runners[campaign_id] = runner
+        runner['thread'].start()
+
+    def _stop_runner(self, campaign_id):
+        with self._lock:
+            runner = self._runners.get(campaign_id)
+        if runner:
+            runner['stop'].set()
+
+    def _expand(self, campaign):
+        """Lazily yield (cursor, recipient) pairs after the campaign's checkpoint"""
+        selection = campaign['selection']
+        if selection['type'] == 'ids':
+            start = int(campaign['checkpoint'] or 0)
+            for position, recipient_id in enumerate(selection['ids'][start:], start + 1):
+                yield position, self.store.get_recipient(recipient_id)
+            return
+        recipient_filter = selection.get('filter')
+        for cursor, recipient in self.store.iter_recipients(after=campaign['checkpoint']):
+            if matches_filter(recipient, recipient_filter):
+                yield cursor, recipient
+
+    def _run(self, campaign_id, runner):
+        stop = runner['stop']
+        campaign = self._campaigns[campaign_id]
+        template = self.store.get_template(campaign['template_id'])
+        limiter = RateLimiter(campaign['rate_per_minute'])
+        in_flight = deque()
+
+        def advance_checkpoint():
+            # Only move past sends that have finished, in order
+            while in_flight and in_flight[0][1].done():
+                cursor, future = in_flight.popleft()
+                if future.cancelled():
+                    # Not sent: keep the checkpoint before it so it is retried
+                    in_flight.clear()
+                    return
+                with self._lock:
+                    campaign['checkpoint'] = cursor
+            runner['in_flight'] = len(in_flight)
+            self._save()
+
+        def finished(future):
+            if future.cancelled():
+                return
+            with self._lock:
+                campaign['sent' if future.result() else 'failed'] += 1
+                runner['completed'] += 1
+
+        try:
+            if runner['previous'] is not None:
+                runner['previous'].join()
+                runner['previous'] = None
+            if template is None:
+                raise CampaignError('Template was deleted')
+            for cursor, recipient in self._expand(campaign):
+                # Hold while no browser session is available
+                while not self._ready.wait(1):
+                    if stop.is_set():
+                        break
+                if not limiter.acquire(stop):
+                    break
+                with self._lock:
+                    campaign['expanded'] += 1
+                if recipient is None:
+                    # Deleted since the campaign was created
+                    with self._lock:
+                        campaign['skipped'] += 1
+                    skipped = Future()
+                    skipped.set_result(None)
+                    in_flight.append((cursor, skipped))
+                    advance_checkpoint()
+                    continue
+                job = self.submit(recipient, template, campaign_id)
+                if job is None:
+                    # Could not be queued (e.g. the template cannot be rendered for it)
+                    failed = Future()
+                    failed.set_result(False)
+                    finished(failed)
+                    in_flight.append((cursor, failed))
+                else:
+                    job.future.add_done_callback(finished)
+                    in_flight.append((cursor, job.future))
+                while len(in_flight) >= self.max_in_flight and not stop.is_set():
+                    wait([f for _, f in in_flight], timeout=1, return_when=FIRST_COMPLETED)
+                    advance_checkpoint()
+                advance_checkpoint()
+
+            if stop.is_set():
+                # Paused or cancelled: unsent jobs are dropped and retried on resume
+                for _, future in in_flight:
+                    future.cancel()
+            wait([f for _, f in in_flight])
+            advance_checkpoint()
+            with self._lock:
+                if campaign['status'] == 'running' and not stop.is_set():
+                    campaign['status'] = 'completed'
+                    campaign['total'] = campaign['sent'] + campaign['failed'] + campaign['skipped']
+                if campaign['status'] in FINAL_STATUSES:
+                    campaign['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        except Exception as e:
+            logging.error(f"[CAMPAIGN] {campaign_id} stopped: {str(e)}", exc_info=True)
+            with self._lock:
+                # Once stopped, the status belongs to pause/cancel (or a newer runner)
+                if not stop.is_set():
+                    campaign['status'] = 'paused'
+                campaign['error'] = str(e)
+        finally:
+            runner['in_flight'] = 0
+            self._save(force=True)
+            logging.info(f"[CAMPAIGN] {campaign_id} runner exited with status {campaign['status']}")
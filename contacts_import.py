@@ -0,0 +1,275 @@
+import argparse
+import csv
+import io
+import itertools
+import os
+import time
+import logging
+
+from phone_numbers import normalize_phone, COUNTRIES
+
+# Header names (lowercased) recognised as the phone and name columns
+PHONE_COLUMNS = ('phone', 'phone_number', 'phone number', 'mobile', 'mobile number', 'number',
+                 'tel', 'telephone', 'whatsapp', 'cell')
+NAME_COLUMNS = ('name', 'full_name', 'full name', 'display_name', 'display name', 'contact')
+FIRST_NAME_COLUMNS = ('first_name', 'first name', 'given name')
+LAST_NAME_COLUMNS = ('last_name', 'last name', 'family name', 'surname')
+
+# Per-row errors and duplicates listed in a report; the rest are only counted
+MAX_REPORTED_ROWS = 100
+
+VCARD_EXTENSIONS = ('.vcf', '.vcard')
+
+
+class ImportReport:
+    """Counts and the first few per-row problems of one import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.added = 0
+        self.error_count = 0
+        self.duplicate_count = 0
+        self.errors = []
+        self.duplicates = []
+        self.started = time.time()
+        self.seconds = 0.0
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ROWS:
+            self.errors.append({'row': row, 'error': message})
+
+    def duplicate(self, row, phone, existing_id):
+        self.duplicate_count += 1
+        if len(self.duplicates) < MAX_REPORTED_ROWS:
+            self.duplicates.append({'row': row, 'phone': phone, 'existing_id': existing_id})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'added': self.added,
+            'duplicates': self.duplicate_count,
+            'errors': self.error_count,
+            'error_rows': self.errors,
+            'duplicate_rows': self.duplicates,
+            'seconds': round(self.seconds, 3),
+        }
+
+
+def _field_name(header):
+    """'Company Name' -> 'company_name', usable as a {placeholder}"""
+    return '_'.join(header.strip().lower().replace('-', ' ').split())
+
+
+def _pick(headers, candidates):
+    for header in headers:
+        if header.strip().lower() in candidates:
+            return header
+    return None
+
+
+# -- parsers: yield (source line, raw record) --------------------------------
+
+def iter_csv(lines):
+    """Parse CSV with a header row into recipient-shaped records"""
+    reader = csv.DictReader(lines)
+    headers = reader.fieldnames or []
+    phone_column = _pick(headers, PHONE_COLUMNS)
+    name_column = _pick(headers, NAME_COLUMNS)
+    first_column = _pick(headers, FIRST_NAME_COLUMNS)
+    last_column = _pick(headers, LAST_NAME_COLUMNS)
+    if phone_column is None:
+        raise ValueError(f"No phone column in CSV header (expected one of: {', '.join(PHONE_COLUMNS)})")
+    skipped = {phone_column, name_column, first_column, last_column}
+    extra = {header: _field_name(header) for header in headers
+             if header not in skipped and _field_name(header).isidentifier() and _field_name(header) != 'id'}
+    for row in reader:
+        name = (row.get(name_column) or '').strip() if name_column else ''
+        if not name and (first_column or last_column):
+            name = ' '.join(part for part in ((row.get(first_column) or '').strip() if first_column else '',
+                                              (row.get(last_column) or '').strip() if last_column else '') if part)
+        record = {'name': name, 'phone': row.get(phone_column) or ''}
+        for header, field in extra.items():
+            value = (row.get(header) or '').strip()
+            if value:
+                record[field] = value
+        yield reader.line_num, record
+
+
+def _unfold(lines):
+    """Join folded vCard lines (continuations start with a space or tab)"""
+    pending, pending_line = None, 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_line, pending
+        pending, pending_line = line, number
+    if pending is not None:
+        yield pending_line, pending
+
+
+def _unescape(value):
+    return value.replace('\\n', ' ').replace('\\N', ' ').replace('\\,', ',').replace('\\;', ';').strip()
+
+
+def _best_phone(numbers):
+    """Prefer a TEL marked as mobile, then preferred, then the first one"""
+    for wanted in ('CELL', 'PREF'):
+        for params, value in numbers:
+            if wanted in params:
+                return value
+    return numbers[0][1] if numbers else ''
+
+
+def iter_vcards(lines):
+    """Parse vCard 2.1/3.0/4.0 contacts into recipient-shaped records"""
+    card, start = None, 0
+    for number, line in _unfold(lines):
+        key, _, value = line.partition(':')
+        key, *params = key.split(';')
+        # Grouped properties look like "item1.TEL"
+        key = key.rpartition('.')[2].upper()
+        params = ';'.join(params).upper()
+        if key == 'BEGIN' and value.strip().upper() == 'VCARD':
+            card, start = {'numbers': []}, number
+        elif card is None:
+            continue
+        elif key == 'END':
+            name = card.get('fn', '')
+            if not name and card.get('n'):
+                last, _, rest = card['n'].partition(';')
+                first = rest.partition(';')[0]
+                name = ' '.join(part for part in (_unescape(first), _unescape(last)) if part)
+            record = {'name': name, 'phone': _best_phone(card['numbers'])}
+            for field in ('company', 'email', 'notes'):
+                if card.get(field):
+                    record[field] = card[field]
+            yield start, record
+            card = None
+        elif key == 'FN':
+            card['fn'] = _unescape(value)
+        elif key == 'N':
+            card['n'] = value
+        elif key == 'TEL':
+            card['numbers'].append((params, value.strip().removeprefix('tel:')))
+        elif key == 'ORG':
+            card['company'] = _unescape(value.split(';')[0])
+        elif key == 'EMAIL' and 'email' not in card:
+            card['email'] = value.strip()
+        elif key == 'NOTE':
+            card['notes'] = _unescape(value)
+
+
+PARSERS = {'csv': iter_csv, 'vcard': iter_vcards}
+
+
+def detect_format(filename, first_line):
+    if filename and os.path.splitext(filename)[1].lower() in VCARD_EXTENSIONS:
+        return 'vcard'
+    if first_line.strip().upper() == 'BEGIN:VCARD':
+        return 'vcard'
+    return 'csv'
+
+
+def import_contacts(store, lines, file_format=None, filename=None, batch_size=1000, default_country=None):
+    """Stream contacts from `lines` (an iterable of text lines) into `store`
+
+    Rows are parsed and validated lazily and handed to
+    store.add_recipients `batch_size` at a time (one short transaction
+    each), which skips phone numbers it already has (including repeats
+    within the file). Batches written before an error stay imported.
+
+    Args:
+        file_format (str): 'csv' or 'vcard'; detected from the filename or
+            first line when None
+        default_country (str): country of numbers written without a
+            country code (default: phone_numbers.DEFAULT_COUNTRY)
+
+    Returns:
+        ImportReport
+
+    Raises:
+        ValueError: for an unknown format or a CSV without a phone column
+    """
+    if default_country and default_country.upper() not in COUNTRIES:
+        raise ValueError(f"Unknown country {default_country!r}")
+    report = ImportReport()
+    lines = iter(lines)
+    first_line = next(lines, '')
+    lines = itertools.chain([first_line], lines)
+    file_format = file_format or detect_format(filename, first_line)
+    if file_format not in PARSERS:
+        raise ValueError(f"Unknown import format {file_format!r} (expected one of: {', '.join(PARSERS)})")
+    parsed = PARSERS[file_format](lines)
+
+    def batches():
+        """Valid records in lists of `batch_size`, with the source line of each"""
+        batch, rows = [], []
+        for row, record in parsed:
+            report.rows += 1
+            try:
+                record['phone'] = normalize_phone(record['phone'], default_country)
+            except ValueError as e:
+                report.error(row, str(e))
+                continue
+            record['name'] = record['name'] or record['phone']
+            batch.append(record)
+            rows.append(row)
+            if len(batch) == batch_size:
+                yield batch, rows
+                batch, rows = [], []
+        if batch:
+            yield batch, rows
+
+    # Only the current batch's line numbers are kept, however large the file
+    for batch, rows in batches():
+        added, duplicates = store.add_recipients(batch, batch_size=batch_size)
+        report.added += added
+        for index, phone, existing_id in duplicates:
+            report.duplicate(rows[index], phone, existing_id)
+    report.seconds = time.time() - report.started
+    logging.info(f"[IMPORT] {report.rows} rows: {report.added} added, {report.duplicate_count} duplicates, "
+                 f"{report.error_count} errors in {report.seconds:.2f}s")
+    return report
+
+
+def open_text(binary):
+    """Text lines from an uploaded or opened binary file (UTF-8, BOM tolerated)"""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def main():
+    from storage import open_store
+
+    parser = argparse.ArgumentParser(description="Import recipients from a CSV or vCard file")
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=tuple(PARSERS), help="default: detect from the file")
+    parser.add_argument('--store', choices=('sqlite', 'json'), default=os.environ.get('WHATSAPP_STORE', 'sqlite'))
+    parser.add_argument('--db', default='whatsapp.db')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--country', type=str.upper, choices=sorted(COUNTRIES),
+                        help="country of numbers written without a country code")
+    args = parser.parse_args()
+
+    store = open_store(args.store, db_path=args.db, config_path=args.config)
+    try:
+        with open(args.path, 'rb') as f:
+            report = import_contacts(store, open_text(f), file_format=args.format, filename=args.path,
+                                     batch_size=args.batch_size, default_country=args.country)
+    finally:
+        store.close()
+    summary = report.to_dict()
+    print(f"✅ {summary['added']} of {summary['rows']} rows imported in {summary['seconds']}s "
+          f"({summary['duplicates']} duplicates, {summary['errors']} errors)")
+    for problem in summary['error_rows']:
+        print(f"❌ line {problem['row']}: {problem['error']}")
+    if summary['errors'] > len(summary['error_rows']):
+        print(f"   ... and {summary['errors'] - len(summary['error_rows'])} more errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+# Control jobs (start/stop the browser) run before any queued sends
+PRIORITY_CONTROL = 0
+PRIORITY_SEND = 10
+
+# How many times one send may be held and replayed before it counts as failed
+MAX_HOLDS = 3
+
+
+class HoldJob(Exception):
+    """Raised by send_func when a send could not run because the session is
+    gone; the job is held (not failed) and the dispatcher pauses until resume()
+    """
+
+
+class RejectedSend(Exception):
+    """Raised by send_func when the recipient cannot receive messages (e.g.
+    the number is not on WhatsApp); the job fails with status 'rejected'
+    and the session is not blamed for it
+    """
+
+
+class SendJob:
+    """A unit of work for the dispatch worker
+
+    `future` resolves to the send result (True/False) or to the return
+    value of a control callable.
+    """
+
+    def __init__(self, phone=None, message=None, func=None, args=(), priority=PRIORITY_SEND, meta=None):
+        self.id = uuid.uuid4().hex
+        self.phone = phone
+        self.message = message
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.meta = meta or {}
+        self.status = 'queued'
+        self.error = None
+        self.sequence = None
+        self.holds = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = Future()
+
+    @property
+    def is_control(self):
+        return self.func is not None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'phone': self.phone,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'wait_seconds': (self.started_at - self.created_at) if self.started_at else None,
+            'holds': self.holds,
+            **self.meta,
+        }
+
+
+class Dispatcher:
+    """Thread-safe send queue drained by a single browser-owning worker
+
+    Only the worker thread ever touches the WebDriver: sends are executed
+    one at a time in submission order, and browser start/stop is routed
+    through call() so it cannot race an in-flight send.
+
+    Args:
+        send_func: callable(phone, message) -> bool, run on the worker
+        on_complete: optional callable(job, success) run on the worker
+            after each send (history, stats, ...)
+        on_cancel: optional callable(job) run on the worker when it
+            drops a send whose future was cancelled while queued
+        max_finished_jobs: how many finished jobs to keep for lookups
+        paused (bool): start out holding sends, e.g. until a browser is up
+
+    While paused, sends are held in submission order (control calls still
+    run) and resume() puts them back in the queue ahead of newer sends. A
+    send whose send_func raises HoldJob is held the same way and pauses
+    the dispatcher, up to MAX_HOLDS times per job.
+    """
+
+    def __init__(self, send_func, on_complete=None, max_finished_jobs=1000, name='dispatch-worker',
+                 on_cancel=None, paused=False):
+        self.send_func = send_func
+        self.on_complete = on_complete
+        self.on_cancel = on_cancel
+        self.max_finished_jobs = max_finished_jobs
+        self.name = name
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._waits = deque(maxlen=200)
+        self._current = None
+        self._processed = 0
+        self._failed = 0
+        self._thread = None
+        self._running = False
+        self._paused = paused
+        self._held = []
+        self._held_lock = threading.Lock()
+        # Sends sitting in the queue, kept as a counter so load() is O(1)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    # -- lifecycle --------------------------------------------------------
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+        self._thread.start()
+        logging.info(f"[DISPATCH] Worker {self.name} started")
+
+    def stop(self, timeout=10):
+        """Stop the worker once the job in progress (if any) finishes"""
+        self._running = False
+        # Wake the worker if it is blocked on an empty queue
+        self._queue.put((-1, next(self._sequence), None))
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def pause(self):
+        """Hold sends until resume(); control calls keep running"""
+        with self._held_lock:
+            if not self._paused:
+                logging.info(f"[DISPATCH] Worker {self.name} paused")
+            self._paused = True
+
+    def resume(self):
+        """Requeue the held sends in their original order and carry on"""
+        with self._held_lock:
+            held, self._held = self._held, []
+            was_paused, self._paused = self._paused, False
+        with self._waiting_lock:
+            self._waiting += len(held)
+        for job in held:
+            job.status = 'queued'
+            self._queue.put((job.priority, job.sequence, job))
+        if was_paused:
+            logging.info(f"[DISPATCH] Worker {self.name} resumed, replaying {len(held)} held sends")
+        return len(held)
+
+    @property
+    def is_paused(self):
+        return self._paused
+
+    def _hold(self, job):
+        """Park a send until resume(); False if the dispatcher is not paused"""
+        with self._held_lock:
+            if not self._paused:
+                return False
+            job.status = 'held'
+            self._held.append(job)
+            return True
+
+    # -- submission -------------------------------------------------------
+
+    def _enqueue(self, job):
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            self._trim_jobs()
+        job.sequence = next(self._sequence)
+        if not job.is_control:
+            with self._waiting_lock:
+                self._waiting += 1
+        self._queue.put((job.priority, job.sequence, job))
+        return job
+
+    def submit(self, phone, message, **meta):
+        """Queue a message send and return its SendJob (id + future)"""
+        return self._enqueue(SendJob(phone=phone, message=message, meta=meta))
+
+    def call(self, func, *args):
+        """Run `func(*args)` on the worker thread ahead of queued sends
+
+        Returns:
+            Future: resolves to the callable's return value
+        """
+        return self._enqueue(SendJob(func=func, args=args, priority=PRIORITY_CONTROL,
+                                     meta={'control': getattr(func, '__name__', 'call')})).future
+
+    def get(self, job_id):
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _trim_jobs(self):
+        """Forget the oldest finished jobs; caller must hold the jobs lock"""
+        excess = len(self._jobs) - self.max_finished_jobs
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, job in self._jobs.items() if job.future.done()][:excess]:
+            del self._jobs[job_id]
+
+    # -- worker -----------------------------------------------------------
+
+    def _worker(self):
+        while self._running:
+            _, _, job = self._queue.get()
+            if job is None:
+                continue
+            if not job.is_control:
+                with self._waiting_lock:
+                    self._waiting -= 1
+            if not job.is_control and not job.future.cancelled() and self._hold(job):
+                continue
+            # A replayed send's future is already running
+            if not job.future.running() and not job.future.set_running_or_notify_cancel():
+                job.status = 'cancelled'
+                if self.on_cancel and not job.is_control:
+                    try:
+                        self.on_cancel(job)
+                    except Exception as e:
+                        logging.error(f"[DISPATCH] Cancel hook failed for job {job.id}: {str(e)}", exc_info=True)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        self._current = job
+        job.status = 'running'
+        job.started_at = time.time()
+        self._waits.append(job.started_at - job.created_at)
+        try:
+            if job.is_control:
+                result = job.func(*job.args)
+                job.status = 'done'
+            else:
+                result = bool(self.send_func(job.phone, job.message))
+                job.status = 'success' if result else 'error'
+        except HoldJob as e:
+            if job.holds < MAX_HOLDS:
+                job.holds += 1
+                self._current = None
+                with self._held_lock:
+                    self._paused = True
+                    job.status = 'held'
+                    self._held.append(job)
+                logging.warning(f"[DISPATCH] Holding job {job.id} on {self.name}: {str(e)}")
+                return
+            logging.error(f"[DISPATCH] Job {job.id} failed after {job.holds} replays: {str(e)}")
+            result = False
+            job.status = 'error'
+            job.error = str(e)
+        except RejectedSend as e:
+            logging.warning(f"[DISPATCH] Job {job.id} rejected: {str(e)}")
+            result = False
+            job.status = 'rejected'
+            job.error = str(e)
+        except Exception as e:
+            logging.error(f"[DISPATCH] Job {job.id} failed: {str(e)}", exc_info=True)
+            result = False
+            job.status = 'error'
+            job.error = str(e)
+        job.finished_at = time.time()
+        self._current = None
+
+        if not job.is_control:
+            self._processed += 1
+            if job.status in ('error', 'rejected'):
+                self._failed += 1
+            if self.on_complete:
+                try:
+                    self.on_complete(job, result)
+                except Exception as e:
+                    logging.error(f"[DISPATCH] Completion hook failed for job {job.id}: {str(e)}", exc_info=True)
+        job.future.set_result(result)
+
+    # -- metrics ----------------------------------------------------------
+
+    def load(self):
+        """Sends queued, held or running, without walking the job table"""
+        current = self._current
+        return self._waiting + len(self._held) + (1 if current is not None and not current.is_control else 0)
+
+    def metrics(self):
+        """Queue depth, wait times and throughput counters"""
+        now = time.time()
+        with self._jobs_lock:
+            queued = [job for job in self._jobs.values() if job.status == 'queued']
+        with self._held_lock:
+            held = len(self._held)
+        waits = sorted(self._waits)
+        current = self._current
+        return {
+            'depth': self._queue.qsize(),
+            'queued_jobs': len(queued),
+            'held_jobs': held,
+            'paused': self._paused,
+            'oldest_wait_seconds': round(now - min(job.created_at for job in queued), 3) if queued else 0,
+            'avg_wait_seconds': round(sum(waits) / len(waits), 3) if waits else 0,
+            'p95_wait_seconds': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0,
+            'running': current.to_dict() if current else None,
+            'processed': self._processed,
+            'failed': self._failed,
+            'worker_alive': bool(self._thread and self._thread.is_alive()),
+        }
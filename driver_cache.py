@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import time
+import logging
+
+from storage import atomic_write_json
+
+# Re-check for a newer driver at most this often when online
+DRIVER_CACHE_MAX_AGE = 7 * 24 * 3600
+
+DRIVER_BINARIES = ('msedgedriver', 'msedgedriver.exe')
+
+
+def _read_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"[DRIVER] Ignoring unreadable {cache_path}: {str(e)}")
+        return {}
+
+
+def _on_path():
+    for name in DRIVER_BINARIES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def resolve_driver_path(cache_path='driver_cache.json', offline=False, max_age=DRIVER_CACHE_MAX_AGE):
+    """Find the msedgedriver binary, hitting the network as rarely as possible
+
+    Order: the WHATSAPP_DRIVER_PATH override, a cached path that still exists
+    and is younger than `max_age` (any age when `offline`), a fresh
+    webdriver-manager download (skipped when `offline`), a stale cached path,
+    and finally msedgedriver on PATH.
+
+    Returns:
+        str: driver path, or None to let Selenium Manager look for one
+    """
+    override = os.environ.get('WHATSAPP_DRIVER_PATH')
+    if override:
+        return override
+
+    cached = _read_cache(cache_path)
+    cached_path = cached.get('path')
+    cached_usable = bool(cached_path and os.path.exists(cached_path))
+    if cached_usable and (offline or time.time() - cached.get('resolved_at', 0) < max_age):
+        return cached_path
+
+    if not offline:
+        try:
+            from webdriver_manager.microsoft import EdgeChromiumDriverManager
+            path = EdgeChromiumDriverManager().install()
+            atomic_write_json(cache_path, {'path': path, 'resolved_at': time.time()})
+            logging.info(f"[DRIVER] Resolved and cached {path}")
+            return path
+        except Exception as e:
+            logging.warning(f"[DRIVER] Could not download Edge WebDriver: {str(e)}")
+
+    if cached_usable:
+        logging.info(f"[DRIVER] Using cached driver {cached_path}")
+        return cached_path
+    path = _on_path()
+    if path:
+        logging.info(f"[DRIVER] Using {path} from PATH")
+    else:
+        logging.warning("[DRIVER] No cached driver found; falling back to Selenium Manager")
+    return path
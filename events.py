@@ -0,0 +1,120 @@
+import itertools
+import json
+import queue
+import threading
+import logging
+from collections import deque
+
+# Events kept for clients that reconnect with Last-Event-ID
+REPLAY_BUFFER = 500
+
+# Events a client may fall behind by before it is dropped (it then reconnects
+# and catches up from the replay buffer); must hold a full replay
+SUBSCRIBER_QUEUE = 2 * REPLAY_BUFFER
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+
+class Event:
+    """One published event, serialized once for every subscriber"""
+
+    __slots__ = ('id', 'type', 'data', 'text')
+
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.text = f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+        self.overflowed = False
+
+
+class EventBus:
+    """Fan-out of dashboard events as a Server-Sent Events stream
+
+    publish() is cheap and never blocks: the event is formatted once and
+    handed to every connected stream. Recent events are kept so a client
+    reconnecting with `Last-Event-ID` receives what it missed; one that
+    fell further behind (or whose ids predate a server restart) gets a
+    `reset` event and reloads.
+    """
+
+    def __init__(self, replay=REPLAY_BUFFER):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._buffer = deque(maxlen=replay)
+        self._subscribers = set()
+        self.published = 0
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = Event(next(self._ids), event_type, data)
+            self._buffer.append(event)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                subscriber.overflowed = True
+                self._unsubscribe(subscriber)
+                logging.warning("[EVENTS] Dropped a stream that fell too far behind")
+        return event
+
+    def _subscribe(self, last_event_id=None):
+        subscriber = _Subscriber()
+        with self._lock:
+            if last_event_id is not None:
+                oldest = self._buffer[0].id if self._buffer else 1
+                newest = self._buffer[-1].id if self._buffer else 0
+                # Too far behind, or ids from before a server restart
+                if last_event_id < oldest - 1 or last_event_id > newest:
+                    subscriber.queue.put_nowait(Event(newest, 'reset', {}))
+                else:
+                    for event in self._buffer:
+                        if event.id > last_event_id:
+                            subscriber.queue.put_nowait(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def _unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+        """Generator of SSE text for one client
+
+        Args:
+            last_event_id: the client's Last-Event-ID header, if reconnecting
+        """
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+        subscriber = self._subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    if subscriber.overflowed:
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield event.text
+        finally:
+            self._unsubscribe(subscriber)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'last_id': self._buffer[-1].id if self._buffer else 0,
+            }
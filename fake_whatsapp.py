@@ -0,0 +1,311 @@
+import json
+import random
+import sys
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Behaviour knobs; all can be changed at runtime through configure() or POST /_control
+FAKE_DEFAULTS = {
+    'page_latency': 0.0,        # seconds before a page (/ or /send) is served
+    'open_latency': 0.0,        # seconds before an opened chat shows its compose box
+    'delivery_latency': 0.1,    # seconds between clicking send and the tick
+    'failure_rate': 0.0,        # chance (0-1) that a sent message never gets its tick
+    'logged_out': False,        # serve the QR screen instead of the app
+    'invalid_prefixes': ['000'],  # numbers starting with these are "not on WhatsApp"
+}
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>WhatsApp</title>
+<style>
+  body { margin: 0; font-family: sans-serif; display: flex; height: 100vh; }
+  #side { width: 30%; border-right: 1px solid #ddd; overflow-y: auto; }
+  #side .search div { border: 1px solid #ccc; margin: 8px; padding: 6px; min-height: 18px; }
+  #pane-side div[role=listitem] { padding: 10px; border-bottom: 1px solid #eee; cursor: pointer; }
+  #main { flex: 1; display: flex; flex-direction: column; }
+  #main .messages { flex: 1; overflow-y: auto; padding: 10px; }
+  #main .bubble { background: #dcf8c6; margin: 4px 0; padding: 6px; white-space: pre-wrap; }
+  footer { display: flex; border-top: 1px solid #ddd; padding: 8px; }
+  footer div[role=textbox] { flex: 1; border: 1px solid #ccc; padding: 6px; min-height: 18px; }
+  .popup { position: fixed; top: 40%; left: 35%; background: #fff; border: 1px solid #999; padding: 20px; }
+</style>
+</head>
+<body>
+<div id="app"></div>
+<script type="application/json" id="state">__STATE__</script>
+<script>
+const state = JSON.parse(document.getElementById('state').textContent);
+const app = document.getElementById('app');
+const chats = state.chats;
+let search = null;
+
+function renderQr() {
+  document.body.innerHTML = '<div class="landing"><div data-testid="qrcode" data-ref="offline-stand-in">' +
+    '<canvas aria-label="Scan this QR code to link a device!" width="264" height="264"></canvas></div></div>';
+  // "Scanning" is POST /_control {"logged_out": false}
+  setInterval(async () => {
+    const settings = await (await fetch('/_state')).json();
+    if (!settings.logged_out) location.reload();
+  }, 500);
+}
+
+function renderList() {
+  const query = search.textContent.trim();
+  const pane = document.getElementById('pane-side');
+  // Replace the nodes so previously found items go stale, as in WhatsApp
+  pane.replaceChildren();
+  for (const phone of Object.keys(chats)) {
+    if (query && !phone.includes(query)) continue;
+    const item = document.createElement('div');
+    item.setAttribute('role', 'listitem');
+    item.dataset.phone = phone;
+    item.textContent = '+' + phone;
+    item.onclick = () => openChat(phone);
+    pane.appendChild(item);
+  }
+}
+
+function bubble(container, message) {
+  const div = document.createElement('div');
+  div.className = 'bubble';
+  div.textContent = message.text;
+  const status = document.createElement('span');
+  status.className = 'status';
+  status.innerHTML = message.delivered ? ' <span data-icon="msg-check">✓</span>' : ' <span data-icon="msg-time">…</span>';
+  div.appendChild(status);
+  container.appendChild(div);
+  return status;
+}
+
+function openChat(phone) {
+  setTimeout(() => {
+    chats[phone] = chats[phone] || [];
+    const main = document.getElementById('main');
+    main.innerHTML = '<header><span></span></header><div class="messages"></div>' +
+      '<footer><div contenteditable="true" role="textbox" title="Type a message" data-tab="10"></div>' +
+      '<button aria-label="Send" style="display: none"><span data-icon="send">➤</span></button></footer>';
+    main.querySelector('header span').textContent = '+' + phone;
+    const messages = main.querySelector('.messages');
+    const box = main.querySelector('footer div[role=textbox]');
+    const button = main.querySelector('footer button');
+    chats[phone].forEach(message => bubble(messages, message));
+
+    async function send() {
+      const text = box.innerText.replace(/\\n+$/, '');
+      if (!text.trim()) return;
+      box.textContent = '';
+      button.style.display = 'none';
+      const message = {text: text, delivered: false};
+      chats[phone].push(message);
+      const status = bubble(messages, message);
+      const response = await fetch('/_sent', {
+        method: 'POST', headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({phone: phone, text: text}),
+      });
+      message.delivered = (await response.json()).delivered;
+      if (message.delivered) status.innerHTML = ' <span data-icon="msg-check">✓</span>';
+      renderList();
+    }
+
+    box.addEventListener('input', () => { button.style.display = box.innerText.trim() ? '' : 'none'; });
+    box.addEventListener('keydown', event => {
+      if (event.key === 'Enter' && !event.shiftKey) { event.preventDefault(); send(); }
+    });
+    button.addEventListener('click', send);
+    box.focus();
+  }, state.open_latency * 1000);
+}
+
+function renderApp() {
+  app.innerHTML = '<div id="side"><div class="search"><div contenteditable="true" role="textbox" ' +
+    'title="Search input textbox" data-tab="3"></div></div><div id="pane-side"></div></div><div id="main"></div>';
+  app.style.display = 'flex';
+  app.style.width = '100%';
+  search = document.querySelector('#side div[role=textbox]');
+  search.addEventListener('input', renderList);
+  search.addEventListener('keydown', event => {
+    if (event.key === 'Enter') {
+      event.preventDefault();
+      const first = document.querySelector('#pane-side div[role=listitem]');
+      if (first) openChat(first.dataset.phone);
+    } else if (event.key === 'Escape') {
+      search.textContent = '';
+      renderList();
+    }
+  });
+  renderList();
+  if (state.invalid) {
+    const popup = document.createElement('div');
+    popup.className = 'popup';
+    popup.innerHTML = '<div>Phone number shared via url is invalid.</div><button>OK</button>';
+    popup.querySelector('button').onclick = () => popup.remove();
+    document.body.appendChild(popup);
+  } else if (state.phone) {
+    openChat(state.phone);
+  }
+}
+
+if (state.screen === 'qr') renderQr(); else renderApp();
+</script>
+</body>
+</html>
+"""
+
+
+class FakeWhatsAppServer:
+    """Offline stand-in for WhatsApp Web, for benchmarks and regression runs
+
+    Serves a page with the DOM contract the bot relies on (`#side` with a
+    search box and chat list, the `Type a message` textbox, the
+    `data-icon=send` button, `msg-check` ticks, the invalid-number banner and
+    the QR screen) and records every message "sent" through it. Latency and
+    failures are injected through the FAKE_DEFAULTS settings.
+
+    Control endpoints:
+      - GET /_state: current settings
+      - POST /_control: change settings (JSON body); {"reset": true} also
+        forgets all chats and messages
+      - GET /_messages: messages received so far, oldest first
+
+    Args:
+        host, port: where to listen; port 0 picks a free one
+        seed: seed for failure injection, for repeatable runs
+        **settings: overrides for FAKE_DEFAULTS
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, seed=None, **settings):
+        self.settings = dict(FAKE_DEFAULTS)
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.chats = {}
+        self.messages = []
+        self.configure(**settings)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, reset=False, **settings):
+        """Change settings at runtime
+
+        Raises:
+            ValueError: for an unknown setting
+        """
+        unknown = set(settings) - set(FAKE_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self.settings.update(settings)
+            if reset:
+                self.chats = {}
+                self.messages = []
+            return dict(self.settings)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-whatsapp', daemon=True)
+        self._thread.start()
+        logging.info(f"[FAKE] WhatsApp Web stand-in listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def is_invalid(self, phone):
+        return (not phone.isdigit() or not 7 <= len(phone) <= 15
+                or any(phone.startswith(prefix) for prefix in self.settings['invalid_prefixes']))
+
+    def page(self, phone=None):
+        """The HTML for / (phone=None) or /send?phone=..."""
+        with self._lock:
+            settings = dict(self.settings)
+            chats = {number: [dict(m) for m in messages] for number, messages in self.chats.items()}
+        if settings['logged_out']:
+            state = {'screen': 'qr'}
+        else:
+            state = {'screen': 'app', 'chats': chats, 'phone': phone,
+                     'invalid': bool(phone) and self.is_invalid(phone),
+                     'open_latency': settings['open_latency']}
+        return PAGE.replace('__STATE__', json.dumps(state).replace('</', '<\\/'))
+
+    def receive(self, phone, text):
+        """Record a sent message; returns whether it gets its tick"""
+        time.sleep(self.settings['delivery_latency'])
+        with self._lock:
+            delivered = self._random.random() >= self.settings['failure_rate']
+            self.chats.setdefault(phone, []).append({'text': text, 'delivered': delivered})
+            self.messages.append({'phone': phone, 'text': text, 'delivered': delivered, 'at': time.time()})
+        return delivered
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logging.debug(f"[FAKE] {format % args}")
+
+            def _reply(self, body, content_type='application/json', status=200):
+                data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _json_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path in ('/', '/send'):
+                    time.sleep(server.settings['page_latency'])
+                    phone = parse_qs(url.query).get('phone', [None])[0] if url.path == '/send' else None
+                    self._reply(server.page(phone), 'text/html; charset=utf-8')
+                elif url.path == '/_state':
+                    self._reply(server.settings)
+                elif url.path == '/_messages':
+                    with server._lock:
+                        self._reply(list(server.messages))
+                else:
+                    self._reply({'error': 'not found'}, status=404)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                try:
+                    body = self._json_body()
+                    if url.path == '/_sent':
+                        self._reply({'delivered': server.receive(str(body['phone']), body.get('text', ''))})
+                    elif url.path == '/_control':
+                        self._reply(server.configure(**body))
+                    else:
+                        self._reply({'error': 'not found'}, status=404)
+                except (ValueError, KeyError, TypeError) as e:
+                    self._reply({'error': str(e)}, status=400)
+
+        return Handler
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server = FakeWhatsAppServer(port=port).start()
+    print(f"📡 WhatsApp Web stand-in running; point the bot at it with WHATSAPP_WEB_URL={server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
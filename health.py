@@ -0,0 +1,161 @@
+import threading
+import time
+import logging
+
+# Seconds between heartbeats
+HEARTBEAT_INTERVAL = 5
+
+# How long a heartbeat waits for a probe before moving on; a probe queued
+# behind a long send is picked up by a later heartbeat
+PROBE_TIMEOUT = 10
+
+# Seconds to wait before each restart attempt; the last value repeats
+RESTART_BACKOFF = (0, 10, 30, 60, 120)
+
+
+class HealthMonitor:
+    """Heartbeat that notices dead or logged-out sessions and recovers them
+
+    Every `interval` seconds each started session is probed on its own
+    worker (so the probe never races a send):
+      - 'crashed': sends are held, and the browser is rebuilt on the same
+        profile with backoff until it comes back
+      - 'logged_out': sends are held until the QR code is scanned in the
+        session's browser window
+      - 'ok': held sends are replayed
+
+    Args:
+        pool (SessionPool): sessions to watch
+        interval (float): seconds between heartbeats
+        on_change: optional callable(session, old_state, new_state)
+    """
+
+    def __init__(self, pool, interval=HEARTBEAT_INTERVAL, probe_timeout=PROBE_TIMEOUT, on_change=None):
+        self.pool = pool
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.on_change = on_change
+        self._stop = threading.Event()
+        self._thread = None
+        self._probes = {}
+        self._restarts = {}
+        self._next_restart = {}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='health-monitor', daemon=True)
+        self._thread.start()
+        logging.info(f"[HEALTH] Monitor started, heartbeat every {self.interval}s")
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    @property
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            for session in self.pool.sessions:
+                try:
+                    self.check(session)
+                except Exception as e:
+                    logging.error(f"[HEALTH] Check of {session.name} failed: {str(e)}", exc_info=True)
+
+    def check(self, session):
+        """Probe one session and act on the result"""
+        if session.state == 'stopped':
+            return
+        if session.state == 'recovering':
+            self._maybe_restart(session)
+            return
+        probe = self._probes.get(session.name)
+        if probe is None or probe.done():
+            probe = self._probes[session.name] = session.dispatcher.call(session.bot.probe)
+        try:
+            health = probe.result(timeout=self.probe_timeout)
+        except Exception:
+            # Busy with a long send; a dead browser makes that send hold itself
+            return
+        self._probes.pop(session.name, None)
+        session.health = health
+        session.last_probe = time.time()
+
+        if health == 'ok':
+            if session.state != 'ready':
+                logging.info(f"[HEALTH] {session.name} is logged in again")
+                self._set_state(session, 'ready')
+            if session.dispatcher.is_paused:
+                session.dispatcher.resume()
+        elif health == 'logged_out':
+            if session.state != 'logged_out':
+                logging.warning(f"[HEALTH] {session.name} was logged out; holding sends until the QR code is scanned")
+                session.dispatcher.pause()
+                self._set_state(session, 'logged_out')
+        elif health == 'crashed':
+            logging.warning(f"[HEALTH] {session.name} lost its browser; holding sends and restarting")
+            session.dispatcher.pause()
+            self._set_state(session, 'recovering')
+            self._restarts[session.name] = 0
+            self._next_restart[session.name] = time.time()
+            self._maybe_restart(session)
+
+    def _maybe_restart(self, session):
+        pending = self._probes.get(session.name)
+        if pending is not None and not pending.done():
+            return
+        if time.time() < self._next_restart.get(session.name, 0):
+            return
+
+        def restart():
+            # pool.stop() may have run since this was queued
+            if session.state != 'recovering':
+                return False
+            return session.bot.restart()
+
+        attempt = self._restarts.get(session.name, 0)
+        logging.info(f"[HEALTH] Restarting {session.name} (attempt {attempt + 1})")
+        future = session.dispatcher.call(restart)
+        self._probes[session.name] = future
+        future.add_done_callback(lambda f: self._restarted(session, f))
+
+    def _restarted(self, session, future):
+        try:
+            started = bool(future.result())
+        except Exception:
+            started = False
+        if session.state != 'recovering':
+            return
+        attempt = self._restarts.get(session.name, 0) + 1
+        if started:
+            session.restarts += 1
+            session.consecutive_failures = 0
+            logging.info(f"[HEALTH] {session.name} recovered after {attempt} attempt(s)")
+            self._set_state(session, 'ready')
+            session.dispatcher.resume()
+            return
+        self._restarts[session.name] = attempt
+        delay = RESTART_BACKOFF[min(attempt, len(RESTART_BACKOFF) - 1)]
+        self._next_restart[session.name] = time.time() + delay
+        logging.error(f"[HEALTH] Restart of {session.name} failed; retrying in {delay}s")
+
+    def _set_state(self, session, state):
+        old, session.state = session.state, state
+        if self.on_change and old != state:
+            try:
+                self.on_change(session, old, state)
+            except Exception as e:
+                logging.error(f"[HEALTH] State change hook failed: {str(e)}", exc_info=True)
+
+    def summary(self):
+        return {
+            'running': self.is_running,
+            'interval': self.interval,
+            'sessions': {session.name: {'state': session.state, 'health': session.health,
+                                        'last_probe': session.last_probe, 'restarts': session.restarts}
+                         for session in self.pool.sessions},
+        }
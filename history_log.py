@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import logging
+from datetime import datetime
+
+SEGMENT_PREFIX = 'history-'
+SEGMENT_SUFFIX = '.jsonl'
+READ_BLOCK_SIZE = 64 * 1024
+# Most entries one filtered page reads before returning what it has found
+PAGE_SCAN_LIMIT = 20000
+
+
+class HistoryLog:
+    """Append-only message history split into one JSONL segment per day
+
+    Appending a send writes a single line to today's segment, so the cost
+    does not grow with the size of the history. Reads walk the segments
+    newest-first, reading each file backwards in blocks, and resume from
+    an opaque cursor ("<segment>:<byte offset>").
+    """
+
+    def __init__(self, directory='history'):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._handle = None
+        self._handle_segment = None
+        os.makedirs(directory, exist_ok=True)
+
+    # -- writing ----------------------------------------------------------
+
+    @staticmethod
+    def segment_for(timestamp):
+        """Return the segment name for a 'YYYY-MM-DD HH:MM:SS' timestamp"""
+        day = (timestamp or '')[:10] or datetime.now().strftime('%Y-%m-%d')
+        return f'{SEGMENT_PREFIX}{day}{SEGMENT_SUFFIX}'
+
+    def _open(self, segment):
+        if self._handle_segment != segment:
+            if self._handle:
+                self._handle.close()
+            self._handle = open(os.path.join(self.directory, segment), 'a', encoding='utf-8')
+            self._handle_segment = segment
+        return self._handle
+
+    def append(self, entry):
+        """Append one history entry; a missing timestamp is set to now"""
+        entry = dict(entry)
+        entry.setdefault('timestamp', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            handle = self._open(self.segment_for(entry['timestamp']))
+            handle.write(line)
+            handle.flush()
+        return entry
+
+    def import_entries(self, entries):
+        """Bulk-append existing entries (oldest first) into their dated segments"""
+        count = 0
+        with self._lock:
+            for entry in sorted(entries, key=lambda e: e.get('timestamp', '')):
+                handle = self._open(self.segment_for(entry.get('timestamp')))
+                handle.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                count += 1
+            if self._handle:
+                self._handle.flush()
+        return count
+
+    def close(self):
+        with self._lock:
+            if self._handle:
+                self._handle.close()
+            self._handle = None
+            self._handle_segment = None
+
+    # -- reading ----------------------------------------------------------
+
+    def segments(self, first_day=None, last_day=None):
+        """Segment file names, newest first, optionally only days in [first_day, last_day]"""
+        names = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+                continue
+            day = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            names.append(name)
+        return sorted(names, reverse=True)
+
+    def _read_backwards(self, segment, end=None):
+        """Yield (offset, entry) for each line of `segment` before byte `end`, last line first"""
+        path = os.path.join(self.directory, segment)
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell() if end is None else min(end, f.tell())
+            if end is None:
+                # A line still being appended has no newline yet; start before it
+                position = self._line_start(f, position)
+            buffer = b''
+            while position > 0:
+                read_size = min(READ_BLOCK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                buffer = f.read(read_size) + buffer
+                lines = buffer.split(b'\n')
+                # The first piece may be a partial line; keep it for the next block
+                buffer = lines.pop(0)
+                offset = position + len(buffer) + 1
+                line_offsets = []
+                for line in lines:
+                    line_offsets.append((offset, line))
+                    offset += len(line) + 1
+                for line_offset, line in reversed(line_offsets):
+                    if line.strip():
+                        yield line_offset, json.loads(line)
+            if buffer.strip():
+                yield 0, json.loads(buffer)
+
+    @staticmethod
+    def _line_start(f, end):
+        """Offset just after the last newline before byte `end` (0 if there is none)"""
+        position = end
+        while position > 0:
+            read_size = min(READ_BLOCK_SIZE, position)
+            f.seek(position - read_size)
+            newline = f.read(read_size).rfind(b'\n')
+            if newline >= 0:
+                return position - read_size + newline + 1
+            position -= read_size
+        return 0
+
+    def _read_forwards(self, segment, start=0):
+        """Yield (offset after the line, entry) for each line of `segment` from byte `start`"""
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                offset += len(line)
+                # A line still being appended has no newline yet
+                if not line.endswith(b'\n'):
+                    return
+                if line.strip():
+                    yield offset, json.loads(line)
+
+    def iter_oldest(self, cursor=None, first_day=None, last_day=None):
+        """Stream entries oldest first as (cursor, entry) pairs"""
+        segment, start = None, 0
+        if cursor:
+            segment, _, offset = cursor.rpartition(':')
+            start = int(offset)
+        for name in reversed(self.segments(first_day, last_day)):
+            if segment and name < segment:
+                continue
+            for offset, entry in self._read_forwards(name, start if name == segment else 0):
+                yield f'{name}:{offset}', entry
+
+    def iter_newest(self, cursor=None, first_day=None, last_day=None):
+        """Stream entries newest first as (cursor, entry) pairs
+
+        The cursor yielded with an entry resumes iteration just after it.
+        """
+        segment, end = None, None
+        if cursor:
+            segment, _, offset = cursor.rpartition(':')
+            end = int(offset)
+        for name in self.segments(first_day, last_day):
+            if segment and name > segment:
+                continue
+            for offset, entry in self._read_backwards(name, end if name == segment else None):
+                yield f'{name}:{offset}', entry
+
+    def page(self, limit=50, cursor=None, oldest_first=False, status=None, recipient=None,
+             since=None, until=None):
+        """Return up to `limit` matching entries newest first and the cursor for the next page
+
+        A filtered page stops after PAGE_SCAN_LIMIT entries, so it may hold
+        fewer than `limit` entries while still returning a cursor.
+
+        Args:
+            oldest_first (bool): walk the history from the start instead
+            status (str): only entries with this status
+            recipient (str): only entries whose recipient name or phone contains this
+            since, until (str): inclusive 'YYYY-MM-DD[ HH:MM:SS]' bounds; whole
+                day segments outside them are never opened
+
+        Returns:
+            tuple: (entries, next_cursor); next_cursor is None on the last page
+        """
+        recipient = recipient.lower() if recipient else None
+        first_day, last_day = (since or '')[:10] or None, (until or '')[:10] or None
+        iterator = self.iter_oldest if oldest_first else self.iter_newest
+        entries = []
+        next_cursor = None
+        for scanned, (position, entry) in enumerate(iterator(cursor, first_day, last_day)):
+            if len(entries) == limit or scanned == PAGE_SCAN_LIMIT:
+                return entries, next_cursor
+            next_cursor = position
+            if status and entry.get('status') != status:
+                continue
+            if recipient and recipient not in str(entry.get('recipient', '')).lower() \
+                    and recipient not in str(entry.get('phone', '')).lower():
+                continue
+            timestamp = entry.get('timestamp', '')
+            if (since and timestamp < since) or (until and timestamp[:len(until)] > until):
+                continue
+            entries.append(entry)
+        return entries, None
+
+
+def migrate_store_history(store, history):
+    """Move history entries still held by `store` into the append-only log
+
+    The log is written before the store's copy is removed, so a crash in
+    between can at worst import the entries twice, never lose them.
+    """
+    entries = store.list_history()
+    if entries:
+        history.import_entries(entries)
+        store.drain_history()
+        logging.info(f"[HISTORY] Moved {len(entries)} history entries into {history.directory}/")
+    return len(entries)
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+import logging
+
+from storage import atomic_write_json
+from phone_numbers import InvalidPhoneNumber
+
+# How long a number WhatsApp rejected stays blocked before it is tried again
+DEFAULT_TTL = 30 * 24 * 3600
+
+
+class KnownInvalidNumber(InvalidPhoneNumber):
+    """A number WhatsApp has already reported as invalid or not registered"""
+
+
+class InvalidNumberCache:
+    """Persistent negative cache of numbers WhatsApp Web rejected
+
+    Keyed by normalized (E.164 digits) phone. Lookups are a dict access;
+    entries expire after `ttl` seconds (or never, for manual blocks with
+    ttl=0). The file is rewritten atomically when an entry is added or
+    removed; hit counts are kept in memory and saved with the next write
+    or on close().
+
+    Args:
+        on_change: callable(phone, entry) run after a number is blocked,
+            or (phone, None) after it is cleared
+    """
+
+    def __init__(self, path='invalid_numbers.json', ttl=DEFAULT_TTL, on_change=None):
+        self.path = path
+        self.ttl = ttl
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.blocked = 0
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                self._entries = data.get('numbers', {})
+                self.hits = data.get('hits', 0)
+            except (OSError, ValueError) as e:
+                logging.warning(f"[INVALID] Ignoring unreadable {path}: {str(e)}")
+
+    def _save(self):
+        """Write the cache; caller must hold the lock"""
+        atomic_write_json(self.path, {'numbers': self._entries, 'hits': self.hits})
+        self._dirty = False
+
+    @staticmethod
+    def _expired(entry, now):
+        return entry.get('expires_at') is not None and entry['expires_at'] <= now
+
+    def check(self, phone):
+        """Return the cache entry if `phone` is known to be invalid, else None
+
+        Every hit is counted, per number and in total.
+        """
+        with self._lock:
+            entry = self._entries.get(phone)
+            if entry is None:
+                return None
+            expired = self._expired(entry, time.time())
+            if expired:
+                del self._entries[phone]
+            else:
+                entry['hits'] = entry.get('hits', 0) + 1
+                self.hits += 1
+                entry = dict(entry)
+            self._dirty = True
+        if expired:
+            logging.info(f"[INVALID] +{phone} expired")
+            if self.on_change:
+                self.on_change(phone, None)
+            return None
+        return entry
+
+    def add(self, phone, reason='invalid', ttl=None, source='whatsapp'):
+        """Block `phone`; a repeat report refreshes its expiry
+
+        Args:
+            ttl (float): seconds until it expires (default: the cache TTL;
+                0 never expires)
+            source (str): 'whatsapp' when detected on a send, 'manual' otherwise
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(phone) or {'first_seen': now, 'hits': 0, 'reports': 0}
+            entry.update({
+                'reason': reason,
+                'source': source,
+                'last_seen': now,
+                'reports': entry.get('reports', 0) + 1,
+                'expires_at': now + ttl if ttl else None,
+            })
+            self._entries[phone] = entry
+            self.blocked += 1
+            self._save()
+            entry = dict(entry)
+        logging.info(f"[INVALID] +{phone} blocked ({reason}, {source})")
+        if self.on_change:
+            self.on_change(phone, entry)
+        return entry
+
+    def remove(self, phone):
+        """Manual override: allow sends to `phone` again
+
+        Returns:
+            bool: True if the number was in the cache
+        """
+        with self._lock:
+            if self._entries.pop(phone, None) is None:
+                return False
+            self._save()
+        logging.info(f"[INVALID] +{phone} cleared")
+        if self.on_change:
+            self.on_change(phone, None)
+        return True
+
+    def entries(self):
+        """Live entries, most hit first"""
+        now = time.time()
+        with self._lock:
+            items = [dict(entry, phone=phone) for phone, entry in self._entries.items()
+                     if not self._expired(entry, now)]
+        return sorted(items, key=lambda entry: entry.get('hits', 0), reverse=True)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'numbers': len(self._entries),
+                'hits': self.hits,
+                'blocked': self.blocked,
+                'ttl_days': round(self.ttl / 86400, 2),
+            }
+
+    def close(self):
+        """Save hit counts gathered since the last write"""
+        with self._lock:
+            if self._dirty:
+                self._save()
@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+import logging
+
+from selenium.webdriver.common.by import By
+
+from storage import atomic_write_json
+
+# Every DOM element the bot relies on, with the locators known to match it.
+# The registry reorders each list at runtime; this is only the initial order.
+DEFAULT_LOCATORS = {
+    'side': [
+        (By.ID, "side"),
+        (By.XPATH, "//div[@id='side']"),
+    ],
+    'qr_code': [
+        (By.CSS_SELECTOR, "div[data-testid='qrcode']"),
+        (By.CSS_SELECTOR, "div[data-ref] canvas"),
+        (By.CSS_SELECTOR, "canvas[aria-label*='Scan']"),
+    ],
+    'search_box': [
+        (By.XPATH, "//div[@id='side']//div[@contenteditable='true']"),
+        (By.CSS_SELECTOR, "#side div[role='textbox']"),
+    ],
+    'chat_list_item': [
+        (By.XPATH, "//div[@id='pane-side']//div[@role='listitem' or @role='row']"),
+    ],
+    'chat_header': [
+        (By.CSS_SELECTOR, "#main header span[dir='auto']"),
+        (By.XPATH, "//div[@id='main']//header//span[@title]"),
+        (By.CSS_SELECTOR, "#main header span"),
+    ],
+    'chat_message_id': [
+        (By.CSS_SELECTOR, "#main div[data-id]"),
+    ],
+    'input_box': [
+        (By.XPATH, "//div[@title='Type a message' and @role='textbox']"),
+        (By.XPATH, "//footer//div[@role='textbox']"),
+        (By.XPATH, "//div[@class='_3Uu1_']//div[@role='textbox']"),
+        (By.CSS_SELECTOR, "div[title='Type a message']"),
+    ],
+    'send_button': [
+        (By.XPATH, "//button//span[@data-icon='send']"),
+        (By.CSS_SELECTOR, "button[aria-label='Send']"),
+        (By.CSS_SELECTOR, "span[data-icon='send']"),
+    ],
+    'msg_check': [
+        (By.XPATH, "//span[@data-icon='msg-check' or @data-icon='msg-dblcheck']"),
+        (By.CSS_SELECTOR, "span[data-icon='msg-check']"),
+    ],
+    'invalid_number': [
+        (By.XPATH, "//div[contains(text(),'Phone number shared via url is invalid')]"),
+        (By.XPATH, "//*[contains(text(),'shared via url is invalid')]"),
+    ],
+}
+
+# Minimum seconds between two ranking saves
+SAVE_INTERVAL = 30
+
+
+def _key(locator):
+    return f"{locator[0]}={locator[1]}"
+
+
+class LocatorRegistry:
+    """Remembers which DOM locator works for each element the bot needs
+
+    Each named group keeps its locators in most-recently-successful order,
+    so after a WhatsApp UI change the first lookup pays for the stale
+    locators once and every later lookup goes straight to the one that
+    worked. Hit/miss counts and query latency are tracked per locator, and
+    the ranking is persisted to `path` so it survives restarts.
+    """
+
+    def __init__(self, path='locators.json', defaults=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._groups = {name: list(locators) for name, locators in (defaults or DEFAULT_LOCATORS).items()}
+        self._stats = {}
+        self._dirty = False
+        self._last_save = 0
+        if path and os.path.exists(path):
+            try:
+                self._load()
+            except Exception as e:
+                logging.error(f"[LOCATORS] Ignoring unreadable {path}: {str(e)}")
+
+    def _load(self):
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        for name, saved in data.get('groups', {}).items():
+            known = {_key(locator): locator for locator in self._groups.get(name, [])}
+            ranked = [known[entry['key']] for entry in saved if entry.get('key') in known]
+            # Locators added to the code since the last save go last
+            ranked += [locator for key, locator in known.items() if locator not in ranked]
+            self._groups[name] = ranked
+            for entry in saved:
+                if entry.get('key') in known:
+                    self._stats[(name, entry['key'])] = {
+                        'hits': entry.get('hits', 0),
+                        'misses': entry.get('misses', 0),
+                        'queries': entry.get('queries', 0),
+                        'query_seconds': entry.get('query_seconds', 0.0),
+                    }
+
+    def _stat(self, name, locator):
+        return self._stats.setdefault((name, _key(locator)),
+                                      {'hits': 0, 'misses': 0, 'queries': 0, 'query_seconds': 0.0})
+
+    def ordered(self, name):
+        """The group's locators, best first"""
+        with self._lock:
+            return list(self._groups[name])
+
+    def _query(self, driver, name, locator):
+        started = time.time()
+        try:
+            return driver.find_elements(*locator)
+        finally:
+            with self._lock:
+                stat = self._stat(name, locator)
+                stat['queries'] += 1
+                stat['query_seconds'] += time.time() - started
+
+    def _record_win(self, name, winner, tried):
+        with self._lock:
+            self._stat(name, winner)['hits'] += 1
+            for locator in tried:
+                self._stat(name, locator)['misses'] += 1
+            group = self._groups[name]
+            if group[0] != winner:
+                group.remove(winner)
+                group.insert(0, winner)
+                logging.info(f"[LOCATORS] {name}: promoted {_key(winner)}")
+            self._dirty = True
+        self._maybe_save()
+
+    def find(self, driver, name, predicate=None):
+        """Return the first element of group `name` that exists (and passes `predicate`)
+
+        Returns None when no locator matches, so it can be used directly as
+        a WebDriverWait condition.
+        """
+        tried = []
+        for locator in self.ordered(name):
+            for element in self._query(driver, name, locator):
+                if predicate is None or predicate(element):
+                    self._record_win(name, locator, tried)
+                    return element
+            tried.append(locator)
+        return None
+
+    def record(self, name, index):
+        """Count a match of the group's locator at `index` (in ordered() order)
+
+        For transports that run the lookup themselves, inside the page.
+        """
+        ordered = self.ordered(name)
+        if 0 <= index < len(ordered):
+            self._record_win(name, ordered[index], ordered[:index])
+
+    def find_all(self, driver, name):
+        """Return the elements matched by the first locator of `name` that matches any"""
+        tried = []
+        for locator in self.ordered(name):
+            elements = self._query(driver, name, locator)
+            if elements:
+                self._record_win(name, locator, tried)
+                return elements
+            tried.append(locator)
+        return []
+
+    def _maybe_save(self):
+        if self.path and time.time() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Persist the ranking and counters if anything changed"""
+        if not self.path:
+            return False
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = {'groups': self._summary_locked()}
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            atomic_write_json(self.path, data)
+        except Exception as e:
+            logging.error(f"[LOCATORS] Error saving {self.path}: {str(e)}")
+            return False
+        return True
+
+    def _summary_locked(self):
+        summary = {}
+        for name, locators in self._groups.items():
+            summary[name] = []
+            for locator in locators:
+                stat = self._stat(name, locator)
+                summary[name].append({
+                    'key': _key(locator),
+                    'hits': stat['hits'],
+                    'misses': stat['misses'],
+                    'queries': stat['queries'],
+                    'query_seconds': round(stat['query_seconds'], 4),
+                    'avg_query_ms': round(1000 * stat['query_seconds'] / stat['queries'], 2) if stat['queries'] else None,
+                })
+        return summary
+
+    def summary(self):
+        """Current ranking with hit/miss counts and latency for every group"""
+        with self._lock:
+            return self._summary_locked()
@@ -0,0 +1,126 @@
+import os
+from functools import lru_cache
+
+# Country assumed for numbers written without a country code (national
+# format, e.g. 09335669767 or 9335669767)
+DEFAULT_COUNTRY = os.environ.get('WHATSAPP_DEFAULT_COUNTRY', 'IN').upper()
+
+# Calling code and valid national number lengths (trunk prefix stripped) per
+# country; numbers for other calling codes only get the generic E.164 check
+COUNTRIES = {
+    'US': ('1', (10,)),
+    'RU': ('7', (10,)),
+    'EG': ('20', (8, 9, 10)),
+    'ZA': ('27', (9,)),
+    'NL': ('31', (9,)),
+    'FR': ('33', (9,)),
+    'ES': ('34', (9,)),
+    'IT': ('39', (6, 7, 8, 9, 10, 11)),
+    'GB': ('44', (9, 10)),
+    'DE': ('49', (6, 7, 8, 9, 10, 11, 12, 13)),
+    'MX': ('52', (10,)),
+    'BR': ('55', (10, 11)),
+    'AU': ('61', (9,)),
+    'ID': ('62', (9, 10, 11, 12)),
+    'PH': ('63', (10,)),
+    'JP': ('81', (9, 10)),
+    'CN': ('86', (10, 11)),
+    'TR': ('90', (10,)),
+    'IN': ('91', (10,)),
+    'PK': ('92', (10,)),
+    'NG': ('234', (8, 10)),
+    'KE': ('254', (9,)),
+    'SA': ('966', (9,)),
+    'AE': ('971', (8, 9)),
+}
+NATIONAL_LENGTHS = {code: lengths for code, lengths in COUNTRIES.values()}
+
+# E.164: at most 15 digits including the country code
+MIN_DIGITS = 8
+MAX_DIGITS = 15
+
+# Distinct raw inputs remembered by normalize_phone
+CACHE_SIZE = 65536
+
+
+class InvalidPhoneNumber(ValueError):
+    """A phone number that cannot be turned into a valid E.164 number"""
+
+
+def _split(number):
+    """(calling code, national number) for a known calling code, else (None, number)"""
+    for size in (1, 2, 3):
+        if number[:size] in NATIONAL_LENGTHS:
+            return number[:size], number[size:]
+    return None, number
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize(raw, default_country):
+    """(E.164 digits, None) or (None, error); errors are cached too"""
+    text = raw.strip()
+    digits = ''.join(filter(str.isdigit, text))
+    if not digits:
+        return None, f"Phone number {raw!r} has no digits"
+    if text.startswith('+'):
+        number = digits
+    elif digits.startswith('00'):
+        number = digits[2:]
+    else:
+        code, lengths = COUNTRIES[default_country]
+        if digits.startswith('0') and len(digits) - 1 in lengths:
+            # National format with a trunk 0
+            number = code + digits[1:]
+        elif len(digits) in lengths and not (digits.startswith(code) and len(digits) - len(code) in lengths):
+            # National format without the trunk prefix
+            number = code + digits
+        else:
+            number = digits
+    if number.startswith('0'):
+        return None, f"Phone number {raw!r} has no country code"
+    if not MIN_DIGITS <= len(number) <= MAX_DIGITS:
+        return None, f"Phone number {raw!r} must have {MIN_DIGITS}-{MAX_DIGITS} digits with the country code"
+    code, national = _split(number)
+    if code is not None:
+        # A leading trunk 0 written after the country code (+44 07...)
+        if national.startswith('0') and len(national) - 1 in NATIONAL_LENGTHS[code]:
+            national = national[1:]
+        if len(national) not in NATIONAL_LENGTHS[code]:
+            expected = '/'.join(str(length) for length in NATIONAL_LENGTHS[code])
+            return None, f"Phone number {raw!r} needs {expected} digits after country code +{code}"
+        number = code + national
+    return number, None
+
+
+def normalize_phone(raw, default_country=None):
+    """Return `raw` as E.164 digits without the '+' (the form recipients are stored in)
+
+    Accepts '+20 10 1234 5678', '0020...', '201012345678' and, for the
+    default country, national numbers with or without the trunk 0.
+    Results (and rejections) are memoized, so repeat numbers cost a dict
+    lookup.
+
+    Raises:
+        InvalidPhoneNumber: if the number is empty, too short/long, or has
+            the wrong length for its country
+    """
+    country = (default_country or DEFAULT_COUNTRY).upper()
+    if country not in COUNTRIES:
+        raise InvalidPhoneNumber(f"Unknown default country {country!r}")
+    number, error = _normalize(str(raw or ''), country)
+    if error:
+        raise InvalidPhoneNumber(error)
+    return number
+
+
+def is_valid_phone(raw, default_country=None):
+    try:
+        normalize_phone(raw, default_country)
+        return True
+    except InvalidPhoneNumber:
+        return False
+
+
+def cache_info():
+    info = _normalize.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
@@ -0,0 +1,231 @@
+import calendar
+from datetime import datetime, timedelta
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+SCHEDULE_TYPES = ('one_time', 'daily', 'weekly', 'monthly', 'cron')
+
+# Cron field names; cron weekdays count from Sunday = 0 (7 is Sunday too)
+_MONTH_NAMES = {name: index for index, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+_WEEKDAY_NAMES = {name: index for index, name in enumerate(
+    ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))}
+
+# A cron expression that has not matched within this many years never will (e.g. "0 0 30 2 *")
+_CRON_SEARCH_YEARS = 5
+
+
+class RecurrenceError(ValueError):
+    """Raised for schedules whose timing fields cannot be understood"""
+
+
+def _parse_cron_field(text, low, high, names=None):
+    values = set()
+    for part in text.lower().split(','):
+        spec, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise RecurrenceError(f"Invalid step in cron field '{text}'")
+        if spec == '*':
+            start, end = low, high
+        else:
+            first, _, last = spec.partition('-')
+            try:
+                start = names[first] if names and first in names else int(first)
+                end = (names[last] if names and last in names else int(last)) if last else start
+            except ValueError:
+                raise RecurrenceError(f"Invalid cron field '{text}'") from None
+            if step > 1 and not last:
+                end = high
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise RecurrenceError(f"Cron field '{text}' is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronExpression:
+    """A standard 5-field cron expression: minute hour day-of-month month day-of-week
+
+    As in cron, when both day-of-month and day-of-week are restricted a day
+    matches if either does.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise RecurrenceError(f"Cron expression needs 5 fields, got {len(fields)}: '{expression}'")
+        self.expression = ' '.join(fields)
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = set(_parse_cron_field(fields[2], 1, 31))
+        self.months = _parse_cron_field(fields[3], 1, 12, _MONTH_NAMES)
+        # Convert to Python weekdays (Monday = 0)
+        self.weekdays = {(day + 6) % 7 for day in _parse_cron_field(fields[4], 0, 7, _WEEKDAY_NAMES)}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _day_matches(self, moment):
+        in_days = moment.day in self.days
+        in_weekdays = moment.weekday() in self.weekdays
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return in_weekdays
+        if self.any_weekday:
+            return in_days
+        return in_days or in_weekdays
+
+    def next_fire(self, after):
+        """First matching minute strictly after `after`, or None"""
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after.year + _CRON_SEARCH_YEARS
+        while moment.year <= limit:
+            if moment.month not in self.months:
+                month = next((m for m in self.months if m > moment.month), None)
+                moment = (moment.replace(month=month, day=1, hour=0, minute=0) if month
+                          else moment.replace(year=moment.year + 1, month=self.months[0], day=1, hour=0, minute=0))
+                continue
+            if not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if moment.hour not in self.hours:
+                hour = next((h for h in self.hours if h > moment.hour), None)
+                moment = (moment.replace(hour=hour, minute=0) if hour is not None
+                          else moment.replace(hour=0, minute=0) + timedelta(days=1))
+                continue
+            if moment.minute not in self.minutes:
+                minute = next((m for m in self.minutes if m > moment.minute), None)
+                moment = (moment.replace(minute=minute) if minute is not None
+                          else moment.replace(minute=0) + timedelta(hours=1))
+                continue
+            return moment
+        return None
+
+
+class Recurrence:
+    """When a schedule fires, computed analytically from its fields
+
+    Supported schedule types:
+      - one_time: `date` (YYYY-MM-DD) at `time` (HH:MM)
+      - daily: every day at `time`
+      - weekly: on each of `days` (weekday names) at `time`
+      - monthly: on day `day` (1-31) at `time`; months that are shorter
+        fire on their last day instead
+      - cron: the 5-field expression in `cron`
+    """
+
+    def __init__(self, kind, at=None, date=None, weekdays=None, day_of_month=None, cron=None):
+        self.kind = kind
+        self.at = at
+        self.date = date
+        self.weekdays = weekdays
+        self.day_of_month = day_of_month
+        self.cron = cron
+
+    @classmethod
+    def from_schedule(cls, schedule_item):
+        """Build a Recurrence from a stored schedule dict
+
+        Raises:
+            RecurrenceError: if a field is missing or invalid
+        """
+        kind = schedule_item.get('type')
+        if kind not in SCHEDULE_TYPES:
+            raise RecurrenceError(f"Unknown schedule type: {kind}")
+        if kind == 'cron':
+            if not schedule_item.get('cron'):
+                raise RecurrenceError('Cron schedules need a cron expression')
+            return cls(kind, cron=CronExpression(schedule_item['cron']))
+        try:
+            at = datetime.strptime(schedule_item.get('time') or '', '%H:%M').time()
+        except ValueError:
+            raise RecurrenceError(f"Invalid time '{schedule_item.get('time')}', expected HH:MM") from None
+
+        if kind == 'one_time':
+            try:
+                date = datetime.strptime(schedule_item.get('date') or '', '%Y-%m-%d').date()
+            except ValueError:
+                raise RecurrenceError(f"Invalid date '{schedule_item.get('date')}', expected YYYY-MM-DD") from None
+            return cls(kind, at=at, date=date)
+        if kind == 'weekly':
+            # Older schedules stored a single `day`
+            days = schedule_item.get('days') or [schedule_item.get('day') or '']
+            if isinstance(days, str):
+                days = [days]
+            try:
+                weekdays = sorted({WEEKDAYS.index(day.strip().lower()) for day in days})
+            except ValueError:
+                raise RecurrenceError(f"Invalid weekday in {days}") from None
+            return cls(kind, at=at, weekdays=weekdays)
+        if kind == 'monthly':
+            try:
+                day_of_month = int(schedule_item.get('day'))
+            except (TypeError, ValueError):
+                day_of_month = None
+            if not day_of_month or not 1 <= day_of_month <= 31:
+                raise RecurrenceError(f"Invalid day of month '{schedule_item.get('day')}'")
+            return cls(kind, at=at, day_of_month=day_of_month)
+        return cls(kind, at=at)
+
+    def next_fire(self, after):
+        """First fire time strictly after `after`, or None if there is none"""
+        if self.kind == 'cron':
+            return self.cron.next_fire(after)
+        if self.kind == 'one_time':
+            due = datetime.combine(self.date, self.at)
+            return due if due > after else None
+        if self.kind == 'daily':
+            due = datetime.combine(after.date(), self.at)
+            return due if due > after else due + timedelta(days=1)
+        if self.kind == 'weekly':
+            for offset in range(8):
+                day = after.date() + timedelta(days=offset)
+                if day.weekday() in self.weekdays:
+                    due = datetime.combine(day, self.at)
+                    if due > after:
+                        return due
+            return None
+        # monthly, clamped to the end of short months
+        year, month = after.year, after.month
+        for _ in range(2):
+            day = min(self.day_of_month, calendar.monthrange(year, month)[1])
+            due = datetime.combine(after.date().replace(year=year, month=month, day=day), self.at)
+            if due > after:
+                return due
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return None
+
+    def between(self, start, end, limit=None):
+        """Fire times after `start` and up to and including `end`, oldest first"""
+        fires = []
+        due = self.next_fire(start)
+        while due is not None and due <= end and (limit is None or len(fires) < limit):
+            fires.append(due)
+            due = self.next_fire(due)
+        return fires
+
+    def last_between(self, start, end):
+        """Latest fire time after `start` and up to and including `end`, or None
+
+        Searches the last day, month and year before `end` first, so a long
+        gap since `start` does not mean walking every fire in it.
+        """
+        for window in (timedelta(days=1), timedelta(days=32), timedelta(days=366), None):
+            since = start if window is None else max(start, end - window)
+            last = None
+            due = self.next_fire(since)
+            while due is not None and due <= end:
+                last = due
+                due = self.next_fire(due)
+            if last is not None or since == start:
+                return last
+        return None
+
+    def upcoming(self, after, count=5):
+        """The next `count` fire times after `after`"""
+        fires = []
+        due = self.next_fire(after)
+        while due is not None and len(fires) < count:
+            fires.append(due)
+            due = self.next_fire(due)
+        return fires
@@ -0,0 +1,242 @@
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+import logging
+from datetime import datetime
+
+# Rebuild the heap once cancelled/replaced entries outnumber live ones by this much
+COMPACT_THRESHOLD = 1024
+
+# Schedule fields that are bookkeeping rather than definition; changing them
+# does not re-arm a schedule
+BOOKKEEPING_FIELDS = ('last_fired',)
+
+
+def _timestamp(when):
+    return when.timestamp() if isinstance(when, datetime) else float(when)
+
+
+class TimerScheduler:
+    """One thread firing keyed callbacks at their due times
+
+    Due times live in a min-heap; the thread sleeps on a condition until
+    the earliest one (or forever when nothing is scheduled) and is woken
+    early whenever an insert or cancel changes the head. Each key holds at
+    most one pending fire: adding an existing key replaces it, and
+    replaced or cancelled heap entries are skipped lazily.
+
+    A callback is called as `callback(key, due)` on the scheduler thread and
+    may return the next due time (datetime or epoch seconds) to re-arm the
+    key, or None to drop it. Callbacks should only queue work, not do it.
+    """
+
+    def __init__(self, name='scheduler'):
+        self.name = name
+        self._cond = threading.Condition()
+        self._heap = []
+        self._entries = {}
+        self._sequence = itertools.count()
+        self._thread = None
+        self._running = False
+        self._firing = None
+        self._firing_cancelled = False
+        self._fired = 0
+
+    # -- lifecycle --------------------------------------------------------
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        logging.info(f"[SCHEDULER] Timer thread started with {len(self)} scheduled")
+
+    def stop(self, timeout=10):
+        """Stop the thread; scheduled entries are kept for the next start()"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    @property
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    # -- registry ---------------------------------------------------------
+
+    def add(self, key, when, callback):
+        """Schedule (or reschedule) `key` to fire at `when`"""
+        due = _timestamp(when)
+        with self._cond:
+            entry = [due, next(self._sequence), key, callback]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+            self._maybe_compact()
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    def cancel(self, key):
+        """Drop `key`; returns False if it was not scheduled"""
+        with self._cond:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                if key == self._firing:
+                    # Cancelled from inside (or during) its own callback
+                    self._firing_cancelled = True
+                    return True
+                return False
+            if self._heap and self._heap[0] is entry:
+                self._cond.notify()
+            self._maybe_compact()
+            return True
+
+    def next_due(self, key):
+        with self._cond:
+            entry = self._entries.get(key)
+            return datetime.fromtimestamp(entry[0]) if entry else None
+
+    def keys(self):
+        with self._cond:
+            return list(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def upcoming(self, limit=10):
+        """The next `limit` fires as (due datetime, key), soonest first"""
+        with self._cond:
+            live = heapq.nsmallest(limit, (e for e in self._entries.values()))
+        return [(datetime.fromtimestamp(e[0]), e[2]) for e in live]
+
+    def summary(self):
+        upcoming = self.upcoming(1)
+        return {
+            'scheduled': len(self),
+            'next_due': upcoming[0][0].strftime('%Y-%m-%d %H:%M:%S') if upcoming else None,
+            'fired': self._fired,
+            'thread_alive': self.is_running,
+        }
+
+    def _is_live(self, entry):
+        return self._entries.get(entry[2]) is entry
+
+    def _maybe_compact(self):
+        """Drop dead heap entries once they dominate; caller holds the lock"""
+        if len(self._heap) > 2 * len(self._entries) + COMPACT_THRESHOLD:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+
+    # -- thread -----------------------------------------------------------
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    while self._heap and not self._is_live(self._heap[0]):
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if not self._running:
+                    return
+                entry = heapq.heappop(self._heap)
+                del self._entries[entry[2]]
+                self._firing, self._firing_cancelled = entry[2], False
+            due, _, key, callback = entry
+            self._fired += 1
+            try:
+                next_due = callback(key, datetime.fromtimestamp(due))
+            except Exception as e:
+                logging.error(f"[SCHEDULER] Callback for {key} failed: {str(e)}", exc_info=True)
+                next_due = None
+            with self._cond:
+                # Re-arm unless the key was re-added or cancelled meanwhile
+                if next_due is not None and key not in self._entries and not self._firing_cancelled:
+                    entry = [_timestamp(next_due), next(self._sequence), key, callback]
+                    self._entries[key] = entry
+                    heapq.heappush(self._heap, entry)
+                self._firing = None
+
+
+def content_hash(schedule_item):
+    """Hash of the fields that define when and what a schedule sends"""
+    definition = {k: v for k, v in schedule_item.items() if k not in BOOKKEEPING_FIELDS}
+    return hashlib.sha1(json.dumps(definition, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ScheduleReconciler:
+    """Keeps the timer in step with the stored schedules
+
+    Each reconcile() reads only the schedules changed since the previous
+    call (through the store's `schedule_changes` feed) and compares their
+    content hash with the one that was armed: new or edited schedules are
+    (re-)armed, deactivated ones are cancelled, and anything else is left
+    alone. Calling it repeatedly is safe and costs nothing when nothing
+    changed.
+
+    Args:
+        store: store providing schedule_changes(since)
+        timer: TimerScheduler to arm
+        first_fire: callable(schedule) -> datetime or None
+        callback: timer callback for schedule fires
+    """
+
+    def __init__(self, store, timer, first_fire, callback):
+        self.store = store
+        self.timer = timer
+        self.first_fire = first_fire
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._armed = {}
+        self._cursor = None
+
+    def reconcile(self):
+        """Apply every schedule change since the last call
+
+        Returns:
+            dict: counts of added, updated, removed and unchanged schedules
+        """
+        result = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        with self._lock:
+            changes, self._cursor = self.store.schedule_changes(self._cursor)
+            for schedule_item in changes:
+                result[self._apply(schedule_item)] += 1
+        if changes:
+            logging.info(f"[SCHEDULER] Reconciled {len(changes)} changed schedules: {result}")
+        return result
+
+    def _apply(self, schedule_item):
+        key = str(schedule_item['id'])
+        if not schedule_item.get('active', True):
+            if self._armed.pop(key, None) is None:
+                return 'unchanged'
+            self.timer.cancel(key)
+            return 'removed'
+        digest = content_hash(schedule_item)
+        previous = self._armed.get(key)
+        if previous == digest:
+            return 'unchanged'
+        self._armed[key] = digest
+        due = self.first_fire(schedule_item)
+        if due is None:
+            self.timer.cancel(key)
+        else:
+            self.timer.add(key, due, self.callback)
+        return 'added' if previous is None else 'updated'
+
+    def summary(self):
+        with self._lock:
+            return {'tracked': len(self._armed), 'cursor': self._cursor}
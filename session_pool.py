@@ -0,0 +1,246 @@
+import itertools
+import os
+import threading
+import time
+import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from dispatch import Dispatcher, HoldJob, RejectedSend
+from whatsapp_auto import WhatsAppBot
+
+ROUTING_POLICIES = ('round_robin', 'least_loaded', 'sticky')
+
+# A session is taken out of rotation after this many failed sends in a row
+MAX_CONSECUTIVE_FAILURES = 3
+
+# Session lifecycle: stopped -> ready, and while started ready <-> logged_out /
+# recovering as the health monitor sees the browser come and go
+SESSION_STATES = ('stopped', 'ready', 'logged_out', 'recovering')
+
+
+class BrowserSession:
+    """One WhatsApp account: a WhatsAppBot plus the worker that owns it"""
+
+    def __init__(self, name, bot, on_complete=None, on_cancel=None, invalid_numbers=None):
+        self.name = name
+        self.bot = bot
+        self.on_complete = on_complete
+        self.invalid_numbers = invalid_numbers
+        # Sends are held until the browser has started (SessionPool.start resumes)
+        self.dispatcher = Dispatcher(self._send, on_complete=self._completed, name=f'dispatch-{name}',
+                                     on_cancel=on_cancel, paused=True)
+        self.consecutive_failures = 0
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None
+        self.last_used = None
+        self.state = 'stopped'
+        self.health = None
+        self.last_probe = None
+        self.restarts = 0
+
+    def _send(self, phone, message):
+        # Queued before the number was found to be invalid
+        if self.invalid_numbers and self.invalid_numbers.check(phone):
+            raise RejectedSend(f"+{phone} is a known invalid WhatsApp number")
+        if self.bot.send_message_to_number(phone, message):
+            return True
+        if self.bot.last_failure == 'invalid_number':
+            if self.invalid_numbers:
+                self.invalid_numbers.add(phone, reason='invalid_number')
+            raise RejectedSend(f"WhatsApp reports +{phone} as invalid")
+        # A dead browser fails every send; hold this one for replay after the restart
+        if self.state != 'stopped' and self.bot.probe() == 'crashed':
+            raise HoldJob(f"{self.name} lost its browser")
+        return False
+
+    def _completed(self, job, success):
+        job.meta['session'] = self.name
+        self.last_used = time.time()
+        if success:
+            self.sent += 1
+            self.consecutive_failures = 0
+        elif job.status == 'rejected':
+            # The recipient's fault, not the session's
+            self.failed += 1
+        else:
+            self.failed += 1
+            self.consecutive_failures += 1
+            self.last_error = job.error or 'send failed'
+        if self.on_complete:
+            self.on_complete(job, success)
+
+    @property
+    def healthy(self):
+        return (self.state == 'ready' and bool(self.bot.is_running)
+                and self.consecutive_failures < MAX_CONSECUTIVE_FAILURES)
+
+    @property
+    def load(self):
+        """Jobs waiting for or running on this session"""
+        return self.dispatcher.load()
+
+    def status(self):
+        return {
+            'name': self.name,
+            'profile_dir': self.bot.profile_dir,
+            'debug_port': self.bot.debug_port,
+            'running': bool(self.bot.is_running),
+            'state': self.state,
+            'healthy': self.healthy,
+            'health': self.health,
+            'last_probe': self.last_probe,
+            'restarts': self.restarts,
+            'consecutive_failures': self.consecutive_failures,
+            'sent': self.sent,
+            'failed': self.failed,
+            'last_error': self.last_error,
+            'last_used': self.last_used,
+            'startup_timings': self.bot.startup_timings,
+            'send_timings': self.bot.timing_summary(),
+            'wait_timeouts': self.bot.timeouts.summary(),
+            'queue': self.dispatcher.metrics(),
+        }
+
+
+class SessionPool:
+    """A pool of WhatsApp Web sessions, one browser profile and worker each
+
+    Sends are routed to a session by `policy`:
+      - round_robin: rotate through healthy sessions
+      - least_loaded: the healthy session with the fewest queued jobs
+      - sticky: keep each recipient on the session that first served it
+
+    Args:
+        size (int): number of sessions
+        profile_root (str): directory holding the profiles; session 0 uses
+            `whatsapp_bot_profile` so an existing login keeps working,
+            session N uses `whatsapp_bot_profile_N`
+        base_port (int): remote debugging port of session 0 (N adds N)
+        policy (str): one of ROUTING_POLICIES
+        driver_path (str): msedgedriver binary shared by all sessions
+        on_complete: callable(job, success) run after every send
+        on_cancel: callable(job) run for sends cancelled before they started
+        bot_options (dict): extra keyword arguments for every WhatsAppBot
+        invalid_numbers (InvalidNumberCache): numbers to fail without a page
+            load, and where numbers WhatsApp rejects are recorded
+    """
+
+    def __init__(self, size=1, profile_root=None, base_port=9222, policy='round_robin',
+                 driver_path=None, on_complete=None, bot_factory=WhatsAppBot, bot_options=None,
+                 on_cancel=None, invalid_numbers=None):
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown routing policy: {policy}")
+        profile_root = profile_root or os.getcwd()
+        self.policy = policy
+        self.sessions = []
+        for index in range(size):
+            profile = 'whatsapp_bot_profile' if index == 0 else f'whatsapp_bot_profile_{index}'
+            bot = bot_factory(profile_dir=os.path.join(profile_root, profile),
+                              debug_port=base_port + index,
+                              driver_path=driver_path,
+                              **(bot_options or {}))
+            self.sessions.append(BrowserSession(f'session-{index}', bot, on_complete=on_complete,
+                                                 on_cancel=on_cancel, invalid_numbers=invalid_numbers))
+        self._lock = threading.Lock()
+        self._round_robin = itertools.cycle(range(size))
+        self._sticky = {}
+        for session in self.sessions:
+            session.dispatcher.start()
+
+    # -- lifecycle --------------------------------------------------------
+
+    def start(self, timeout=None, driver_path=None):
+        """Start every browser in parallel, each on its own worker
+
+        Args:
+            driver_path: msedgedriver path shared by all sessions, or a Future
+                resolving to one so profile checks overlap driver resolution
+
+        Returns:
+            dict: session name -> True/False
+        """
+        futures = {session.name: session.dispatcher.call(session.bot.start, driver_path)
+                   for session in self.sessions}
+        results = {}
+        for session in self.sessions:
+            try:
+                results[session.name] = bool(futures[session.name].result(timeout=timeout))
+            except FutureTimeoutError:
+                results[session.name] = False
+            if results[session.name]:
+                session.state = 'ready'
+                session.consecutive_failures = 0
+                session.dispatcher.resume()
+            logging.info(f"[POOL] {session.name} started: {results[session.name]}")
+        return results
+
+    def stop(self, timeout=None):
+        """Stop every browser; queued and newly submitted sends are held until start()"""
+        for session in self.sessions:
+            session.state = 'stopped'
+            session.dispatcher.pause()
+        futures = [session.dispatcher.call(session.bot.stop) for session in self.sessions]
+        return all(future.result(timeout=timeout) for future in futures)
+
+    def shutdown(self):
+        """Stop the workers; used on process exit"""
+        for session in self.sessions:
+            session.dispatcher.stop(timeout=5)
+            if session.bot.driver:
+                try:
+                    session.bot.driver.quit()
+                except Exception as e:
+                    logging.error(f"[POOL] Error closing {session.name}: {str(e)}")
+
+    @property
+    def is_running(self):
+        return any(session.bot.is_running for session in self.sessions)
+
+    # -- routing ----------------------------------------------------------
+
+    def route(self, phone):
+        """Pick the session that should send to `phone`"""
+        with self._lock:
+            candidates = [s for s in self.sessions if s.healthy] or self.sessions
+            if self.policy == 'sticky':
+                session = next((s for s in candidates if s.name == self._sticky.get(phone)), None)
+                if session is None:
+                    session = min(candidates, key=lambda s: s.load)
+                    self._sticky[phone] = session.name
+                return session
+            if self.policy == 'least_loaded':
+                return min(candidates, key=lambda s: s.load)
+            for _ in range(len(self.sessions)):
+                session = self.sessions[next(self._round_robin)]
+                if session in candidates:
+                    return session
+            return candidates[0]
+
+    def submit(self, phone, message, **meta):
+        """Queue a send on the routed session and return its SendJob"""
+        session = self.route(phone)
+        job = session.dispatcher.submit(phone, message, **meta)
+        job.meta['session'] = session.name
+        return job
+
+    def get_job(self, job_id):
+        for session in self.sessions:
+            job = session.dispatcher.get(job_id)
+            if job:
+                return job
+        return None
+
+    def metrics(self):
+        """Pool-wide queue totals plus per-session health"""
+        sessions = [session.status() for session in self.sessions]
+        return {
+            'policy': self.policy,
+            'size': len(self.sessions),
+            'healthy': sum(1 for s in sessions if s['healthy']),
+            'depth': sum(s['queue']['depth'] for s in sessions),
+            'held': sum(s['queue']['held_jobs'] for s in sessions),
+            'processed': sum(s['queue']['processed'] for s in sessions),
+            'failed': sum(s['queue']['failed'] for s in sessions),
+            'sessions': sessions,
+        }
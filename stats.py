@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import logging
+from datetime import datetime
+
+from storage import atomic_write_json
+
+COUNTER_KEYS = ('total', 'successful', 'failed')
+
+
+def _empty_counters():
+    return {key: 0 for key in COUNTER_KEYS}
+
+
+class StatsCounters:
+    """In-memory message counters with periodic snapshots to disk
+
+    Keeps overall totals plus per-day and per-recipient rollups. Updates
+    are plain dict increments under a single short lock, so the scheduler
+    and request threads never wait on file I/O; a background thread writes
+    a snapshot (atomically) at most every `snapshot_interval` seconds and
+    only when something changed. `pending` counts sends that have been
+    started or queued but not yet recorded.
+    """
+
+    def __init__(self, path='stats.json', snapshot_interval=5.0, seed=None):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.version = 0
+        self._saved_version = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._totals = _empty_counters()
+        self._pending = 0
+        self._daily = {}
+        self._recipients = {}
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self._totals.update({k: v for k, v in data.get('totals', {}).items() if k in COUNTER_KEYS})
+            self._daily = data.get('daily', {})
+            self._recipients = data.get('recipients', {})
+        elif seed:
+            # First run: carry over the counters kept by the old store
+            self._totals.update({k: int(seed.get(k, 0)) for k in COUNTER_KEYS})
+            self.version += 1
+
+        self._thread = threading.Thread(target=self._snapshot_loop, name='stats-snapshot', daemon=True)
+        self._thread.start()
+
+    # -- updates ----------------------------------------------------------
+
+    def add_pending(self, count=1):
+        """Mark `count` sends as queued or in progress"""
+        with self._lock:
+            self._pending += count
+            self.version += 1
+
+    def record(self, status, recipient=None, timestamp=None, was_pending=False):
+        """Count one finished send
+
+        Args:
+            status (str): 'success' or 'error'
+            recipient (str): rollup key (phone or name); optional
+            timestamp (datetime): when the send finished, defaults to now
+            was_pending (bool): the send was counted by add_pending()
+        """
+        timestamp = timestamp or datetime.now()
+        day = timestamp.strftime('%Y-%m-%d')
+        key = 'successful' if status == 'success' else 'failed' if status == 'error' else None
+        with self._lock:
+            if was_pending and self._pending > 0:
+                self._pending -= 1
+            buckets = [self._totals, self._daily.setdefault(day, _empty_counters())]
+            if recipient:
+                rollup = self._recipients.setdefault(recipient, _empty_counters())
+                rollup['last_sent'] = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+                buckets.append(rollup)
+            for bucket in buckets:
+                bucket['total'] += 1
+                if key:
+                    bucket[key] += 1
+            self.version += 1
+
+    # -- reads ------------------------------------------------------------
+
+    def totals(self):
+        """Overall counters in the shape the dashboard expects"""
+        with self._lock:
+            return dict(self._totals, pending=self._pending)
+
+    def daily(self, days=None):
+        """Per-day rollups, newest first (optionally only the last `days`)"""
+        with self._lock:
+            items = sorted(self._daily.items(), reverse=True)
+            if days is not None:
+                items = items[:days]
+            return [dict(counters, date=day) for day, counters in items]
+
+    def recipient(self, key):
+        with self._lock:
+            rollup = self._recipients.get(key)
+            return dict(rollup) if rollup else None
+
+    def top_recipients(self, limit=10):
+        """Recipients with the most sends"""
+        with self._lock:
+            items = sorted(self._recipients.items(), key=lambda item: item[1]['total'], reverse=True)
+            return [dict(counters, recipient=key) for key, counters in items[:limit]]
+
+    # -- persistence ------------------------------------------------------
+
+    def snapshot(self):
+        """Write the counters to disk if they changed since the last snapshot"""
+        with self._lock:
+            if self.version == self._saved_version:
+                return False
+            version = self.version
+            data = {
+                'totals': dict(self._totals),
+                'daily': {day: dict(c) for day, c in self._daily.items()},
+                'recipients': {key: dict(c) for key, c in self._recipients.items()},
+                'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }
+        atomic_write_json(self.path, data)
+        self._saved_version = max(self._saved_version, version)
+        return True
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                logging.error(f"[STATS] Error writing snapshot: {str(e)}", exc_info=True)
+
+    def close(self):
+        """Stop the snapshot thread and write a final snapshot"""
+        self._stop.set()
+        self._thread.join(timeout=self.snapshot_interval + 5)
+        self.snapshot()
@@ -0,0 +1,1072 @@
+import base64
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from phone_numbers import normalize_phone, InvalidPhoneNumber, DEFAULT_COUNTRY
+
+# Collections that live in the store, keyed the same way as config.json
+COLLECTIONS = ('recipients', 'message_templates', 'scheduled_messages')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    id TEXT PRIMARY KEY,
+    phone TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_recipients_phone ON recipients(phone);
+CREATE INDEX IF NOT EXISTS idx_recipients_name ON recipients(name);
+CREATE TABLE IF NOT EXISTS message_templates (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_templates_name ON message_templates(name);
+CREATE TABLE IF NOT EXISTS scheduled_messages (
+    id TEXT PRIMARY KEY,
+    recipient_id TEXT NOT NULL,
+    template_id TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_schedules_recipient ON scheduled_messages(recipient_id);
+CREATE TABLE IF NOT EXISTS message_history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT,
+    message TEXT,
+    status TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON message_history(timestamp);
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO stats (key, value) VALUES
+    ('total', 0), ('successful', 0), ('failed', 0), ('pending', 0);
+"""
+
+# Paged reads (store.page): the sort keys and filters each collection supports.
+# 'created' is insertion order; 'search' matches a substring of PAGE_SEARCH fields
+PAGE_SORTS = {
+    'recipients': ('created', 'name', 'phone'),
+    'message_templates': ('created', 'name'),
+    'scheduled_messages': ('created',),
+}
+PAGE_SEARCH = {
+    'recipients': ('name', 'phone'),
+    'message_templates': ('name',),
+}
+PAGE_FILTERS = {
+    'scheduled_messages': ('recipient_id', 'template_id', 'active'),
+}
+
+
+def encode_cursor(sort_value, position):
+    """Opaque page cursor for the row at (sort value, insertion position)"""
+    raw = json.dumps([sort_value, position]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, position = json.loads(raw)
+        return sort_value, int(position)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+
+
+def check_page_args(collection, sort, filters):
+    """Raise ValueError for a sort key or filter `collection` does not support"""
+    if sort not in PAGE_SORTS.get(collection, ()):
+        raise ValueError(f"Cannot sort {collection} by {sort!r}")
+    allowed = set(PAGE_FILTERS.get(collection, ()))
+    if collection in PAGE_SEARCH:
+        allowed.add('search')
+    unknown = set(filters) - allowed
+    if unknown:
+        raise ValueError(f"Cannot filter {collection} by {', '.join(sorted(unknown))}")
+
+
+class StoreError(Exception):
+    """Base class for storage errors"""
+
+
+class DuplicateRecordError(StoreError):
+    """Raised when a record violates a unique index (phone, template name)"""
+
+
+def atomic_write_json(path, data):
+    """Write `data` as JSON to `path` atomically (temp file + fsync + rename)
+
+    Readers either see the previous file or the new one, never a partially
+    written document, even if the process dies mid-write.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SQLiteStore:
+    """SQLite (WAL) backed storage for recipients, templates, schedules
+    and stats.
+
+    Every mutation touches only the affected rows, so the cost of a send
+    does not depend on how many recipients exist.
+    Each thread gets its own connection; WAL mode lets readers run while
+    the scheduler or a request thread is writing.
+    """
+
+    def __init__(self, path='whatsapp.db'):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Bumped on every mutation made through this store
+        self.version = 0
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._add_schedule_revisions(conn)
+
+    @staticmethod
+    def _add_schedule_revisions(conn):
+        """Give databases created before the schedule change feed a revision column"""
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(scheduled_messages)')]
+        if 'revision' not in columns:
+            conn.execute('ALTER TABLE scheduled_messages ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+            conn.execute('UPDATE scheduled_messages SET revision = rowid')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_schedules_revision ON scheduled_messages(revision)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # -- helpers ----------------------------------------------------------
+
+    def _next_id(self, conn, collection, count=1):
+        """Allocate collision-free string ids from a per-collection sequence
+
+        Returns the first of `count` consecutive ids.
+        """
+        key = f'seq:{collection}'
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            # Seed from existing ids so migrated data never collides
+            current = 0
+            for (record_id,) in conn.execute(f'SELECT id FROM {collection}'):
+                if str(record_id).isdigit():
+                    current = max(current, int(record_id))
+        else:
+            current = int(row['value'])
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(current + count)))
+        return str(current + 1)
+
+    @contextmanager
+    def _writing(self, conn):
+        """Serialise a write transaction and bump the version when it commits"""
+        with self._write_lock:
+            with conn:
+                yield
+            self.version += 1
+
+    @staticmethod
+    def _load(row):
+        return json.loads(row['data']) if row else None
+
+    def get_meta(self, key, default=None):
+        row = self._conn().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key, value):
+        conn = self._conn()
+        with self._writing(conn):
+            conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    # -- recipients -------------------------------------------------------
+
+    def list_recipients(self):
+        rows = self._conn().execute('SELECT data FROM recipients ORDER BY rowid')
+        return [self._load(row) for row in rows]
+
+    def count_recipients(self):
+        return self._conn().execute('SELECT COUNT(*) FROM recipients').fetchone()[0]
+
+    def iter_recipients(self, after=None, batch_size=500):
+        """Yield (cursor, recipient) in insertion order, resuming after `after`
+
+        Reads one batch at a time, so memory use does not depend on the
+        number of recipients.
+        """
+        last = int(after or 0)
+        while True:
+            rows = self._conn().execute('SELECT rowid, data FROM recipients WHERE rowid > ? '
+                                        'ORDER BY rowid LIMIT ?', (last, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                last = row['rowid']
+                yield last, self._load(row)
+
+    def get_recipient(self, recipient_id):
+        row = self._conn().execute('SELECT data FROM recipients WHERE id = ?',
+                                   (str(recipient_id),)).fetchone()
+        return self._load(row)
+
+    def find_recipient_by_phone(self, phone):
+        row = self._conn().execute('SELECT data FROM recipients WHERE phone = ?',
+                                   (phone,)).fetchone()
+        return self._load(row)
+
+    def add_recipient(self, recipient):
+        """Insert a recipient, assigning an id if it has none
+
+        Raises:
+            DuplicateRecordError: if the phone number is already stored
+        """
+        conn = self._conn()
+        recipient = dict(recipient)
+        try:
+            with self._writing(conn):
+                if not recipient.get('id'):
+                    recipient['id'] = self._next_id(conn, 'recipients')
+                conn.execute('INSERT INTO recipients (id, phone, name, data) VALUES (?, ?, ?, ?)',
+                             (str(recipient['id']), recipient['phone'], recipient['name'],
+                              json.dumps(recipient)))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateRecordError(f"Recipient with phone {recipient.get('phone')} already exists") from e
+        return recipient
+
+    def add_recipients(self, recipients, batch_size=1000):
+        """Insert many recipients in batches, skipping known phone numbers
+
+        `recipients` may be any iterable (e.g. a parser generator). Each
+        batch of `batch_size` records is read before the write lock is
+        taken, then checked against the phone index with one query and
+        inserted with one executemany in its own transaction, so other
+        writers only wait for one batch at a time.
+
+        Returns:
+            tuple: (number added, [(index in `recipients`, phone, existing id), ...])
+        """
+        conn = self._conn()
+        added, duplicates = 0, []
+        records = iter(enumerate(recipients))
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            phones = list({recipient['phone'] for _, recipient in batch})
+            placeholders = ','.join('?' * len(phones))
+            with self._writing(conn):
+                known = dict(conn.execute(f'SELECT phone, id FROM recipients WHERE phone IN ({placeholders})',
+                                          phones).fetchall())
+                fresh, repeated = [], []
+                for index, recipient in batch:
+                    if recipient['phone'] in known:
+                        repeated.append((index, recipient['phone']))
+                        continue
+                    recipient = dict(recipient)
+                    known[recipient['phone']] = recipient
+                    fresh.append(recipient)
+                if fresh:
+                    first_id = int(self._next_id(conn, 'recipients', count=len(fresh)))
+                    for offset, recipient in enumerate(fresh):
+                        recipient['id'] = str(first_id + offset)
+                    conn.executemany('INSERT INTO recipients (id, phone, name, data) VALUES (?, ?, ?, ?)',
+                                     [(recipient['id'], recipient['phone'], recipient['name'], json.dumps(recipient))
+                                      for recipient in fresh])
+            # Repeats within the batch resolve to the id just assigned
+            for index, phone in repeated:
+                existing = known[phone]
+                duplicates.append((index, phone, existing['id'] if isinstance(existing, dict) else existing))
+            added += len(fresh)
+        return added, duplicates
+
+    def update_recipient(self, recipient_id, **changes):
+        conn = self._conn()
+        with self._writing(conn):
+            row = conn.execute('SELECT data FROM recipients WHERE id = ?',
+                               (str(recipient_id),)).fetchone()
+            if row is None:
+                return None
+            recipient = self._load(row)
+            recipient.update(changes)
+            conn.execute('UPDATE recipients SET phone = ?, name = ?, data = ? WHERE id = ?',
+                         (recipient['phone'], recipient['name'], json.dumps(recipient),
+                          str(recipient_id)))
+        return recipient
+
+    def merge_recipients(self, updates, merged):
+        """Rewrite recipients and fold duplicates into the ones kept, in one transaction
+
+        Args:
+            updates (list): recipient dicts (with id) to store as given
+            merged (dict): removed recipient id -> id of the recipient kept;
+                schedules of a removed recipient move to the kept one
+        """
+        conn = self._conn()
+        with self._writing(conn):
+            for removed_id, kept_id in merged.items():
+                rows = conn.execute('SELECT id, data FROM scheduled_messages WHERE recipient_id = ?',
+                                    (str(removed_id),)).fetchall()
+                for row in rows:
+                    schedule_item = dict(self._load(row), recipient_id=str(kept_id))
+                    conn.execute('UPDATE scheduled_messages SET recipient_id = ?, data = ?, '
+                                 'revision = (SELECT MAX(revision) + 1 FROM scheduled_messages) WHERE id = ?',
+                                 (str(kept_id), json.dumps(schedule_item), row['id']))
+                conn.execute('DELETE FROM recipients WHERE id = ?', (str(removed_id),))
+            # Park the rewritten rows on unique placeholders first, so one row
+            # taking another's old number cannot trip the phone index midway
+            conn.executemany('UPDATE recipients SET phone = ? WHERE id = ?',
+                             [(f"~{recipient['id']}", str(recipient['id'])) for recipient in updates])
+            conn.executemany('UPDATE recipients SET phone = ?, name = ?, data = ? WHERE id = ?',
+                             [(recipient['phone'], recipient['name'], json.dumps(recipient), str(recipient['id']))
+                              for recipient in updates])
+
+    # -- templates --------------------------------------------------------
+
+    def list_templates(self):
+        rows = self._conn().execute('SELECT data FROM message_templates ORDER BY rowid')
+        return [self._load(row) for row in rows]
+
+    def get_template(self, template_id):
+        row = self._conn().execute('SELECT data FROM message_templates WHERE id = ?',
+                                   (str(template_id),)).fetchone()
+        return self._load(row)
+
+    def find_template_by_name(self, name):
+        row = self._conn().execute('SELECT data FROM message_templates WHERE name = ?',
+                                   (name,)).fetchone()
+        return self._load(row)
+
+    def add_template(self, template):
+        """Insert a template, assigning an id if it has none
+
+        Raises:
+            DuplicateRecordError: if a template with the same name exists
+        """
+        conn = self._conn()
+        template = dict(template)
+        try:
+            with self._writing(conn):
+                if not template.get('id'):
+                    template['id'] = self._next_id(conn, 'message_templates')
+                conn.execute('INSERT INTO message_templates (id, name, data) VALUES (?, ?, ?)',
+                             (str(template['id']), template['name'], json.dumps(template)))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateRecordError(f"A template named {template.get('name')} already exists") from e
+        return template
+
+    def update_template(self, template_id, **changes):
+        """Update a template and bump its version
+
+        Raises:
+            DuplicateRecordError: if renamed to the name of another template
+        """
+        conn = self._conn()
+        try:
+            with self._writing(conn):
+                row = conn.execute('SELECT data FROM message_templates WHERE id = ?',
+                                   (str(template_id),)).fetchone()
+                if row is None:
+                    return None
+                template = self._load(row)
+                template.update(changes)
+                template['version'] = template.get('version', 1) + 1
+                conn.execute('UPDATE message_templates SET name = ?, data = ? WHERE id = ?',
+                             (template['name'], json.dumps(template), str(template_id)))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateRecordError(f"A template named {changes.get('name')} already exists") from e
+        return template
+
+    # -- schedules --------------------------------------------------------
+
+    def list_schedules(self, active_only=False):
+        query = 'SELECT data FROM scheduled_messages'
+        if active_only:
+            query += ' WHERE active = 1'
+        rows = self._conn().execute(query + ' ORDER BY rowid')
+        return [self._load(row) for row in rows]
+
+    def get_schedule(self, schedule_id):
+        row = self._conn().execute('SELECT data FROM scheduled_messages WHERE id = ?',
+                                   (str(schedule_id),)).fetchone()
+        return self._load(row)
+
+    def add_schedule(self, schedule_item):
+        conn = self._conn()
+        schedule_item = dict(schedule_item)
+        with self._writing(conn):
+            if not schedule_item.get('id'):
+                schedule_item['id'] = self._next_id(conn, 'scheduled_messages')
+            conn.execute('INSERT INTO scheduled_messages (id, recipient_id, template_id, active, data, revision) '
+                         'VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(revision), 0) + 1 FROM scheduled_messages))',
+                         (str(schedule_item['id']), str(schedule_item['recipient_id']),
+                          str(schedule_item['template_id']), int(schedule_item.get('active', True)),
+                          json.dumps(schedule_item)))
+        return schedule_item
+
+    def update_schedule(self, schedule_id, **changes):
+        conn = self._conn()
+        with self._writing(conn):
+            row = conn.execute('SELECT data FROM scheduled_messages WHERE id = ?',
+                               (str(schedule_id),)).fetchone()
+            if row is None:
+                return None
+            schedule_item = self._load(row)
+            schedule_item.update(changes)
+            conn.execute('UPDATE scheduled_messages SET recipient_id = ?, template_id = ?, active = ?, data = ?, '
+                         'revision = (SELECT MAX(revision) + 1 FROM scheduled_messages) WHERE id = ?',
+                         (str(schedule_item['recipient_id']), str(schedule_item['template_id']),
+                          int(schedule_item.get('active', True)), json.dumps(schedule_item),
+                          str(schedule_id)))
+        return schedule_item
+
+    def schedule_changes(self, since=None):
+        """Schedules added or updated after revision `since` (all when None)
+
+        Returns:
+            tuple: (schedules in revision order, revision to pass next time)
+        """
+        since = -1 if since is None else since
+        rows = self._conn().execute('SELECT data, revision FROM scheduled_messages WHERE revision > ? '
+                                    'ORDER BY revision', (since,)).fetchall()
+        return [self._load(row) for row in rows], (rows[-1]['revision'] if rows else max(since, 0))
+
+    # -- paged reads ------------------------------------------------------
+
+    def page(self, collection, limit=50, cursor=None, sort='created', descending=False, **filters):
+        """Return one page of `collection` and the cursor for the next
+
+        Keyset pagination on (sort column, rowid): every page is one index
+        range scan, however deep into the collection it starts.
+
+        Args:
+            collection (str): 'recipients', 'message_templates' or 'scheduled_messages'
+            sort (str): one of PAGE_SORTS[collection]
+            **filters: 'search' and/or the collection's PAGE_FILTERS; None is ignored
+
+        Returns:
+            tuple: (records, next_cursor); next_cursor is None on the last page
+        """
+        check_page_args(collection, sort, filters)
+        column = 'rowid' if sort == 'created' else sort
+        clauses, params = [], []
+        search = filters.pop('search', None)
+        if search:
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            fields = PAGE_SEARCH[collection]
+            clauses.append('(' + ' OR '.join(f"{field} LIKE ? ESCAPE '\\'" for field in fields) + ')')
+            params.extend([pattern] * len(fields))
+        for field, value in filters.items():
+            if value is not None:
+                clauses.append(f'{field} = ?')
+                params.append(int(value) if field == 'active' else str(value))
+        operator, direction = ('<', 'DESC') if descending else ('>', 'ASC')
+        if cursor:
+            sort_value, position = decode_cursor(cursor)
+            if column == 'rowid':
+                clauses.append(f'rowid {operator} ?')
+                params.append(position)
+            else:
+                clauses.append(f'({column}, rowid) {operator} (?, ?)')
+                params.extend([sort_value, position])
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        order = f'rowid {direction}' if column == 'rowid' else f'{column} {direction}, rowid {direction}'
+        rows = self._conn().execute(f'SELECT rowid, {column} AS sort_key, data FROM {collection}{where} '
+                                    f'ORDER BY {order} LIMIT ?', params + [limit + 1]).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['sort_key'], rows[-1]['rowid'])
+        return [self._load(row) for row in rows], next_cursor
+
+    # -- legacy history and stats ----------------------------------------
+
+    def list_history(self):
+        """Legacy history rows (oldest first)
+
+        Message history now lives in the append-only HistoryLog; this and
+        drain_history are used once to move rows imported from config.json
+        out of the table.
+        """
+        rows = self._conn().execute('SELECT recipient, message, status, timestamp '
+                                    'FROM message_history ORDER BY seq').fetchall()
+        return [dict(row) for row in rows]
+
+    def drain_history(self):
+        """Remove and return legacy history rows (oldest first)"""
+        conn = self._conn()
+        with self._writing(conn):
+            rows = conn.execute('SELECT recipient, message, status, timestamp '
+                                'FROM message_history ORDER BY seq').fetchall()
+            conn.execute('DELETE FROM message_history')
+        return [dict(row) for row in rows]
+
+    def get_stats(self):
+        rows = self._conn().execute('SELECT key, value FROM stats')
+        return {row['key']: row['value'] for row in rows}
+
+    def snapshot(self):
+        """Return recipients, templates, schedules and stats in the config.json layout"""
+        return {
+            'recipients': self.list_recipients(),
+            'message_templates': self.list_templates(),
+            'scheduled_messages': self.list_schedules(),
+            'stats': self.get_stats(),
+        }
+
+
+class JsonStore:
+    """In-memory store persisted to the legacy config.json layout
+
+    All reads are served from memory. Mutations are applied to the
+    in-memory model under a lock and bump `version`; a single writer
+    thread owns the file and coalesces every mutation made within
+    `flush_interval` seconds into one atomic write (temp file + fsync +
+    rename). Use this backend when config.json must stay the source of
+    truth, e.g. because it is edited by hand or synced elsewhere.
+    """
+
+    def __init__(self, path='config.json', flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.version = 0
+        self._lock = threading.RLock()
+        self._dirty = threading.Event()
+        self._stopping = False
+        self._flushed_version = 0
+
+        config = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                config = json.load(f)
+        self._meta = dict(config.get('meta', {}))
+        self._recipients = {str(r['id']): r for r in config.get('recipients', [])}
+        self._templates = {str(t['id']): t for t in config.get('message_templates', [])}
+        self._schedules = {str(s['id']): s for s in config.get('scheduled_messages', [])}
+        self._history = list(config.get('message_history', []))
+        self._stats = {'total': 0, 'successful': 0, 'failed': 0, 'pending': 0}
+        self._stats.update(config.get('stats', {}))
+
+        # Secondary indexes kept in step with the primary dicts
+        self._phone_index = {r['phone']: rid for rid, r in self._recipients.items()}
+        self._template_names = {t['name'].lower(): tid for tid, t in self._templates.items()}
+        # Schedule change feed: id -> revision, most recently changed last
+        self._schedule_revisions = OrderedDict((sid, rev) for rev, sid in enumerate(self._schedules, 1))
+        self._schedule_revision = len(self._schedules)
+
+        self._writer = threading.Thread(target=self._writer_loop, name='config-writer', daemon=True)
+        self._writer.start()
+
+    # -- persistence ------------------------------------------------------
+
+    def _changed(self):
+        """Record a mutation; caller must hold the lock"""
+        self.version += 1
+        self._dirty.set()
+
+    def _next_id(self, collection, records, count=1):
+        seq = self._meta.setdefault('seq', {})
+        current = seq.get(collection)
+        if current is None:
+            current = max((int(rid) for rid in records if rid.isdigit()), default=0)
+        seq[collection] = current + count
+        return str(current + 1)
+
+    def _document(self):
+        return {
+            'recipients': list(self._recipients.values()),
+            'message_templates': list(self._templates.values()),
+            'scheduled_messages': list(self._schedules.values()),
+            'message_history': self._history,
+            'stats': self._stats,
+            'meta': self._meta,
+        }
+
+    def flush(self):
+        """Write the current model to disk if it changed since the last flush"""
+        with self._lock:
+            if self.version == self._flushed_version:
+                return False
+            version = self.version
+            # Serialise under the lock so the snapshot is consistent
+            data = json.loads(json.dumps(self._document()))
+        atomic_write_json(self.path, data)
+        self._flushed_version = max(self._flushed_version, version)
+        return True
+
+    def _writer_loop(self):
+        while not self._stopping:
+            self._dirty.wait()
+            if self._stopping:
+                break
+            # Let further mutations pile up so they share one write
+            time.sleep(self.flush_interval)
+            self._dirty.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"[STORE] Error flushing {self.path}: {str(e)}", exc_info=True)
+                self._dirty.set()
+
+    def close(self):
+        """Stop the writer thread and flush pending changes"""
+        self._stopping = True
+        self._dirty.set()
+        self._writer.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            return self._meta.get(key, default)
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._meta[key] = str(value)
+            self._changed()
+
+    # -- recipients -------------------------------------------------------
+
+    def list_recipients(self):
+        with self._lock:
+            return [dict(r) for r in self._recipients.values()]
+
+    def count_recipients(self):
+        with self._lock:
+            return len(self._recipients)
+
+    def iter_recipients(self, after=None, batch_size=500):
+        """Yield (cursor, recipient) in insertion order, resuming after `after`"""
+        position = int(after or 0)
+        while True:
+            with self._lock:
+                batch = list(itertools.islice(self._recipients.values(), position, position + batch_size))
+            if not batch:
+                return
+            for recipient in batch:
+                position += 1
+                yield position, dict(recipient)
+
+    def get_recipient(self, recipient_id):
+        with self._lock:
+            recipient = self._recipients.get(str(recipient_id))
+            return dict(recipient) if recipient else None
+
+    def find_recipient_by_phone(self, phone):
+        with self._lock:
+            recipient_id = self._phone_index.get(phone)
+            return dict(self._recipients[recipient_id]) if recipient_id else None
+
+    def add_recipient(self, recipient):
+        recipient = dict(recipient)
+        with self._lock:
+            if recipient['phone'] in self._phone_index:
+                raise DuplicateRecordError(f"Recipient with phone {recipient['phone']} already exists")
+            if not recipient.get('id'):
+                recipient['id'] = self._next_id('recipients', self._recipients)
+            self._recipients[str(recipient['id'])] = recipient
+            self._phone_index[recipient['phone']] = str(recipient['id'])
+            self._changed()
+        return dict(recipient)
+
+    def add_recipients(self, recipients, batch_size=1000):
+        """Insert many recipients, skipping known phone numbers
+
+        Like SQLiteStore.add_recipients, each batch is read before the lock
+        is taken; the writer thread coalesces the batches into few flushes.
+
+        Returns:
+            tuple: (number added, [(index in `recipients`, phone, existing id), ...])
+        """
+        added, duplicates = 0, []
+        records = iter(enumerate(recipients))
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            with self._lock:
+                fresh = 0
+                for index, recipient in batch:
+                    existing = self._phone_index.get(recipient['phone'])
+                    if existing:
+                        duplicates.append((index, recipient['phone'], existing))
+                        continue
+                    recipient = dict(recipient, id=self._next_id('recipients', self._recipients))
+                    self._recipients[recipient['id']] = recipient
+                    self._phone_index[recipient['phone']] = recipient['id']
+                    fresh += 1
+                if fresh:
+                    self._changed()
+            added += fresh
+        return added, duplicates
+
+    def update_recipient(self, recipient_id, **changes):
+        with self._lock:
+            recipient = self._recipients.get(str(recipient_id))
+            if recipient is None:
+                return None
+            self._phone_index.pop(recipient['phone'], None)
+            recipient.update(changes)
+            self._phone_index[recipient['phone']] = str(recipient_id)
+            self._changed()
+            return dict(recipient)
+
+    def merge_recipients(self, updates, merged):
+        """Rewrite recipients and fold duplicates into the ones kept (see SQLiteStore)"""
+        with self._lock:
+            for removed_id, kept_id in merged.items():
+                for schedule_id, schedule_item in self._schedules.items():
+                    if str(schedule_item['recipient_id']) == str(removed_id):
+                        schedule_item['recipient_id'] = str(kept_id)
+                        self._touch_schedule(schedule_id)
+                removed = self._recipients.pop(str(removed_id), None)
+                if removed and self._phone_index.get(removed['phone']) == str(removed_id):
+                    del self._phone_index[removed['phone']]
+            for recipient in updates:
+                old = self._recipients.get(str(recipient['id']))
+                if old and self._phone_index.get(old['phone']) == str(recipient['id']):
+                    del self._phone_index[old['phone']]
+                self._recipients[str(recipient['id'])] = dict(recipient)
+                self._phone_index[recipient['phone']] = str(recipient['id'])
+            self._changed()
+
+    # -- templates --------------------------------------------------------
+
+    def list_templates(self):
+        with self._lock:
+            return [dict(t) for t in self._templates.values()]
+
+    def get_template(self, template_id):
+        with self._lock:
+            template = self._templates.get(str(template_id))
+            return dict(template) if template else None
+
+    def find_template_by_name(self, name):
+        with self._lock:
+            template_id = self._template_names.get(name.lower())
+            return dict(self._templates[template_id]) if template_id else None
+
+    def add_template(self, template):
+        template = dict(template)
+        with self._lock:
+            if template['name'].lower() in self._template_names:
+                raise DuplicateRecordError(f"A template named {template['name']} already exists")
+            if not template.get('id'):
+                template['id'] = self._next_id('message_templates', self._templates)
+            self._templates[str(template['id'])] = template
+            self._template_names[template['name'].lower()] = str(template['id'])
+            self._changed()
+        return dict(template)
+
+    def update_template(self, template_id, **changes):
+        with self._lock:
+            template = self._templates.get(str(template_id))
+            if template is None:
+                return None
+            name = changes.get('name', template['name'])
+            if self._template_names.get(name.lower(), str(template_id)) != str(template_id):
+                raise DuplicateRecordError(f"A template named {name} already exists")
+            self._template_names.pop(template['name'].lower(), None)
+            template.update(changes)
+            template['version'] = template.get('version', 1) + 1
+            self._template_names[template['name'].lower()] = str(template_id)
+            self._changed()
+            return dict(template)
+
+    # -- schedules --------------------------------------------------------
+
+    def list_schedules(self, active_only=False):
+        with self._lock:
+            return [dict(s) for s in self._schedules.values()
+                    if not active_only or s.get('active', True)]
+
+    def get_schedule(self, schedule_id):
+        with self._lock:
+            schedule_item = self._schedules.get(str(schedule_id))
+            return dict(schedule_item) if schedule_item else None
+
+    def add_schedule(self, schedule_item):
+        schedule_item = dict(schedule_item)
+        with self._lock:
+            if not schedule_item.get('id'):
+                schedule_item['id'] = self._next_id('scheduled_messages', self._schedules)
+            self._schedules[str(schedule_item['id'])] = schedule_item
+            self._touch_schedule(str(schedule_item['id']))
+            self._changed()
+        return dict(schedule_item)
+
+    def update_schedule(self, schedule_id, **changes):
+        with self._lock:
+            schedule_item = self._schedules.get(str(schedule_id))
+            if schedule_item is None:
+                return None
+            schedule_item.update(changes)
+            self._touch_schedule(str(schedule_id))
+            self._changed()
+            return dict(schedule_item)
+
+    def _touch_schedule(self, schedule_id):
+        """Move a schedule to the head of the change feed; caller holds the lock"""
+        self._schedule_revision += 1
+        self._schedule_revisions[schedule_id] = self._schedule_revision
+        self._schedule_revisions.move_to_end(schedule_id)
+
+    def schedule_changes(self, since=None):
+        """Schedules added or updated after revision `since` (all when None)
+
+        Revisions are kept in memory, so they only compare within one process.
+        """
+        with self._lock:
+            changed = []
+            for schedule_id, revision in reversed(self._schedule_revisions.items()):
+                if revision <= (since or 0):
+                    break
+                changed.append(dict(self._schedules[schedule_id]))
+            changed.reverse()
+            return changed, self._schedule_revision
+
+    # -- paged reads ------------------------------------------------------
+
+    def page(self, collection, limit=50, cursor=None, sort='created', descending=False, **filters):
+        """Return one page of `collection` and the cursor for the next
+
+        Same arguments and cursors as SQLiteStore.page; the records are
+        already in memory, so this filters and sorts them per call.
+        """
+        check_page_args(collection, sort, filters)
+        search = (filters.pop('search', None) or '').lower()
+        filters = {field: value for field, value in filters.items() if value is not None}
+        records = {'recipients': self._recipients, 'message_templates': self._templates,
+                   'scheduled_messages': self._schedules}[collection]
+        with self._lock:
+            rows = []
+            for position, record in enumerate(records.values(), 1):
+                if search and not any(search in str(record.get(field, '')).lower()
+                                      for field in PAGE_SEARCH[collection]):
+                    continue
+                if not all(self._matches(record, field, value) for field, value in filters.items()):
+                    continue
+                if sort == 'created':
+                    key = position
+                else:
+                    key = str(record.get(sort, ''))
+                    # Template names are case-insensitive, as in SQLite
+                    if collection == 'message_templates':
+                        key = key.lower()
+                rows.append(((key, position), record))
+            rows.sort(key=lambda row: row[0], reverse=descending)
+            if cursor:
+                after = decode_cursor(cursor)
+                rows = [row for row in rows if (row[0] < after if descending else row[0] > after)]
+            page = [(key, dict(record)) for key, record in rows[:limit + 1]]
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(*page[-1][0])
+        return [record for _, record in page], next_cursor
+
+    @staticmethod
+    def _matches(record, field, value):
+        if field == 'active':
+            return bool(record.get('active', True)) == bool(value)
+        return str(record.get(field)) == str(value)
+
+    # -- legacy history and stats ----------------------------------------
+
+    def list_history(self):
+        """History entries still embedded in config.json"""
+        with self._lock:
+            return [dict(entry) for entry in self._history]
+
+    def drain_history(self):
+        """Remove and return history entries still embedded in config.json"""
+        with self._lock:
+            entries, self._history = self._history, []
+            if entries:
+                self._changed()
+            return entries
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._document()))
+
+
+def open_store(backend='sqlite', db_path='whatsapp.db', config_path='config.json', flush_interval=1.0):
+    """Create the configured store backend
+
+    Args:
+        backend (str): 'sqlite' (default) or 'json'
+        db_path (str): SQLite database path, used by the sqlite backend
+        config_path (str): legacy config.json; migrated into SQLite once,
+            or used directly by the json backend
+        flush_interval (float): write-behind delay for the json backend
+    """
+    if backend == 'json':
+        store = JsonStore(config_path, flush_interval=flush_interval)
+    elif backend == 'sqlite':
+        store = SQLiteStore(db_path)
+        migrate_json_config(store, config_path)
+    else:
+        raise StoreError(f"Unknown storage backend: {backend}")
+    normalize_recipient_phones(store)
+    return store
+
+
+def migrate_json_config(store, config_path='config.json'):
+    """One-shot import of a legacy config.json into `store`
+
+    The migration is recorded in the store's meta table, so calling this
+    again is a no-op. The JSON file is left untouched.
+
+    Returns:
+        bool: True if data was imported, False if there was nothing to do
+    """
+    if store.get_meta('migrated_from'):
+        return False
+    if not os.path.exists(config_path):
+        # Non-empty marker, so the check is skipped on later boots
+        store.set_meta('migrated_from', 'none')
+        return False
+
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+
+    conn = store._conn()
+    with store._writing(conn):
+        for recipient in config.get('recipients', []):
+            conn.execute('INSERT OR IGNORE INTO recipients (id, phone, name, data) VALUES (?, ?, ?, ?)',
+                         (str(recipient['id']), recipient['phone'], recipient['name'],
+                          json.dumps(recipient)))
+        for template in config.get('message_templates', []):
+            conn.execute('INSERT OR IGNORE INTO message_templates (id, name, data) VALUES (?, ?, ?)',
+                         (str(template['id']), template['name'], json.dumps(template)))
+        for schedule_item in config.get('scheduled_messages', []):
+            conn.execute('INSERT OR IGNORE INTO scheduled_messages (id, recipient_id, template_id, active, data, revision) '
+                         'VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(revision), 0) + 1 FROM scheduled_messages))',
+                         (str(schedule_item['id']), str(schedule_item['recipient_id']),
+                          str(schedule_item['template_id']), int(schedule_item.get('active', True)),
+                          json.dumps(schedule_item)))
+        conn.executemany('INSERT INTO message_history (recipient, message, status, timestamp) '
+                         'VALUES (?, ?, ?, ?)',
+                         [(entry.get('recipient'), entry.get('message'), entry.get('status'),
+                           entry.get('timestamp', '')) for entry in config.get('message_history', [])])
+        for key, value in config.get('stats', {}).items():
+            conn.execute('INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)', (key, int(value)))
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                     ('migrated_from', os.path.abspath(config_path)))
+
+    logging.info(f"[STORE] Migrated {config_path} into {store.path}: "
+                 f"{len(config.get('recipients', []))} recipients, "
+                 f"{len(config.get('message_templates', []))} templates, "
+                 f"{len(config.get('scheduled_messages', []))} schedules, "
+                 f"{len(config.get('message_history', []))} history entries")
+    # Legacy phones were stored as typed
+    normalize_recipient_phones(store, force=True)
+    return True
+
+
+def normalize_recipient_phones(store, default_country=None, force=False):
+    """One-time rewrite of stored recipient phones to E.164 digits
+
+    Recipients saved before phone_numbers existed kept their numbers as
+    typed ('7770045132', '+91 77700 45132'), so lookups by normalized
+    number missed them. Rows that normalize to the same number are merged
+    into the oldest one (its fields win; the others only fill gaps) and
+    their schedules are moved to it. Rows that cannot be normalized are
+    logged and left unchanged. Recorded in meta, so later calls are a
+    no-op unless `force` is set.
+
+    Returns:
+        dict: counts of 'normalized', 'merged' and 'invalid' rows, or None
+            if the backfill already ran
+    """
+    if store.get_meta('phones_normalized') and not force:
+        return None
+    groups, invalid = {}, 0
+    for _, recipient in store.iter_recipients():
+        try:
+            phone = normalize_phone(recipient['phone'], default_country)
+        except InvalidPhoneNumber as e:
+            invalid += 1
+            logging.warning(f"[STORE] Recipient {recipient['id']} ({recipient.get('name')}) keeps its phone: {str(e)}")
+            continue
+        groups.setdefault(phone, []).append(recipient)
+
+    updates, merged = [], {}
+    for phone, recipients in groups.items():
+        kept = dict(recipients[0])
+        for duplicate in recipients[1:]:
+            for key, value in duplicate.items():
+                if kept.get(key) in (None, '') and value not in (None, ''):
+                    kept[key] = value
+            merged[duplicate['id']] = kept['id']
+            logging.warning(f"[STORE] Merged recipient {duplicate['id']} ({duplicate.get('name')}, "
+                            f"{duplicate['phone']}) into {kept['id']} (+{phone})")
+        kept['phone'] = phone
+        if kept != recipients[0] or len(recipients) > 1:
+            updates.append(kept)
+    if updates or merged:
+        store.merge_recipients(updates, merged)
+    store.set_meta('phones_normalized', (default_country or DEFAULT_COUNTRY).upper())
+    summary = {'normalized': len(updates), 'merged': len(merged), 'invalid': invalid}
+    logging.info(f"[STORE] Normalized recipient phones: {summary['normalized']} rewritten, "
+                 f"{summary['merged']} duplicates merged, {summary['invalid']} invalid")
+    return summary
+
+
+def main():
+    import sys
+    config_path = sys.argv[1] if len(sys.argv) > 1 else 'config.json'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'whatsapp.db'
+    store = SQLiteStore(db_path)
+    if migrate_json_config(store, config_path):
+        print(f"✅ Migrated {config_path} into {db_path}")
+    else:
+        print(f"ℹ️  Nothing to migrate ({db_path} already initialised)")
+    summary = normalize_recipient_phones(store)
+    if summary:
+        print(f"✅ Normalized {summary['normalized']} recipient phones "
+              f"({summary['merged']} duplicates merged, {summary['invalid']} invalid)")
+
+
+if __name__ == "__main__":
+    main()
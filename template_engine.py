@@ -0,0 +1,164 @@
+import re
+import threading
+import logging
+from collections import OrderedDict
+
+# `{{` / `}}` are literal braces, `{field}` or `{field|default}` a placeholder;
+# any other lone brace is a syntax error
+_TOKEN = re.compile(r'\{\{|\}\}|\{([^{}]*)\}|[{}]')
+_FIELD = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class TemplateError(ValueError):
+    """Raised for malformed templates and for recipients missing a field"""
+
+
+class CompiledTemplate:
+    """A template parsed once into literal text and placeholder slots
+
+    Attributes:
+        source (str): the original template text
+        fields (tuple): placeholder names, in order of first use
+    """
+
+    __slots__ = ('source', 'fields', '_parts')
+
+    def __init__(self, source):
+        self.source = source
+        parts, fields, literal, position = [], [], [], 0
+        for match in _TOKEN.finditer(source):
+            literal.append(source[position:match.start()])
+            position = match.end()
+            token = match.group(0)
+            if token in ('{{', '}}'):
+                literal.append(token[0])
+                continue
+            if match.group(1) is None:
+                raise TemplateError(f"Unmatched '{token}' at position {match.start()}; "
+                                    f"write '{token * 2}' for a literal brace")
+            name, has_default, default = match.group(1).partition('|')
+            name = name.strip()
+            if not _FIELD.match(name):
+                raise TemplateError(f"Invalid placeholder '{match.group(0)}' at position {match.start()}")
+            parts.append(''.join(literal))
+            literal = []
+            parts.append((name, default if has_default else None))
+            if name not in fields:
+                fields.append(name)
+        literal.append(source[position:])
+        parts.append(''.join(literal))
+        self.fields = tuple(fields)
+        self._parts = tuple(part for part in parts if part != '')
+
+    def values_for(self, recipient):
+        """The recipient's values for this template's fields"""
+        return tuple(recipient.get(name) for name in self.fields)
+
+    def render(self, recipient):
+        """Fill the placeholders from a recipient dict
+
+        Raises:
+            TemplateError: a field is empty or missing and has no default
+        """
+        out = []
+        for part in self._parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            name, default = part
+            value = recipient.get(name)
+            if value is None or value == '':
+                if default is None:
+                    raise TemplateError(f"Recipient {recipient.get('id', '?')} has no value for '{name}'")
+                value = default
+            out.append(str(value))
+        return ''.join(out)
+
+
+def compile_template(content):
+    """Parse and validate template text
+
+    Raises:
+        TemplateError: if the text has a stray brace or an invalid placeholder
+    """
+    return CompiledTemplate(content or '')
+
+
+class TemplateEngine:
+    """Compiles templates once and caches rendered messages
+
+    Compiled templates are keyed by (template id, version), so an edited
+    template is recompiled on first use. Rendered messages are kept in an
+    LRU keyed by (template id, version, recipient id) together with the
+    recipient's values for the template's fields, so a recipient edit
+    never serves a stale message.
+    """
+
+    def __init__(self, max_rendered=10000):
+        self.max_rendered = max_rendered
+        self._lock = threading.Lock()
+        self._compiled = {}
+        self._rendered = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _version(template):
+        return (str(template.get('id')), template.get('version', 1))
+
+    def compile(self, template):
+        """The CompiledTemplate for a stored template dict"""
+        key = self._version(template)
+        with self._lock:
+            compiled = self._compiled.get(key)
+        if compiled is None or compiled.source != template['content']:
+            compiled = compile_template(template['content'])
+            with self._lock:
+                self._compiled[key] = compiled
+        return compiled
+
+    def render(self, template, recipient):
+        """Render one message, from the cache when possible"""
+        compiled = self.compile(template)
+        key = self._version(template) + (str(recipient.get('id')),)
+        values = compiled.values_for(recipient)
+        with self._lock:
+            cached = self._rendered.get(key)
+            if cached and cached[0] == values:
+                self._rendered.move_to_end(key)
+                self._hits += 1
+                return cached[1]
+            self._misses += 1
+        message = compiled.render(recipient)
+        with self._lock:
+            self._rendered[key] = (values, message)
+            self._rendered.move_to_end(key)
+            while len(self._rendered) > self.max_rendered:
+                self._rendered.popitem(last=False)
+        return message
+
+    def render_batch(self, template, recipients):
+        """Render a template for many recipients, compiling it only once
+
+        Returns:
+            list: (recipient, message, error) per recipient; message is None
+            and error holds the reason when that recipient cannot be rendered
+        """
+        results = []
+        self.compile(template)
+        for recipient in recipients:
+            try:
+                results.append((recipient, self.render(template, recipient), None))
+            except TemplateError as e:
+                logging.warning(f"[TEMPLATES] {template.get('name')}: {str(e)}")
+                results.append((recipient, None, str(e)))
+        return results
+
+    def summary(self):
+        with self._lock:
+            return {
+                'compiled': len(self._compiled),
+                'rendered_cached': len(self._rendered),
+                'hits': self._hits,
+                'misses': self._misses,
+            }
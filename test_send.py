@@ -1,4 +1,5 @@
 from whatsapp_auto import WhatsAppBot
+from phone_numbers import normalize_phone, InvalidPhoneNumber, DEFAULT_COUNTRY
 import time
 import sys
 import os
@@ -59,14 +60,15 @@ def main():
             print("📱 WHATSAPP MESSAGE SENDER")
             print("-"*50)
             print("1. Make sure WhatsApp Web is logged in")
-            print("2. Enter phone number with country code (no + or spaces)")
+            print("2. Enter phone number with country code (+ and spaces are fine)")
             print("   For Indian numbers: 91XXXXXXXXXX (e.g., 917770045132)")
             print("   For US numbers: 1XXXXXXXXXX (e.g., 14151234567)")
+            print(f"   Numbers without a country code are read as {DEFAULT_COUNTRY}")
             print("\nType 'exit' to quit or 'restart' to reload WhatsApp Web")
             print("-"*50)
         
             try:
-                phone = input("\nEnter phone number (with country code, no +): ").strip()
+                phone = input("\nEnter phone number (with country code): ").strip()
                 
                 if phone.lower() == 'exit':
                     print("\nExiting...")
@@ -74,35 +76,18 @@ def main():
                     
                 if phone.lower() == 'restart':
                     print("\nReloading WhatsApp Web...")
-                    bot.driver.get("https://web.whatsapp.com")
+                    bot.driver.get(bot.base_url)
                     wait_for_enter("Press Enter after WhatsApp Web has reloaded...")
                     continue
                 
-                # Clean the phone number - remove all non-digit characters
-                phone = ''.join(filter(str.isdigit, phone))
-                
-                if not phone:
-                    print("❌ Please enter a valid phone number")
+                # Same E.164 rules as the web app
+                try:
+                    phone = normalize_phone(phone)
+                except InvalidPhoneNumber as e:
+                    print(f"❌ {str(e)}")
                     time.sleep(2)
                     continue
                     
-                # Handle different number formats
-                if phone.startswith('91') and len(phone) == 12:  # Already in correct format
-                    print(f"ℹ️  Using number with country code: +{phone}")
-                elif phone.startswith('0'):  # Starts with 0 (local number)
-                    phone = '91' + phone[1:]
-                    print(f"ℹ️  Replaced leading 0 with country code: +{phone}")
-                elif len(phone) == 10:  # Local number without country code
-                    phone = '91' + phone
-                    print(f"ℹ️  Added country code: +{phone}")
-                else:
-                    print(f"ℹ️  Using number as provided: +{phone}")
-                    
-                # Double check the number doesn't have any unexpected prefixes
-                if phone.startswith('2091'):
-                    phone = phone[2:]  # Remove the '20' if it was added
-                    print(f"ℹ️  Removed incorrect prefix, using: +{phone}")
-                    
                 print(f"Final phone number that will be used: +{phone}")
                 
                 message = input("\nEnter message (press Enter for default): ").strip()
@@ -122,12 +107,6 @@ def main():
                 print(f"📞 Phone number: +{phone}")
                 print(f"📝 Message: {message}")
                 
-                # Ensure phone is a string and doesn't contain any extra characters
-                phone = str(phone).strip()
-                if not phone.isdigit():
-                    print(f"❌ Invalid phone number format: {phone}")
-                    wait_for_enter()
-                    continue
                     
                 print("\n🔍 Checking WhatsApp Web connection...")
                 
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The Flask app module, imported inside a scratch directory
+
+    app.py opens its database, history, logs and caches relative to the
+    working directory at import time, so it is imported once from a temp
+    directory and the original directory is restored afterwards.
+    """
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        import app
+    finally:
+        os.chdir(previous)
+    return app
@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from campaigns import CampaignManager, CampaignError
+from storage import JsonStore
+
+
+class FakeJob:
+    def __init__(self):
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+
+
+class FakeSender:
+    """Completes each send on its own thread; sends to `blocked` names wait for release()"""
+
+    def __init__(self, blocked=()):
+        self.blocked = set(blocked)
+        self.gate = threading.Event()
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, recipient, template, campaign_id):
+        job = FakeJob()
+
+        def run():
+            if recipient['name'] in self.blocked:
+                self.gate.wait(5)
+            with self._lock:
+                self.sent.append(recipient['name'])
+            job.future.set_result(True)
+
+        threading.Thread(target=run, daemon=True).start()
+        return job
+
+    def release(self):
+        self.gate.set()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonStore(str(tmp_path / 'config.json'), flush_interval=0.05)
+    store.add_template({'name': 'hello', 'content': 'Hi {name}'})
+    for index in range(5):
+        store.add_recipient({'name': str(index), 'phone': f'1555000000{index}'})
+    yield store
+    store.close()
+
+
+def make_manager(store, sender, tmp_path, **kwargs):
+    manager = CampaignManager(store, sender, str(tmp_path / 'campaigns.json'), **kwargs)
+    manager.set_ready(True)
+    return manager
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_campaign_sends_to_every_recipient(store, tmp_path):
+    sender = FakeSender()
+    manager = make_manager(store, sender, tmp_path)
+    campaign = manager.create('1', rate_per_minute=60000)
+    assert wait_for(lambda: manager.progress(campaign['id'])['status'] == 'completed')
+    progress = manager.progress(campaign['id'])
+    assert (progress['sent'], progress['total'], progress['percent']) == (5, 5, 100.0)
+    assert sorted(sender.sent) == ['0', '1', '2', '3', '4']
+
+
+def test_resume_while_the_paused_runner_drains_restarts_the_campaign(store, tmp_path):
+    sender = FakeSender(blocked={'0'})
+    manager = make_manager(store, sender, tmp_path, max_in_flight=1)
+    campaign = manager.create('1', rate_per_minute=60000)
+    # The first send is running and cannot be cancelled by the pause
+    assert wait_for(lambda: manager.progress(campaign['id'])['in_flight'] == 1)
+    manager.pause(campaign['id'])
+    manager.resume(campaign['id'])
+    sender.release()
+    assert wait_for(lambda: manager.progress(campaign['id'])['status'] == 'completed')
+    # Nothing was sent twice
+    assert sorted(sender.sent) == ['0', '1', '2', '3', '4']
+
+
+def test_paused_campaign_resumes_from_its_checkpoint(store, tmp_path):
+    sender = FakeSender(blocked={'2'})
+    manager = make_manager(store, sender, tmp_path, max_in_flight=1)
+    campaign = manager.create('1', rate_per_minute=60000)
+    assert wait_for(lambda: sender.sent == ['0', '1'] and manager.progress(campaign['id'])['in_flight'] == 1)
+    manager.pause(campaign['id'])
+    sender.release()
+    assert wait_for(lambda: not manager._runners[campaign['id']]['thread'].is_alive())
+    assert manager.progress(campaign['id'])['status'] == 'paused'
+    manager.resume(campaign['id'])
+    assert wait_for(lambda: manager.progress(campaign['id'])['status'] == 'completed')
+    assert sorted(sender.sent) == ['0', '1', '2', '3', '4']
+
+
+def test_running_campaigns_resume_after_a_restart(store, tmp_path):
+    sender = FakeSender(blocked={'1'})
+    manager = make_manager(store, sender, tmp_path, max_in_flight=1)
+    campaign = manager.create('1', rate_per_minute=60000)
+    assert wait_for(lambda: manager.progress(campaign['id'])['in_flight'] == 1 and sender.sent == ['0'])
+    manager._save(force=True)
+
+    restarted = FakeSender()
+    manager = make_manager(store, restarted, tmp_path)
+    manager.resume_all()
+    assert wait_for(lambda: manager.progress(campaign['id'])['status'] == 'completed')
+    assert restarted.sent == ['1', '2', '3', '4']
+    sender.release()
+
+
+def test_cancelled_campaign_cannot_be_resumed(store, tmp_path):
+    sender = FakeSender(blocked={'0'})
+    manager = make_manager(store, sender, tmp_path, max_in_flight=1)
+    campaign = manager.create('1', rate_per_minute=60000)
+    manager.cancel(campaign['id'])
+    with pytest.raises(CampaignError):
+        manager.resume(campaign['id'])
+    sender.release()
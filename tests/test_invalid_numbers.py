@@ -0,0 +1,61 @@
+import json
+import time
+
+from invalid_numbers import InvalidNumberCache
+
+
+def make_cache(tmp_path, **kwargs):
+    changes = []
+    cache = InvalidNumberCache(str(tmp_path / 'invalid_numbers.json'),
+                               on_change=lambda phone, entry: changes.append((phone, entry)), **kwargs)
+    return cache, changes
+
+
+def test_added_number_is_reported_until_removed(tmp_path):
+    cache, changes = make_cache(tmp_path)
+    cache.add('15550000001', reason='invalid_number')
+    assert cache.check('15550000001')['reason'] == 'invalid_number'
+    assert cache.check('15550000002') is None
+    assert cache.remove('15550000001')
+    assert not cache.remove('15550000001')
+    assert cache.check('15550000001') is None
+    assert [(phone, entry and entry['reason']) for phone, entry in changes] == [
+        ('15550000001', 'invalid_number'), ('15550000001', None)]
+
+
+def test_expired_entry_is_dropped_and_reported_as_cleared(tmp_path):
+    cache, changes = make_cache(tmp_path)
+    cache.add('15550000001', ttl=0.01)
+    time.sleep(0.02)
+    assert cache.check('15550000001') is None
+    # The hook clears the recipient's flag, as remove() does
+    assert changes[-1] == ('15550000001', None)
+    assert cache.entries() == []
+    assert cache.check('15550000001') is None
+    assert len(changes) == 2
+
+
+def test_zero_ttl_never_expires(tmp_path):
+    cache, _ = make_cache(tmp_path, ttl=0.01)
+    cache.add('15550000001', ttl=0, source='manual')
+    time.sleep(0.02)
+    assert cache.check('15550000001')['expires_at'] is None
+
+
+def test_hits_and_entries_survive_a_reload(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    cache.add('15550000001')
+    cache.check('15550000001')
+    cache.check('15550000001')
+    cache.close()
+    with open(tmp_path / 'invalid_numbers.json') as f:
+        assert json.load(f)['numbers']['15550000001']['hits'] == 2
+    reloaded, _ = make_cache(tmp_path)
+    assert reloaded.summary()['hits'] == 2
+    assert reloaded.check('15550000001') is not None
+
+
+def test_unreadable_file_starts_empty(tmp_path):
+    (tmp_path / 'invalid_numbers.json').write_text('{not json')
+    cache, _ = make_cache(tmp_path)
+    assert cache.entries() == []
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+import itertools
+
+import pytest
+
+_phones = itertools.count(5550001000)
+
+
+class Clock:
+    """Stands in for app.datetime with a settable now()"""
+
+    def __init__(self):
+        clock = self
+        self.current = None
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.current
+
+        self.datetime = FrozenDatetime
+
+
+@pytest.fixture
+def scheduler(app_module, monkeypatch):
+    """fire_schedule with a fake clock and sends recorded instead of queued"""
+    clock = Clock()
+    sent = []
+    monkeypatch.setattr(app_module, 'datetime', clock.datetime)
+    monkeypatch.setattr(app_module, 'send_scheduled_message', lambda recipient, template: sent.append(clock.current))
+    monkeypatch.setattr(app_module, 'catchup_turns', {})
+    monkeypatch.setattr(app_module, 'next_catchup_at', datetime.min)
+    store = app_module.store
+    recipient = store.add_recipient({'name': 'R', 'phone': f'1{next(_phones)}'})
+    template = store.find_template_by_name('misfire test') or store.add_template(
+        {'name': 'misfire test', 'content': 'hi {name}'})
+
+    def add(policy, last_fired, **fields):
+        return store.add_schedule(dict({
+            'type': 'daily', 'time': '09:00', 'recipient_id': recipient['id'], 'template_id': template['id'],
+            'active': True, 'misfire_policy': policy, 'last_fired': last_fired.strftime('%Y-%m-%d %H:%M:%S'),
+        }, **fields))
+
+    def fire(schedule_item, now):
+        clock.current = now
+        return app_module.fire_schedule(schedule_item['id'], now)
+
+    def watermark(schedule_item):
+        return store.get_schedule(schedule_item['id'])['last_fired']
+
+    return add, fire, watermark, sent
+
+
+def test_on_time_fire_sends_and_moves_the_watermark(scheduler):
+    add, fire, watermark, sent = scheduler
+    schedule_item = add('skip', datetime(2026, 3, 1, 9, 0))
+    assert fire(schedule_item, datetime(2026, 3, 2, 9, 0, 5)) == datetime(2026, 3, 3, 9, 0)
+    assert sent == [datetime(2026, 3, 2, 9, 0, 5)]
+    assert watermark(schedule_item) == '2026-03-02 09:00:00'
+
+
+def test_skip_after_a_long_outage_keeps_the_next_on_time_fire(scheduler):
+    add, fire, watermark, sent = scheduler
+    # 200 missed days: more than MAX_MISFIRE_BACKLOG
+    schedule_item = add('skip', datetime(2025, 8, 13, 9, 0))
+    assert fire(schedule_item, datetime(2026, 3, 1, 12, 0)) == datetime(2026, 3, 2, 9, 0)
+    assert sent == []
+    assert watermark(schedule_item) == '2026-03-01 09:00:00'
+    # The next fire is on time, not another misfire
+    fire(schedule_item, datetime(2026, 3, 2, 9, 0, 5))
+    assert sent == [datetime(2026, 3, 2, 9, 0, 5)]
+
+
+def test_fire_once_sends_a_single_catch_up_after_a_long_outage(scheduler):
+    add, fire, watermark, sent = scheduler
+    schedule_item = add('fire_once', datetime(2025, 8, 13, 9, 0))
+    assert fire(schedule_item, datetime(2026, 3, 1, 12, 0)) == datetime(2026, 3, 2, 9, 0)
+    assert watermark(schedule_item) == '2026-03-01 09:00:00'
+    # A stray tick before the next fire owes nothing
+    fire(schedule_item, datetime(2026, 3, 1, 12, 0, 30))
+    fire(schedule_item, datetime(2026, 3, 2, 9, 0, 5))
+    assert sent == [datetime(2026, 3, 1, 12, 0), datetime(2026, 3, 2, 9, 0, 5)]
+
+
+def test_fire_all_sends_each_missed_fire_spaced_out(scheduler):
+    add, fire, watermark, sent = scheduler
+    schedule_item = add('fire_all', datetime(2026, 3, 1, 9, 0), misfire_spacing=30)
+    now = datetime(2026, 3, 4, 12, 0)
+    assert fire(schedule_item, now) == now + timedelta(seconds=30)
+    assert watermark(schedule_item) == '2026-03-02 09:00:00'
+    fire(schedule_item, now + timedelta(seconds=30))
+    assert watermark(schedule_item) == '2026-03-03 09:00:00'
+    assert fire(schedule_item, now + timedelta(seconds=60)) == datetime(2026, 3, 5, 9, 0)
+    assert watermark(schedule_item) == '2026-03-04 09:00:00'
+    assert len(sent) == 3
+
+
+def test_inactive_schedule_stops_firing(scheduler):
+    add, fire, watermark, sent = scheduler
+    schedule_item = add('skip', datetime(2026, 3, 1, 9, 0), active=False)
+    assert fire(schedule_item, datetime(2026, 3, 2, 9, 0, 5)) is None
+    assert sent == []
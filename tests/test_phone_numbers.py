@@ -0,0 +1,45 @@
+import pytest
+
+from phone_numbers import normalize_phone, is_valid_phone, InvalidPhoneNumber
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('+91 93356 69767', '919335669767'),
+    ('0091 93356 69767', '919335669767'),
+    ('919335669767', '919335669767'),
+    ('9335669767', '919335669767'),
+    ('09335669767', '919335669767'),
+    ('+20 10 1234 5678', '201012345678'),
+    ('+44 07700 900123', '447700900123'),
+    ('+1 (555) 000-1234', '15550001234'),
+])
+def test_normalize_phone_accepts_common_formats(raw, expected):
+    assert normalize_phone(raw, 'IN') == expected
+
+
+def test_national_numbers_use_the_default_country():
+    assert normalize_phone('5550001234', 'US') == '15550001234'
+    assert normalize_phone('07700900123', 'gb') == '447700900123'
+
+
+@pytest.mark.parametrize('raw', ['', None, 'abc', '12', '+91 12345', '+1234567890123456', '0012'])
+def test_normalize_phone_rejects_invalid_numbers(raw):
+    with pytest.raises(InvalidPhoneNumber):
+        normalize_phone(raw, 'IN')
+    assert not is_valid_phone(raw, 'IN')
+
+
+def test_wrong_length_for_a_known_country_is_rejected():
+    # The old "2091..." fix-up used to guess at numbers like this one
+    with pytest.raises(InvalidPhoneNumber, match=r'\+91'):
+        normalize_phone('+91 933566976', 'IN')
+
+
+def test_unknown_default_country_is_rejected():
+    with pytest.raises(InvalidPhoneNumber, match='Unknown default country'):
+        normalize_phone('9335669767', 'ZZ')
+
+
+def test_invalid_phone_number_is_a_value_error():
+    with pytest.raises(ValueError):
+        normalize_phone('abc')
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from recurrence import Recurrence, RecurrenceError
+
+
+def daily(at='09:00'):
+    return Recurrence.from_schedule({'type': 'daily', 'time': at})
+
+
+def test_daily_next_fire():
+    assert daily().next_fire(datetime(2026, 1, 1, 8, 0)) == datetime(2026, 1, 1, 9, 0)
+    assert daily().next_fire(datetime(2026, 1, 1, 9, 0)) == datetime(2026, 1, 2, 9, 0)
+
+
+def test_monthly_clamps_to_short_months():
+    recurrence = Recurrence.from_schedule({'type': 'monthly', 'day': 31, 'time': '10:00'})
+    assert recurrence.next_fire(datetime(2026, 2, 1)) == datetime(2026, 2, 28, 10, 0)
+
+
+def test_weekly_accepts_several_days():
+    recurrence = Recurrence.from_schedule({'type': 'weekly', 'days': ['monday', 'friday'], 'time': '07:30'})
+    # 2026-01-01 is a Thursday
+    assert recurrence.upcoming(datetime(2026, 1, 1), 3) == [
+        datetime(2026, 1, 2, 7, 30), datetime(2026, 1, 5, 7, 30), datetime(2026, 1, 9, 7, 30)]
+
+
+def test_cron_next_fire():
+    recurrence = Recurrence.from_schedule({'type': 'cron', 'cron': '*/15 9-17 * * mon-fri'})
+    assert recurrence.next_fire(datetime(2026, 1, 2, 17, 50)) == datetime(2026, 1, 5, 9, 0)
+
+
+@pytest.mark.parametrize('schedule', [
+    {'type': 'hourly', 'time': '09:00'},
+    {'type': 'daily', 'time': '25:00'},
+    {'type': 'cron', 'cron': '* * *'},
+    {'type': 'cron', 'cron': '61 * * * *'},
+    {'type': 'weekly', 'days': ['someday'], 'time': '09:00'},
+])
+def test_invalid_schedules_raise(schedule):
+    with pytest.raises(RecurrenceError):
+        Recurrence.from_schedule(schedule)
+
+
+def test_between_is_capped_oldest_first():
+    fires = daily().between(datetime(2025, 1, 1), datetime(2026, 1, 1), limit=3)
+    assert fires == [datetime(2025, 1, 1, 9), datetime(2025, 1, 2, 9), datetime(2025, 1, 3, 9)]
+
+
+def test_last_between_finds_the_latest_fire_past_any_cap():
+    assert daily().last_between(datetime(2025, 1, 1), datetime(2026, 1, 1, 12)) == datetime(2026, 1, 1, 9)
+    cron = Recurrence.from_schedule({'type': 'cron', 'cron': '0 0 1 1 *'})
+    assert cron.last_between(datetime(2020, 6, 1), datetime(2026, 6, 1)) == datetime(2026, 1, 1)
+    assert daily().last_between(datetime(2026, 1, 1, 10), datetime(2026, 1, 1, 12)) is None
@@ -0,0 +1,521 @@
+import json
+import time
+import logging
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import deque
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, ElementClickInterceptedException
+
+# How often Selenium waits re-check the DOM (seconds)
+POLL_INTERVAL = 0.05
+
+TRANSPORTS = ('selenium', 'cdp')
+
+# Message data-ids read by chat_identity()
+IDENTITY_SAMPLES = 5
+
+
+class Transport(ABC):
+    """How WhatsAppBot talks to the page
+
+    The bot decides what to do (which chat path, which timeouts); a transport
+    only carries out these steps against the browser. Elements are named by
+    LocatorRegistry group, and every wait raises TimeoutException when it
+    runs out of time.
+    """
+
+    name = None
+
+    def __init__(self, driver, locators):
+        self.driver = driver
+        self.locators = locators
+
+    @abstractmethod
+    def load(self, url, timeout):
+        """Navigate to `url` and return once its DOM is ready"""
+
+    @abstractmethod
+    def exists(self, name):
+        """Whether group `name` matches any element"""
+
+    @abstractmethod
+    def count(self, name):
+        """How many elements the first matching locator of `name` finds"""
+
+    @abstractmethod
+    def wait_any(self, names, timeout, clickable=False):
+        """Wait until one of the groups matches; returns its name"""
+
+    @abstractmethod
+    def wait_count(self, name, above, timeout):
+        """Wait until count(name) exceeds `above`"""
+
+    @abstractmethod
+    def focus(self, name, timeout):
+        """Scroll to, click and empty the (editable) element `name`"""
+
+    @abstractmethod
+    def type_text(self, name, text):
+        """Type `text` into `name`, with Shift+Enter between lines"""
+
+    @abstractmethod
+    def click(self, name, timeout):
+        """Wait for `name` to be clickable and click it"""
+
+    @abstractmethod
+    def search_chat(self, query, timeout):
+        """Open the first sidebar search result for `query` (no page load)
+
+        The first result is not necessarily the wanted chat; check
+        chat_identity() before sending.
+        """
+
+    @abstractmethod
+    def chat_identity(self):
+        """Header text and message data-ids of the open chat (up to a few of each)"""
+
+    @abstractmethod
+    def clear_search(self):
+        """Leave the sidebar search box empty"""
+
+    @abstractmethod
+    def ping(self):
+        """Raise if the page can no longer be reached"""
+
+    def close(self):
+        pass
+
+
+class SeleniumTransport(Transport):
+    """Every step as WebDriver commands, polling the DOM every POLL_INTERVAL"""
+
+    name = 'selenium'
+
+    def __init__(self, driver, locators):
+        super().__init__(driver, locators)
+        self._page_load_timeout = None
+
+    @staticmethod
+    def _is_clickable(element):
+        return element.is_displayed() and element.is_enabled()
+
+    @staticmethod
+    def _try_click(element):
+        try:
+            element.click()
+            return True
+        except ElementClickInterceptedException:
+            return False
+
+    def _until(self, timeout, condition):
+        return WebDriverWait(self.driver, timeout, poll_frequency=POLL_INTERVAL,
+                             ignored_exceptions=(StaleElementReferenceException,)).until(condition)
+
+    def _find(self, name, clickable=False):
+        return self.locators.find(self.driver, name, self._is_clickable if clickable else None)
+
+    def load(self, url, timeout):
+        # One WebDriver command per change, not per load
+        if timeout != self._page_load_timeout:
+            self.driver.set_page_load_timeout(timeout)
+            self._page_load_timeout = timeout
+        self.driver.get(url)
+
+    def exists(self, name):
+        return self._find(name) is not None
+
+    def count(self, name):
+        return len(self.locators.find_all(self.driver, name))
+
+    def wait_any(self, names, timeout, clickable=False):
+        return self._until(timeout, lambda d: next((name for name in names if self._find(name, clickable)), None))
+
+    def wait_count(self, name, above, timeout):
+        self._until(timeout, lambda d: self.count(name) > above)
+
+    def focus(self, name, timeout):
+        element = self._until(timeout, lambda d: self._find(name, clickable=True))
+        # Scroll the element into view and click it once nothing covers it
+        self.driver.execute_script("arguments[0].scrollIntoView(true);", element)
+        self._until(timeout, lambda d: self._try_click(element))
+        element.clear()
+
+    def type_text(self, name, text):
+        element = self._find(name)
+        for index, chunk in enumerate(text.split("\n")):
+            if index:
+                ActionChains(self.driver).key_down(Keys.SHIFT).key_down(Keys.ENTER).key_up(Keys.SHIFT).key_up(Keys.ENTER).perform()
+            element.send_keys(chunk)
+
+    def click(self, name, timeout):
+        self._until(timeout, lambda d: self._find(name, clickable=True)).click()
+
+    def search_chat(self, query, timeout):
+        previous = self.locators.find_all(self.driver, 'chat_list_item')
+        search_box = self._find('search_box')
+        if search_box is None:
+            raise Exception("Search box not found")
+        search_box.click()
+        search_box.send_keys(Keys.CONTROL + "a", Keys.BACKSPACE)
+        search_box.send_keys(query)
+        # The list re-renders with the search results; then open the first one
+        wait = WebDriverWait(self.driver, timeout, poll_frequency=POLL_INTERVAL)
+        if previous:
+            wait.until(EC.staleness_of(previous[0]))
+        wait.until(lambda d: self._find('chat_list_item'))
+        search_box.send_keys(Keys.ENTER)
+        wait.until(lambda d: self._find('input_box'))
+
+    def chat_identity(self):
+        header = self._find('chat_header')
+        values = [header.text] if header is not None else []
+        messages = self.locators.find_all(self.driver, 'chat_message_id')[:IDENTITY_SAMPLES]
+        return values + [element.get_attribute('data-id') or '' for element in messages]
+
+    def clear_search(self):
+        self._find('search_box').send_keys(Keys.ESCAPE)
+
+    def ping(self):
+        self.driver.execute_script("return document.readyState")
+
+
+# Page-side helpers shared by every CDP evaluate: locator lookup (same
+# semantics as LocatorRegistry.find) and a MutationObserver-based wait
+_CDP_PRELUDE = """
+function query([by, value]) {
+  if (by === 'id') { const el = document.getElementById(value); return el ? [el] : []; }
+  if (by === 'xpath') {
+    const snapshot = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const found = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) found.push(snapshot.snapshotItem(i));
+    return found;
+  }
+  return Array.from(document.querySelectorAll(value));
+}
+function clickable(el) {
+  return !el.disabled && (el.offsetParent !== null || el.getClientRects().length > 0);
+}
+function find(locators, mustBeClickable) {
+  for (let i = 0; i < locators.length; i++) {
+    for (const el of query(locators[i])) {
+      if (!mustBeClickable || clickable(el)) return {index: i, element: el};
+    }
+  }
+  return null;
+}
+function findAll(locators) {
+  for (let i = 0; i < locators.length; i++) {
+    const found = query(locators[i]);
+    if (found.length) return {index: i, element: found[0], all: found};
+  }
+  return null;
+}
+function until(check, timeout) {
+  return new Promise(resolve => {
+    let result = check();
+    if (result) return resolve(result);
+    const observer = new MutationObserver(() => {
+      result = check();
+      if (result) { observer.disconnect(); clearTimeout(timer); resolve(result); }
+    });
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    const timer = setTimeout(() => { observer.disconnect(); resolve(null); }, timeout * 1000);
+  });
+}
+"""
+
+_KEYS = {
+    'Enter': {'key': 'Enter', 'code': 'Enter', 'windowsVirtualKeyCode': 13, 'text': '\r'},
+    'Escape': {'key': 'Escape', 'code': 'Escape', 'windowsVirtualKeyCode': 27},
+}
+_SHIFT = 8
+
+
+class CdpError(Exception):
+    """Raised when the DevTools connection fails or a command returns an error"""
+
+
+class CdpConnection:
+    """A minimal synchronous Chrome DevTools Protocol client over one websocket
+
+    Used only from the session's worker thread. Commands can be pipelined:
+    batch() writes several before reading any reply, so a burst of input
+    events costs one round trip.
+    """
+
+    def __init__(self, url, timeout=30):
+        try:
+            import websocket
+        except ImportError:
+            raise CdpError("The CDP transport needs the websocket-client package "
+                           "(pip install websocket-client)") from None
+        self._socket = websocket.create_connection(url, timeout=timeout, suppress_origin=True)
+        self._ids = iter(range(1, 1 << 62))
+        self._events = deque(maxlen=200)
+        self.commands = 0
+
+    def _read(self, timeout):
+        self._socket.settimeout(max(timeout, 0.001))
+        return json.loads(self._socket.recv())
+
+    def _collect(self, pending, timeout):
+        replies = {}
+        deadline = time.time() + timeout
+        while len(replies) < len(pending):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutException(f"No DevTools reply within {timeout:.1f}s")
+            try:
+                message = self._read(remaining)
+            except Exception as e:
+                if type(e).__name__ == 'WebSocketTimeoutException':
+                    continue
+                raise CdpError(f"DevTools connection lost: {str(e)}") from e
+            if 'id' in message:
+                replies[message['id']] = message
+            else:
+                self._events.append(message)
+        results = []
+        for command_id in pending:
+            message = replies[command_id]
+            if 'error' in message:
+                raise CdpError(message['error'].get('message', str(message['error'])))
+            results.append(message.get('result', {}))
+        return results
+
+    def batch(self, commands, timeout=30):
+        """Send (method, params) commands back to back and return their results"""
+        pending = []
+        for method, params in commands:
+            command_id = next(self._ids)
+            self._socket.send(json.dumps({'id': command_id, 'method': method, 'params': params or {}}))
+            pending.append(command_id)
+        self.commands += len(pending)
+        return self._collect(pending, timeout)
+
+    def call(self, method, params=None, timeout=30):
+        return self.batch([(method, params)], timeout)[0]
+
+    def discard_events(self):
+        self._events.clear()
+
+    def wait_event(self, method, timeout):
+        """Wait for the next `method` event; other events are dropped"""
+        deadline = time.time() + timeout
+        while True:
+            while self._events:
+                if self._events.popleft().get('method') == method:
+                    return
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutException(f"{method} not received within {timeout:.1f}s")
+            try:
+                message = self._read(remaining)
+            except Exception as e:
+                if type(e).__name__ == 'WebSocketTimeoutException':
+                    continue
+                raise CdpError(f"DevTools connection lost: {str(e)}") from e
+            if 'id' not in message:
+                self._events.append(message)
+
+    def close(self):
+        try:
+            self._socket.close()
+        except Exception:
+            pass
+
+
+class CdpTransport(Transport):
+    """Steps as a few DevTools Protocol calls on a direct websocket
+
+    The browser is still launched and owned by Selenium; this only replaces
+    the per-element WebDriver round trips. Lookups and waits run inside the
+    page as single evaluate calls (waits resolve from a MutationObserver
+    instead of polling) and typed text is sent as pipelined input events.
+    """
+
+    name = 'cdp'
+
+    def __init__(self, driver, locators, debug_port=None):
+        super().__init__(driver, locators)
+        address = self._debugger_address(driver, debug_port)
+        self.connection = CdpConnection(self._page_websocket(driver, address))
+        self.connection.call('Page.enable')
+        logging.info(f"[CDP] Connected to {address}")
+
+    @staticmethod
+    def _debugger_address(driver, debug_port):
+        for key in ('ms:edgeOptions', 'goog:chromeOptions'):
+            address = (driver.capabilities.get(key) or {}).get('debuggerAddress')
+            if address:
+                return address
+        if debug_port:
+            return f"127.0.0.1:{debug_port}"
+        raise CdpError("Browser exposes no DevTools address")
+
+    @staticmethod
+    def _page_websocket(driver, address):
+        with urllib.request.urlopen(f"http://{address}/json", timeout=10) as response:
+            targets = [t for t in json.loads(response.read()) if t.get('type') == 'page']
+        if not targets:
+            raise CdpError(f"No page target at {address}")
+        # The WebDriver window handle is the DevTools target id
+        handle = driver.current_window_handle.replace('CDwindow-', '')
+        target = next((t for t in targets if t.get('id') == handle), targets[0])
+        return target['webSocketDebuggerUrl']
+
+    def _locators(self, names):
+        kinds = {By.ID: 'id', By.XPATH: 'xpath', By.CSS_SELECTOR: 'css selector'}
+        return [{'name': name, 'locators': [[kinds.get(by, by), value] for by, value in self.locators.ordered(name)]}
+                for name in names]
+
+    def _evaluate(self, body, args, timeout=30):
+        """Run `body` (a JS function of `args`, may return a promise) in the page"""
+        expression = f"(function() {{ {_CDP_PRELUDE} return ({body})({json.dumps(args)}); }})()"
+        result = self.connection.call('Runtime.evaluate', {
+            'expression': expression,
+            'awaitPromise': True,
+            'returnByValue': True,
+        }, timeout=timeout + 5)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise CdpError((details.get('exception') or {}).get('description') or details.get('text'))
+        return result.get('result', {}).get('value')
+
+    def _record(self, match):
+        if match:
+            self.locators.record(match['name'], match['index'])
+        return match
+
+    def _wait(self, body, args, timeout):
+        """Evaluate a waiting body, retrying while a navigation swaps the document"""
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            try:
+                match = self._evaluate(body, dict(args, timeout=max(remaining, 0)), timeout=max(remaining, 0))
+            except CdpError as e:
+                if 'context' not in str(e).lower() or remaining <= 0:
+                    raise
+                time.sleep(0.05)
+                continue
+            if match:
+                return self._record(match)
+            raise TimeoutException(f"Timed out after {timeout:.1f}s")
+
+    def load(self, url, timeout):
+        self.connection.discard_events()
+        self.connection.call('Page.navigate', {'url': url})
+        self.connection.wait_event('Page.domContentEventFired', timeout)
+
+    def exists(self, name):
+        return bool(self._record(self._evaluate(
+            "args => { const hit = find(args.groups[0].locators, false); "
+            "return hit && {name: args.groups[0].name, index: hit.index}; }",
+            {'groups': self._locators([name])})))
+
+    def count(self, name):
+        match = self._record(self._evaluate(
+            "args => { const hit = findAll(args.groups[0].locators); "
+            "return hit && {name: args.groups[0].name, index: hit.index, count: hit.all.length}; }",
+            {'groups': self._locators([name])}))
+        return match['count'] if match else 0
+
+    def wait_any(self, names, timeout, clickable=False):
+        return self._wait(
+            "args => until(() => { for (const group of args.groups) { const hit = find(group.locators, args.clickable); "
+            "if (hit) return {name: group.name, index: hit.index}; } return null; }, args.timeout)",
+            {'groups': self._locators(names), 'clickable': clickable}, timeout)['name']
+
+    def wait_count(self, name, above, timeout):
+        self._wait(
+            "args => until(() => { const hit = findAll(args.groups[0].locators); "
+            "return hit && hit.all.length > args.above ? {name: args.groups[0].name, index: hit.index} : null; }, args.timeout)",
+            {'groups': self._locators([name]), 'above': above}, timeout)
+
+    def focus(self, name, timeout):
+        self._wait(
+            "args => until(() => { const hit = find(args.groups[0].locators, true); if (!hit) return null; "
+            "hit.element.scrollIntoView(true); hit.element.focus(); hit.element.click(); "
+            "document.execCommand('selectAll', false); document.execCommand('delete', false); "
+            "return {name: args.groups[0].name, index: hit.index}; }, args.timeout)",
+            {'groups': self._locators([name])}, timeout)
+
+    def _key(self, key, modifiers=0):
+        params = dict(_KEYS[key], modifiers=modifiers)
+        return [('Input.dispatchKeyEvent', dict(params, type='keyDown')),
+                ('Input.dispatchKeyEvent', {k: v for k, v in dict(params, type='keyUp').items() if k != 'text'})]
+
+    def type_text(self, name, text):
+        # Typed into whatever has focus (focus() just put it on `name`)
+        commands = []
+        for index, chunk in enumerate(text.split("\n")):
+            if index:
+                commands += self._key('Enter', _SHIFT)
+            if chunk:
+                commands.append(('Input.insertText', {'text': chunk}))
+        if commands:
+            self.connection.batch(commands)
+
+    def click(self, name, timeout):
+        self._wait(
+            "args => until(() => { const hit = find(args.groups[0].locators, true); if (!hit) return null; "
+            "hit.element.click(); "
+            "return {name: args.groups[0].name, index: hit.index}; }, args.timeout)",
+            {'groups': self._locators([name])}, timeout)
+
+    def search_chat(self, query, timeout):
+        started = time.time()
+        # Remember the current first result so its replacement can be awaited
+        self._evaluate(
+            "args => { const hit = findAll(args.groups[0].locators); window.__waPrevious = hit ? hit.element : null; "
+            "const box = find(args.groups[1].locators, false); if (!box) throw new Error('Search box not found'); "
+            "box.element.focus(); box.element.click(); "
+            "document.execCommand('selectAll', false); document.execCommand('delete', false); return true; }",
+            {'groups': self._locators(['chat_list_item', 'search_box'])})
+        self.connection.call('Input.insertText', {'text': query})
+        self._wait(
+            "args => until(() => { if (window.__waPrevious && window.__waPrevious.isConnected) return null; "
+            "const hit = find(args.groups[0].locators, false); return hit && {name: args.groups[0].name, index: hit.index}; }, args.timeout)",
+            {'groups': self._locators(['chat_list_item'])}, timeout - (time.time() - started))
+        self.connection.batch(self._key('Enter'))
+        self.wait_any(('input_box',), timeout - (time.time() - started))
+
+    def chat_identity(self):
+        found = self._evaluate(
+            "args => { const header = find(args.groups[0].locators, false); const ids = findAll(args.groups[1].locators); "
+            "return {header: header && {index: header.index, text: header.element.textContent}, "
+            "ids: ids && {index: ids.index, values: ids.all.slice(0, args.samples).map(el => el.getAttribute('data-id') || '')}}; }",
+            {'groups': self._locators(['chat_header', 'chat_message_id']), 'samples': IDENTITY_SAMPLES})
+        values = []
+        if found['header']:
+            self.locators.record('chat_header', found['header']['index'])
+            values.append(found['header']['text'])
+        if found['ids']:
+            self.locators.record('chat_message_id', found['ids']['index'])
+            values += found['ids']['values']
+        return values
+
+    def clear_search(self):
+        self.connection.batch(self._key('Escape'))
+
+    def ping(self):
+        self.connection.call('Runtime.evaluate', {'expression': '1', 'returnByValue': True}, timeout=5)
+
+    def close(self):
+        self.connection.close()
+
+
+def make_transport(name, driver, locators, debug_port=None):
+    """Build the transport called `name` for a started driver"""
+    if name == 'selenium':
+        return SeleniumTransport(driver, locators)
+    if name == 'cdp':
+        return CdpTransport(driver, locators, debug_port=debug_port)
+    raise ValueError(f"Unknown transport: {name}")
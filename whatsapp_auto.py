@@ -1,62 +1,195 @@
+import re
 import time
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.edge.service import Service
 from selenium.webdriver.edge.options import Options
-from selenium.webdriver.common.action_chains import ActionChains
-import subprocess
+from selenium.common.exceptions import TimeoutException
 import os
-from urllib.parse import quote
+import logging
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
+from locators import LocatorRegistry
+from phone_numbers import normalize_phone, InvalidPhoneNumber
+from transports import TRANSPORTS, make_transport
+
+# Point at a stand-in (see fake_whatsapp.py) to run without a phone
+WHATSAPP_URL = os.environ.get('WHATSAPP_WEB_URL', "https://web.whatsapp.com").rstrip('/')
+
+# After this many failed in-app switches a number always uses the URL
+MAX_IN_APP_MISSES = 2
+
+# A message data-id names its chat first: "<fromMe>_<digits>@c.us_<message id>"
+CHAT_DATA_ID = re.compile(r'^(?:true|false)_(\d+)@c\.us_')
+
+# Upper bounds for each wait; adaptive timeouts never exceed these
+DEFAULT_TIMEOUTS = {
+    'in_app_switch': 5,
+    'url_load': 30,
+    'compose_ready': 20,
+    'input_click': 5,
+    'send_ready': 10,
+    'delivered': 10,
+    'page_ready': 60,
+}
+
+# How long to wait for a QR code to be scanned
+QR_LOGIN_TIMEOUT = 120
+
+# Lock files Edge keeps in a profile; a crashed Edge leaves them behind
+PROFILE_LOCKS = ('SingletonLock', 'SingletonCookie', 'SingletonSocket', 'lockfile')
+
+
+class AdaptiveTimeouts:
+    """Per-step wait timeouts derived from the p95 of recent successful waits
+
+    Until a step has `min_samples` observations its default timeout is used;
+    after that the timeout is `factor` times the recent p95, clamped between
+    `min_timeout` and the default.
+    """
+
+    def __init__(self, defaults=None, window=50, factor=3.0, min_timeout=1.0, min_samples=10):
+        self.defaults = dict(DEFAULT_TIMEOUTS, **(defaults or {}))
+        self.window = window
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+        self._samples = {}
+
+    def record(self, step, seconds):
+        self._samples.setdefault(step, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, step):
+        samples = sorted(self._samples.get(step, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def timeout(self, step):
+        default = self.defaults[step]
+        if len(self._samples.get(step, ())) < self.min_samples:
+            return default
+        return min(default, max(self.min_timeout, self.p95(step) * self.factor))
+
+    def summary(self):
+        return {step: {'p95': round(self.p95(step), 3), 'timeout': round(self.timeout(step), 3),
+                       'samples': len(samples)}
+                for step, samples in self._samples.items() if samples}
+
 
 class WhatsAppBot:
-    def __init__(self):
+    def __init__(self, profile_dir=None, debug_port=None, driver_path=None, locators=None, base_url=None,
+                 headless=False, transport='selenium'):
+        """
+        Args:
+            profile_dir (str): Edge user data directory holding the WhatsApp session
+                (defaults to ./whatsapp_bot_profile)
+            debug_port (int): remote debugging port, required to run several bots side by side
+            driver_path (str): msedgedriver binary; Selenium Manager resolves it when omitted
+            locators (LocatorRegistry): shared DOM locator ranking; defaults to one
+                persisted in ./locators.json
+            base_url (str): WhatsApp Web address; defaults to WHATSAPP_URL
+            headless (bool): run Edge without a window (benchmarks against a stand-in)
+            transport (str): how page steps are carried out, one of TRANSPORTS:
+                'selenium' (WebDriver commands) or 'cdp' (DevTools websocket)
+        """
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
         self.driver = None
         self.wait = None
         self.is_running = False
+        self.profile_dir = profile_dir or os.path.join(os.getcwd(), "whatsapp_bot_profile")
+        self.debug_port = debug_port
+        self.driver_path = driver_path
+        self.base_url = (base_url or WHATSAPP_URL).rstrip('/')
+        self.headless = headless
+        self.transport_name = transport
+        self.transport = None
+        self.current_chat = None
+        # In-app search misses per number; repeat misses go straight to the URL
+        self._in_app_misses = {}
+        self.send_timings = deque(maxlen=500)
+        # Why the last send_message_to_number failed ('invalid_number', ...)
+        self.last_failure = None
+        self.timeouts = AdaptiveTimeouts()
+        self.locators = locators or LocatorRegistry()
+        # Seconds spent in each phase of the last start()
+        self.startup_timings = {}
         
-    def kill_edge_processes(self):
-        """Kill any existing Edge processes"""
+    def check_profile(self):
+        """Create the profile directory and clear locks left by a crashed Edge
+
+        Locks held by a live Edge are left alone, so a profile that is really
+        in use fails fast at driver spawn instead of being corrupted.
+        """
+        profile = os.path.abspath(self.profile_dir)
+        os.makedirs(profile, exist_ok=True)
+        for name in PROFILE_LOCKS:
+            path = os.path.join(profile, name)
+            if not os.path.lexists(path):
+                continue
+            if name == 'SingletonLock' and os.path.islink(path):
+                # Points at "<host>-<pid>" of the Edge that owns the profile
+                pid = os.readlink(path).rpartition('-')[2]
+                if pid.isdigit() and self._pid_alive(int(pid)):
+                    print(f"⚠️  Profile {profile} is in use by Edge process {pid}")
+                    continue
+            try:
+                os.remove(path)
+                print(f"🧹 Removed stale profile lock {name}")
+            except OSError:
+                print(f"⚠️  Profile lock {name} is held by a running Edge")
+        return profile
+
+    @staticmethod
+    def _pid_alive(pid):
         try:
-            subprocess.run(['taskkill', '/F', '/IM', 'msedge.exe'], 
-                         stdout=subprocess.DEVNULL, 
-                         stderr=subprocess.DEVNULL)
-            time.sleep(2)
-        except Exception as e:
-            print(f"⚠️  Warning: Could not kill Edge processes: {str(e)}")
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except (PermissionError, OSError):
+            return True
+        return True
     
     def setup_driver(self):
         """Setup the Edge WebDriver with existing profile"""
         try:
             print("🔧 Setting up Edge WebDriver...")
-            self.kill_edge_processes()
             
             # Configure Edge options
             options = Options()
+            # Return from get() at DOMContentLoaded; readiness is checked by polling the DOM
+            options.page_load_strategy = 'eager'
             options.add_argument('--ignore-certificate-errors')
             options.add_argument('--ignore-ssl-errors')
             options.add_argument('--disable-web-security')
             options.add_argument('--allow-running-insecure-content')
+            options.add_argument('--allow-insecure-localhost')
             options.add_argument("--start-maximized")
             options.add_argument("--disable-gpu")
             options.add_argument("--no-sandbox")
             options.add_argument("--disable-dev-shm-usage")
             options.add_argument("--disable-site-isolation-trials")
-            options.add_argument("--disable-features=IsolateOrigins,site-per-process")
+            options.add_argument("--disable-features=IsolateOrigins,site-per-process,msEdgeAccountProfile")
             options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36 Edg/122.0.0.0")
+            if self.debug_port:
+                options.add_argument(f"--remote-debugging-port={self.debug_port}")
+            if self.transport_name == 'cdp':
+                options.add_argument("--remote-allow-origins=*")
+            if self.headless:
+                options.add_argument("--headless=new")
+                options.add_argument("--window-size=1280,900")
+            
+            # Disable automation flags and identity features
+            options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
+            options.add_experimental_option('useAutomationExtension', False)
             
             # Set up user data directory for persistent session
-            edge_profile = os.path.join(os.getcwd(), "whatsapp_bot_profile")
-            if not os.path.exists(edge_profile):
-                os.makedirs(edge_profile)
-            options.add_argument(f"user-data-dir={edge_profile}")
+            options.add_argument(f"user-data-dir={os.path.abspath(self.profile_dir)}")
             
             # Initialize the WebDriver
-            service = Service()
+            service = Service(self.driver_path) if self.driver_path else Service()
             self.driver = webdriver.Edge(service=service, options=options)
             self.wait = WebDriverWait(self.driver, 60)
             
@@ -81,34 +214,24 @@ class WhatsAppBot:
         """Open WhatsApp Web with existing session"""
         try:
             print("🔗 Connecting to WhatsApp Web...")
-            self.driver.get("https://web.whatsapp.com")
-            time.sleep(5)  # Initial load time
+            self._phase('page_load', self.transport.load, self.base_url, self.timeouts.defaults['page_ready'])
             
             print("⏳ Waiting for WhatsApp Web to load...")
             # Wait for either the chat list (logged in) or QR code (needs login)
-            initial_load = self.wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'div[role="textbox"], div[data-testid="qrcode"]'))
-            )
+            screen = self._phase('session_ready', self._wait, 'page_ready',
+                                 lambda timeout: self.transport.wait_any(('side', 'qr_code'), timeout))
             
             # Check if already logged in
-            textbox = self.driver.find_elements(By.CSS_SELECTOR, 'div[role="textbox"]')
-            if textbox:
+            if screen == 'side':
                 print("✅ Successfully connected to existing WhatsApp Web session!")
                 return True
                 
             # If not logged in, wait for QR code scan
-            qr_code = self.wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'div[data-testid="qrcode"]'))
-            )
-            if qr_code:
-                print("📱 Please scan the QR code with your phone to log in to WhatsApp Web...")
-                # Wait for login to complete
-                chat_list = self.wait.until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, 'div[role="textbox"]'))
-                )
-                if chat_list:
-                    print("✅ Successfully logged in to WhatsApp Web!")
-                    return True
+            print("📱 Please scan the QR code with your phone to log in to WhatsApp Web...")
+            chat_list = self._phase('qr_login', self.transport.wait_any, ('side',), QR_LOGIN_TIMEOUT)
+            if chat_list:
+                print("✅ Successfully logged in to WhatsApp Web!")
+                return True
             
             raise Exception("Could not detect login status")
                 
@@ -125,115 +248,184 @@ class WhatsAppBot:
                 print(f"⚠️  Failed to take screenshot: {str(screenshot_error)}")
             raise Exception(error_msg)
 
+    def _wait(self, step, wait, extend=True):
+        """Run `wait(timeout)` (a transport wait) with the adaptive timeout for `step`
+
+        With `extend`, a miss on a shortened timeout keeps waiting up to the
+        step's default before giving up, so a slow page still succeeds.
+        """
+        started = time.time()
+        timeout = self.timeouts.timeout(step)
+        try:
+            result = wait(timeout)
+        except TimeoutException:
+            remaining = self.timeouts.defaults[step] - timeout
+            if not extend or remaining <= 0:
+                raise
+            print(f"⏳ {step} slower than usual ({timeout:.1f}s), waiting up to {remaining:.1f}s more")
+            result = wait(remaining)
+        self.timeouts.record(step, time.time() - started)
+        return result
+
+    def _open_chat_in_app(self, phone_number):
+        """Switch to a chat through the sidebar search, without reloading the page
+
+        Only works for numbers that already have a chat or a saved contact.
+
+        Returns:
+            bool: True if the chat's compose box is open
+        """
+        if self._in_app_misses.get(phone_number, 0) >= MAX_IN_APP_MISSES or \
+                not self.transport.exists('side'):
+            return False
+        try:
+            started = time.time()
+            self.transport.search_chat(phone_number, self.timeouts.timeout('in_app_switch'))
+            # The first result may be a message hit or a partial number match
+            if not self._chat_matches(phone_number):
+                raise Exception(f"Search opened a chat other than +{phone_number}")
+            self.timeouts.record('in_app_switch', time.time() - started)
+            return True
+        except Exception as e:
+            print(f"ℹ️  In-app chat switch failed for +{phone_number}, using URL: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+            self._in_app_misses[phone_number] = self._in_app_misses.get(phone_number, 0) + 1
+            try:
+                # Leave the search box empty for the next message
+                self.transport.clear_search()
+            except Exception:
+                pass
+            return False
+
+    def _chat_matches(self, phone_number):
+        """Whether the open chat's header number or message data-ids are `phone_number`
+
+        A chat shown under a contact name with no messages cannot be
+        confirmed and counts as a mismatch.
+        """
+        for value in self.transport.chat_identity():
+            match = CHAT_DATA_ID.match(value)
+            if (match.group(1) if match else ''.join(filter(str.isdigit, value))) == phone_number:
+                return True
+        return False
+
+    def _open_chat_by_url(self, phone_number):
+        """Open a chat by loading the send URL (full page load)
+
+        Returns:
+            bool: True if the chat opened, False if WhatsApp says the number is invalid
+        """
+        whatsapp_url = f"{self.base_url}/send?phone={phone_number}"
+        print(f"🌐 Opening chat URL: {whatsapp_url}")
+        self.transport.load(whatsapp_url, self.timeouts.defaults['url_load'])
+        
+        # Wait for the chat to load - check for compose box or error message
+        self._wait('url_load', lambda timeout: self.transport.wait_any(('input_box', 'invalid_number'), timeout))
+        return not self.transport.exists('invalid_number')
+
+    def open_chat(self, phone_number):
+        """Open the chat for phone_number, in-app when possible
+
+        Returns:
+            str: 'current', 'in_app' or 'url' depending on how the chat was
+                opened, or None if WhatsApp reports the number as invalid
+        """
+        if self.current_chat == phone_number and self.transport.exists('input_box'):
+            return 'current'
+        self.current_chat = None
+        if self._open_chat_in_app(phone_number):
+            path = 'in_app'
+        elif self._open_chat_by_url(phone_number):
+            path = 'url'
+        else:
+            return None
+        self.current_chat = phone_number
+        return path
+
+    def _record_timing(self, phone_number, path, open_seconds, total_seconds):
+        self.send_timings.append({
+            'path': path,
+            'open_chat': open_seconds,
+            'total': total_seconds,
+        })
+        logging.info(f"[SEND TIMING] +{phone_number} path={path} "
+                     f"open_chat={open_seconds:.2f}s total={total_seconds:.2f}s")
+
+    def timing_summary(self):
+        """Average chat-open and total send time per navigation path"""
+        summary = {}
+        for timing in self.send_timings:
+            entry = summary.setdefault(timing['path'], {'count': 0, 'open_chat': 0.0, 'total': 0.0})
+            entry['count'] += 1
+            entry['open_chat'] += timing['open_chat']
+            entry['total'] += timing['total']
+        for entry in summary.values():
+            entry['avg_open_chat'] = round(entry.pop('open_chat') / entry['count'], 3)
+            entry['avg_total'] = round(entry.pop('total') / entry['count'], 3)
+        return summary
+
     def send_message_to_number(self, phone_number, message):
         """Send a message to a specific phone number
         
         Args:
-            phone_number (str): Phone number in international format (e.g., 919335669767)
+            phone_number (str): Phone number, normalized to E.164 first (e.g., +91 93356 69767)
             message (str): Message to send
             
         Returns:
             bool: True if message was sent successfully, False otherwise
         """
+        self.last_failure = None
         try:
+            # Reject a bad number before it costs a page load
+            try:
+                phone_number = normalize_phone(phone_number)
+            except InvalidPhoneNumber as e:
+                print(f"❌ {str(e)}")
+                return False
+            
             if not self.driver or not self.is_running:
                 print("❌ Bot is not initialized or not running")
                 return False
             
-            # Clean the phone number - remove all non-digit characters
-            phone_number = ''.join(filter(str.isdigit, str(phone_number)))
-            
-            # Ensure the number is in international format
-            if len(phone_number) == 10:  # If only local number provided, assume India (+91)
-                phone_number = '91' + phone_number
-                print(f"ℹ️  Added country code: +{phone_number}")
-            elif phone_number.startswith('0'):  # If starts with 0, replace with country code
-                phone_number = '91' + phone_number[1:]
-                print(f"ℹ️  Replaced leading 0 with country code: +{phone_number}")
-            
             print(f"📱 Sending message to +{phone_number}")
             print(f"📝 Message: {message[:50]}{'...' if len(message) > 50 else ''}")
             
-            # Construct the WhatsApp URL with the phone number and message
-            encoded_message = quote(message)
-            whatsapp_url = f"https://web.whatsapp.com/send?phone={phone_number}&text={encoded_message}"
-            
-            print(f"🌐 Opening chat URL: {whatsapp_url}")
-            self.driver.get(whatsapp_url)
-            
+            started = time.time()
             try:
-                # Wait for the chat to load - check for input box or error message
-                WebDriverWait(self.driver, 30).until(
-                    lambda d: d.find_elements(By.XPATH, "//div[@role='textbox']") or \
-                             d.find_elements(By.XPATH, "//div[contains(text(),'Phone number shared via url is invalid')]")
-                )
-                
-                # Check if we got an error message
-                error_elements = self.driver.find_elements(By.XPATH, "//div[contains(text(),'Phone number shared via url is invalid')]")
-                if error_elements:
-                    print("❌ Error: Invalid phone number format")
+                path = self.open_chat(phone_number)
+                if path is None:
+                    print("❌ Error: WhatsApp reports the number as invalid")
+                    self.last_failure = 'invalid_number'
                     return False
+                opened = time.time()
                 
-                # Wait for chat to be fully loaded and input box to be interactable
+                # Wait for the input box to be interactable
                 print("⏳ Waiting for chat to load...")
-                time.sleep(3)  # Give some time for chat to load
-                
-                # Try multiple approaches to find and interact with the input box
-                input_box = None
-                input_selectors = [
-                    (By.XPATH, "//div[@title='Type a message' and @role='textbox']"),
-                    (By.XPATH, "//div[@role='textbox']"),
-                    (By.XPATH, "//div[@class='_3Uu1_']//div[@role='textbox']"),
-                    (By.CSS_SELECTOR, "div[title='Type a message']")
-                ]
-                
-                for selector in input_selectors:
-                    try:
-                        input_box = WebDriverWait(self.driver, 5).until(
-                            EC.element_to_be_clickable(selector)
-                        )
-                        if input_box:
-                            break
-                    except:
-                        continue
-                
-                if not input_box:
-                    raise Exception("Could not find message input box")
+                self._wait('compose_ready', lambda timeout: self.transport.wait_any(('input_box',), timeout, clickable=True))
                 
                 print("📝 Typing message...")
-                # Scroll the input box into view and click it
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", input_box)
-                time.sleep(1)
-                input_box.click()
-                time.sleep(1)
+                # Scroll the input box into view, click it once nothing covers it and clear it
+                self._wait('input_click', lambda timeout: self.transport.focus('input_box', timeout))
                 
-                # Clear any existing text and type the message
-                input_box.clear()
-                for chunk in message.split("\n"):
-                    input_box.send_keys(chunk)
-                    ActionChains(self.driver).key_down(Keys.SHIFT).key_down(Keys.ENTER).key_up(Keys.SHIFT).key_up(Keys.ENTER).perform()
-                    time.sleep(0.1)
-                time.sleep(1)  # Wait for message to be typed
+                # Type the message (Shift+Enter between lines)
+                self.transport.type_text('input_box', message)
                 
-                # Find and click the send button
+                # The send button appears once the typed text is in the box
                 print("🔄 Sending message...")
-                send_button = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button//span[@data-icon='send']"))
-                )
-                send_button.click()
+                sent_before = self.transport.count('msg_check')
+                self._wait('send_ready', lambda timeout: self.transport.click('send_button', timeout))
                 
-                # Verify the message was sent
+                # Verify the message was sent: a new sent tick shows up
                 try:
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.XPATH, "//span[@data-icon='msg-check']"))
-                    )
+                    self._wait('delivered', lambda timeout: self.transport.wait_count('msg_check', sent_before, timeout),
+                               extend=False)
                     print("✅ Message sent successfully!")
-                    return True
-                except:
+                except TimeoutException:
                     print("⚠️ Message may have been sent, but couldn't verify delivery")
-                    return True
+                self._record_timing(phone_number, path, opened - started, time.time() - started)
+                return True
                 
             except Exception as e:
+                self.current_chat = None
                 print(f"❌ Error in chat interaction: {str(e)}")
                 # Take a screenshot for debugging
                 try:
@@ -249,12 +441,35 @@ class WhatsAppBot:
             print(f"❌ Error in send_message_to_number: {str(e)}")
             return False
 
-    def start(self):
-        """Start the WhatsApp bot"""
+    def _phase(self, name, func, *args):
+        """Run one startup phase and record how long it took"""
+        started = time.time()
+        try:
+            return func(*args)
+        finally:
+            self.startup_timings[name] = round(time.time() - started, 3)
+
+    def start(self, driver_path=None):
+        """Start the WhatsApp bot
+
+        Args:
+            driver_path: msedgedriver path, or a Future resolving to one; the
+                profile check runs while the Future is still resolving
+        """
+        started = time.time()
+        self.startup_timings = {}
         try:
             print("🚀 Starting WhatsApp bot...")
-            self.driver = self.setup_driver()
-            self.wait = WebDriverWait(self.driver, 60)
+            # Runs before the spawn, not beside it: Edge reads the profile locks
+            # this clears as it launches. It overlaps driver resolution instead.
+            self._phase('profile_check', self.check_profile)
+            if isinstance(driver_path, Future):
+                driver_path = self._phase('driver_resolve_wait', driver_path.result)
+            if driver_path:
+                self.driver_path = driver_path
+            self.driver = self._phase('driver_spawn', self.setup_driver)
+            self.transport = self._phase('transport_connect', make_transport, self.transport_name,
+                                         self.driver, self.locators, self.debug_port)
             
             print("🔑 Logging in to WhatsApp Web...")
             if not self.login_to_whatsapp():
@@ -267,6 +482,7 @@ class WhatsAppBot:
         except Exception as e:
             error_msg = f"❌ Error starting bot: {str(e)}"
             print(error_msg)
+            self._close_transport()
             if self.driver:
                 try:
                     self.driver.quit()
@@ -275,20 +491,75 @@ class WhatsAppBot:
             self.driver = None
             self.is_running = False
             return False
+        finally:
+            self.startup_timings['total'] = round(time.time() - started, 3)
+            phases = ', '.join(f"{name}={seconds:.2f}s" for name, seconds in self.startup_timings.items())
+            logging.info(f"[STARTUP] {os.path.basename(self.profile_dir)}: {phases}")
             
     def stop(self):
         """Stop the WhatsApp bot"""
         try:
+            self._close_transport()
             if self.driver:
                 print("🛑 Stopping bot...")
                 self.driver.quit()
+                # So shutdown does not quit the dead driver a second time
+                self.driver = None
                 print("✅ Bot stopped successfully")
             self.is_running = False
+            self.current_chat = None
+            self.locators.save()
             return True
         except Exception as e:
             print(f"❌ Error stopping bot: {str(e)}")
             return False
             
+    def probe(self):
+        """Cheap health check, run on the worker that owns the driver
+
+        Returns:
+            str: 'ok' (chat list visible), 'logged_out' (QR code shown),
+            'loading' (neither yet) or 'crashed' (driver or browser gone)
+        """
+        if not self.driver or not self.transport:
+            return 'crashed'
+        try:
+            process = getattr(self.driver.service, 'process', None)
+            if process is not None and process.poll() is not None:
+                return 'crashed'
+            # Raises at once if the browser died or the session was lost
+            self.transport.ping()
+            if self.transport.exists('side'):
+                return 'ok'
+            if self.transport.exists('qr_code'):
+                return 'logged_out'
+            return 'loading'
+        except Exception as e:
+            logging.warning(f"[HEALTH] {os.path.basename(self.profile_dir)} probe failed: {str(e)}")
+            return 'crashed'
+
+    def _close_transport(self):
+        if self.transport:
+            try:
+                self.transport.close()
+            except Exception as e:
+                print(f"⚠️  Error while closing {self.transport.name} transport: {str(e)}")
+            self.transport = None
+
+    def restart(self):
+        """Throw away a dead driver and start again on the same profile"""
+        print("♻️  Restarting WhatsApp bot...")
+        self._close_transport()
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"⚠️  Error while quitting dead driver: {str(e)}")
+        self.driver = None
+        self.is_running = False
+        self.current_chat = None
+        return self.start()
+
     def __del__(self):
         """Destructor to ensure resources are cleaned up"""
         if hasattr(self, 'driver') and self.driver: